@@ -4,6 +4,8 @@ from database import get_db
 from auth.jwt import create_access_token
 import logging
 from services.auth_service import AuthService
+from services.db_writer import db_writer
+from services.user_cache import user_cache
 from werkzeug.exceptions import BadRequest, Unauthorized
 from datetime import datetime
 import os
@@ -16,7 +18,6 @@ auth_service = AuthService()
 
 @auth_bp.route('/signup', methods=['POST'])
 def signup():
-    db = get_db()
     try:
         data = request.get_json()
 #        logger.info(f"[auth.py] Current working directory: {os.getcwd()}")
@@ -34,7 +35,7 @@ def signup():
             raise BadRequest('Missing required fields')
 
         # Check if user exists
-        if db.query(User).filter(User.email == email).first():
+        if get_db().query(User).filter(User.email == email).first():
             logger.warning(f"Email already exists: {data['email']}")
             raise BadRequest('Email already registered')
         
@@ -45,24 +46,29 @@ def signup():
             hashed_password=hashed_password,
             full_name=fullName
         )
-        db.add(user)
+
+        def add_user(db):
+            # Checked again on the writer so concurrent signups cannot both succeed
+            if db.query(User).filter(User.email == email).first():
+                raise BadRequest('Email already registered')
+            db.add(user)
+            db.flush()
+            return user.id
+
         logger.info("[auth.py] About to commit user to database")
         logger.info(f"[auth.py] User data before commit: {user.email}, {user.full_name}")
-        db.commit()
-        logger.info(f"[auth.py] User committed successfully with ID: {user.id}")
-        db.refresh(user)
+        user_id = db_writer.run(add_user)
+        logger.info(f"[auth.py] User committed successfully with ID: {user_id}")
         
         logger.info(f"User created successfully: {user.email}")
         return jsonify({
-            'id': user.id,
+            'id': user_id,
             'email': user.email,
             'full_name': user.full_name
         })
     except Exception as e:
         logger.error(f"Error in signup: {str(e)}", exc_info=True)
         raise
-    finally:
-        db.close()
 
 @auth_bp.route('/login', methods=['POST'])
 def login():
@@ -80,8 +86,10 @@ def login():
             raise Unauthorized('Invalid email or password')
         
         # Update last login
-        user.last_login = datetime.utcnow()
-        db.commit()
+        last_login = datetime.utcnow()
+        db_writer.run(lambda session: session.query(User).filter(User.id == user.id)
+                      .update({User.last_login: last_login}, synchronize_session=False))
+        user_cache.invalidate(user.id)
         
         access_token = auth_service.create_access_token(user.id)
         return jsonify({
@@ -90,6 +98,4 @@ def login():
         })
     except Exception as e:
         logger.error(f"Error in login: {str(e)}", exc_info=True)
-        raise
-    finally:
-        db.close() 
\ No newline at end of file
+        raise 
\ No newline at end of file
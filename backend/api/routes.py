@@ -1,13 +1,23 @@
-from flask import Blueprint, request, jsonify, current_app, send_from_directory, g
+from flask import Blueprint, Response, request, jsonify, current_app, send_from_directory, g, make_response
 from werkzeug.utils import secure_filename
 import os
 import logging
 from database import get_db
 from models.receipt import Receipt, ReceiptChangeHistory
+from models.job import OCRJob
 from services.ocr_service import OCRService, OCRServiceError
 from services.categorization_service import CategorizationService, CategorizationError
+from services.receipt_pipeline import extract_and_categorize, extract_and_categorize_many, build_receipt
+from services.openai_client import run_async
+from services.metrics import render_metrics
+from services.data_version import get_data_version, data_version_etag
+from services.receipt_search import search_receipts, ReceiptSearchError
+from services.receipt_summary import summarize_receipts
+from services.job_queue import OCRJobQueue, JobQueueFullError
+from services.db_writer import db_writer
+from services.upload_ingest import ingest_upload, UploadIngestError
+from services.receipt_query import ReceiptQuery, ReceiptQueryError, QUERY_PARAMS, LIST_FIELDS, parse_fields, load_fields
 import uuid
-from PIL import Image
 from datetime import datetime
 from config import config
 from functools import wraps
@@ -16,7 +26,6 @@ from decimal import Decimal, InvalidOperation
 import time
 from .errors import APIError
 from auth.decorators import require_auth
-import json
 
 # Configure logging
 logger = logging.getLogger('api.routes')
@@ -24,6 +33,7 @@ logger = logging.getLogger('api.routes')
 # Initialize services
 ocr_service = OCRService()
 categorization_service = CategorizationService()
+ocr_job_queue = OCRJobQueue(writer=db_writer)
 
 # Configure allowed file extensions
 ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif', 'pdf'}
@@ -34,15 +44,38 @@ def allowed_file(filename):
 
 api_bp = Blueprint('api', __name__)
 
-def verify_image(filepath):
-    """Verify image was saved correctly"""
+def is_async_request():
+    """Whether the client asked for the upload to be processed in the background"""
+    value = request.args.get('async') or request.form.get('async') or ''
+    return value.lower() in ('1', 'true', 'yes')
+
+def discard_upload(filepath):
+    """Remove a saved upload that will not become a receipt"""
     try:
-        with Image.open(filepath) as img:
-            logger.info(f"Image verified: {filepath} ({img.size}, {img.mode})")
-            return True
-    except Exception as e:
-        logger.error(f"Image verification failed: {str(e)}")
-        return False
+        os.remove(filepath)
+    except OSError:
+        pass
+
+def save_upload(file, keep_data=True):
+    """Stream an uploaded file to the upload folder and verify it is an image"""
+    # Generate unique filename
+    original_filename = secure_filename(file.filename)
+    saved_filename = f"{uuid.uuid4()}_{original_filename}"
+    filepath = os.path.join(current_app.config['UPLOAD_FOLDER'], saved_filename)
+
+    # Save, hash and verify the file in a single pass over the upload
+    try:
+        upload = ingest_upload(file.stream, filepath, keep_data=keep_data)
+    except UploadIngestError as e:
+        raise APIError("Failed to save uploaded file", status_code=500, details={'error': str(e)})
+    logger.info(f"File saved to: {filepath}")
+
+    if not upload.is_supported:
+        logger.error(f"Image verification failed: {filepath} ({upload.kind}, {upload.dimensions})")
+        discard_upload(filepath)
+        raise APIError("Failed to verify saved image", status_code=400)
+
+    return upload, saved_filename, original_filename
 
 def validate_request(f):
     @wraps(f)
@@ -56,6 +89,32 @@ def validate_request(f):
         return f(*args, **kwargs)
     return decorated_function
 
+def conditional_on_data_version(f):
+    """Answer If-None-Match with 304 when the user's data version has not moved.
+
+    Use below require_auth. The ETag covers the user's data version, the
+    endpoint and its query string, so a matching request is answered from
+    one primary-key lookup without touching the receipts table. The version
+    is read before the handler runs; a write that lands in between only
+    makes the next request miss, never serves stale data.
+    """
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        db = get_db()
+        version = get_data_version(db, g.user.id)
+        etag = data_version_etag(g.user.id, version, request.endpoint, sorted(request.args.items(multi=True)))
+
+        if request.if_none_match.contains(etag):
+            response = Response(status=HTTPStatus.NOT_MODIFIED)
+        else:
+            response = make_response(f(*args, **kwargs))
+            if response.status_code != HTTPStatus.OK:
+                return response
+        response.set_etag(etag)
+        response.headers['Cache-Control'] = 'private, no-cache'
+        return response
+    return decorated_function
+
 def validate_field_values(data, receipt_id):
     errors = {}
     
@@ -132,58 +191,37 @@ def upload_file():
         
         logger.info(f"Processing file: {file.filename}")
         
-        # Generate unique filename
-        original_filename = secure_filename(file.filename)
-        saved_filename = f"{uuid.uuid4()}_{original_filename}"
-        filepath = os.path.join(current_app.config['UPLOAD_FOLDER'], saved_filename)
-        
-        # Save file
-        file.save(filepath)
-        logger.info(f"File saved to: {filepath}")
+        # Queued jobs read the image back from disk, so only keep the body for inline OCR
+        async_request = is_async_request()
+        upload, saved_filename, original_filename = save_upload(file, keep_data=not async_request)
+        filepath = upload.path
         
-        # Verify image
-        if not verify_image(filepath):
-            raise APIError("Failed to verify saved image", status_code=400)
-        
-        try:
-            # Process with OCR
-            ocr_result = OCRService.extract_receipt_data(filepath)
-            receipt_data = ocr_result['content']
-            
-            # Add validation for OCR failure
-            if isinstance(receipt_data, str):  # It's an error message
-                raise APIError("OCR processing failed", 
-                              status_code=500, 
-                              details={'error': receipt_data})
-            
-            logger.info(f"Receipt data: {receipt_data}")
-            
-            # Add categorization step
+        # Hand off to the background OCR pool when the client asks for it
+        if async_request:
             try:
-                category = CategorizationService.categorize_receipt(receipt_data)
-                logger.info(f"Categorized as: {category}")
-            except Exception as e:
-                logger.error(f"Categorization error: {str(e)}")
-                category = "Other expenses"
+                job = ocr_job_queue.enqueue(g.user.id, saved_filename, original_filename)
+            except JobQueueFullError as e:
+                discard_upload(filepath)
+                raise APIError("OCR queue is full, please retry later", status_code=503, details={'error': str(e)})
+
+            response = job.to_dict()
+            response['status_url'] = f"/api/jobs/{job.id}"
+            return jsonify(response), HTTPStatus.ACCEPTED
+
+        try:
+            # Process with OCR and categorize
+            receipt_data, category = extract_and_categorize(filepath, upload.data, upload.sha256, user_id=g.user.id)
             
             # Save to database
-            with get_db() as db:
-                receipt = Receipt(
-                    image_path=saved_filename,
-                    content=json.dumps(receipt_data),  # Serialize dict to JSON string
-                    user_id=g.user.id,
-                    category=category,
-                    vendor=receipt_data.get('Vendor', ''),
-                    amount=receipt_data.get('Amount', '0.00'),
-                    date=receipt_data.get('Date', ''),
-                    payment_method=receipt_data.get('Payment_Method', ''),
-                    status='Pending'
-                )
+            receipt = build_receipt(receipt_data, category, saved_filename, g.user.id)
+
+            def add_receipt(db):
                 db.add(receipt)
-                db.commit()
-                
-                return jsonify(receipt.to_dict())
-                
+                db.flush()
+                return receipt.to_dict()
+
+            return jsonify(db_writer.run(add_receipt))
+            
         except Exception as e:
             # Clean up file if processing failed
             try:
@@ -199,24 +237,143 @@ def upload_file():
         logger.error(f"Upload error: {str(e)}")
         raise APIError("Failed to upload receipt", status_code=500, details={'error': str(e)})
 
+@api_bp.route('/upload/batch', methods=['POST'])
+@require_auth
+def upload_batch():
+    """Upload many receipts at once, running OCR for them concurrently"""
+    files = [f for f in request.files.getlist('files') if f.filename]
+    if not files:
+        raise APIError("No files in request", status_code=400)
+    if len(files) > config.upload_batch_max_files:
+        raise APIError(
+            "Too many files in batch",
+            status_code=400,
+            details={'max_files': config.upload_batch_max_files, 'received': len(files)}
+        )
+
+    logger.info(f"Received batch upload of {len(files)} files")
+    user_id = g.user.id
+    max_file_size = current_app.config.get('MAX_CONTENT_LENGTH')
+    results = [None] * len(files)
+
+    # Save and verify every file first; buffers are not kept so memory stays flat
+    saved = []
+    for index, file in enumerate(files):
+        try:
+            upload, saved_filename, _ = save_upload(file, keep_data=False)
+            if max_file_size and upload.size > max_file_size:
+                discard_upload(upload.path)
+                raise APIError("File too large", status_code=413)
+            saved.append((index, upload, saved_filename))
+        except APIError as e:
+            results[index] = {'filename': file.filename, 'success': False, 'error': e.message}
+
+    # OCR and categorize concurrently on the shared event loop; wall time tracks the slowest file
+    receipts = []
+    if saved:
+        outcomes = run_async(extract_and_categorize_many(
+            [(upload.path, upload.sha256) for _, upload, _ in saved], user_id=user_id
+        ))
+        for (index, upload, saved_filename), outcome in zip(saved, outcomes):
+            if isinstance(outcome, Exception):
+                logger.error(f"Processing error for {files[index].filename}: {str(outcome)}")
+                discard_upload(upload.path)
+                results[index] = {'filename': files[index].filename, 'success': False, 'error': str(outcome)}
+                continue
+            receipt_data, category = outcome
+            receipts.append((index, upload, build_receipt(receipt_data, category, saved_filename, user_id)))
+
+    # Save all successful receipts in one transaction
+    if receipts:
+        def add_receipts(db):
+            db.add_all([receipt for _, _, receipt in receipts])
+            db.flush()
+            return [receipt.to_dict() for _, _, receipt in receipts]
+
+        try:
+            saved_receipts = db_writer.run(add_receipts)
+        except Exception as e:
+            for _, upload, _ in receipts:
+                discard_upload(upload.path)
+            logger.error(f"Failed to save batch: {str(e)}")
+            raise APIError("Failed to save receipts", status_code=500, details={'error': str(e)})
+
+        for (index, _, _), receipt in zip(receipts, saved_receipts):
+            results[index] = {'filename': files[index].filename, 'success': True, 'receipt': receipt}
+
+    succeeded = len(receipts)
+    logger.info(f"Batch upload finished: {succeeded} succeeded, {len(files) - succeeded} failed")
+    return jsonify({
+        'results': results,
+        'succeeded': succeeded,
+        'failed': len(files) - succeeded
+    })
+
+@api_bp.route('/jobs/<job_id>', methods=['GET'])
+@require_auth
+def get_job(job_id):
+    """Get the status of a background OCR job"""
+    try:
+        db = get_db()
+        job = db.query(OCRJob).get(job_id)
+        if not job or job.user_id != g.user.id:
+            raise APIError("Job not found", status_code=404)
+
+        response = job.to_dict()
+        if job.status == OCRJob.COMPLETED and job.receipt_id:
+            receipt = db.query(Receipt).get(job.receipt_id)
+            response['receipt'] = receipt.to_dict() if receipt else None
+        return jsonify(response)
+    except APIError:
+        raise
+    except Exception as e:
+        logger.error(f"Failed to get job {job_id}: {str(e)}")
+        raise APIError("Failed to fetch job", status_code=500)
+
 @api_bp.route('/receipts', methods=['GET'])
 @require_auth
+@conditional_on_data_version
 def get_receipts():
+    """List the user's receipts.
+
+    With any of category, status, payment_method, vendor, date_from,
+    date_to, amount_min, amount_max, sort, limit or cursor the receipts are
+    filtered, sorted and paginated in SQL and returned as
+    {"receipts": [...], "next_cursor": ..., "limit": ...}. Pass next_cursor
+    back as cursor for the following page. Without them every receipt is
+    returned as a list, as before.
+
+    fields=vendor,amount,... limits each receipt to those fields. Pages
+    leave out the OCR content unless fields asks for it; the plain list
+    still includes it.
+    """
     start_time = time.time()
     logger.info("API: Received GET /receipts request")
+    paginated = bool(QUERY_PARAMS.intersection(request.args))
     try:
-        with get_db() as db:
-            # Log the query we're about to make
-            logger.info(f"Database: Getting receipts for user_id: {g.user.id}")
-            
-            # Get all receipts and log their IDs
-            receipts = db.query(Receipt).filter(Receipt.user_id == g.user.id).all()
-            receipt_ids = [r.id for r in receipts]
-            logger.info(f"Database: Found receipts with IDs: {receipt_ids}")
-            
-            response = [r.to_dict() for r in receipts]
-            logger.info(f"API: Sending response with {len(response)} receipts")
-            return jsonify(response)
+        receipt_query = ReceiptQuery.from_args(request.args) if paginated else None
+        fields = parse_fields(request.args.get('fields'), LIST_FIELDS if paginated else None)
+    except ReceiptQueryError as e:
+        raise APIError(str(e), status_code=400)
+
+    try:
+        db = get_db()
+        logger.info(f"Database: Getting receipts for user_id: {g.user.id}")
+
+        if not paginated:
+            receipts = db.query(Receipt).options(*load_fields(fields))\
+                         .filter(Receipt.user_id == g.user.id).all()
+            logger.info(f"API: Sending response with {len(receipts)} receipts")
+            return jsonify([r.to_dict(fields) for r in receipts])
+
+        query = db.query(Receipt).options(*load_fields(fields, receipt_query.sort_column))
+        receipts, next_cursor = receipt_query.page(query, g.user.id)
+        logger.info(f"API: Sending page of {len(receipts)} receipts (more: {next_cursor is not None})")
+        return jsonify({
+            'receipts': [r.to_dict(fields) for r in receipts],
+            'next_cursor': next_cursor,
+            'limit': receipt_query.limit
+        })
     except Exception as e:
         logger.error(f"Failed to get receipts: {str(e)}")
         raise APIError("Failed to fetch receipts", status_code=500)
@@ -224,21 +381,86 @@ def get_receipts():
         execution_time = time.time() - start_time
         logger.info(f"Execution time for get_receipts: {execution_time:.2f} seconds")
 
+@api_bp.route('/receipts/search', methods=['GET'])
+@require_auth
+@conditional_on_data_version
+def search_user_receipts():
+    """Full-text search over the user's receipts.
+
+    q is matched word by word (as prefixes) against vendor, payment method
+    and OCR text. Returns {"results": [{"receipt", "snippet", "score"}],
+    "next_offset": ...}, best match first; pass next_offset back as offset
+    for the following page.
+    """
+    try:
+        limit = int(request.args.get('limit') or 0) or None
+        offset = int(request.args.get('offset') or 0)
+        fields = parse_fields(request.args.get('fields'), LIST_FIELDS)
+    except ValueError:
+        raise APIError("limit and offset must be integers", status_code=400)
+    except ReceiptQueryError as e:
+        raise APIError(str(e), status_code=400)
+
+    try:
+        db = get_db()
+        hits, more = search_receipts(db, g.user.id, request.args.get('q', ''), limit, offset)
+        receipts = db.query(Receipt).options(*load_fields(fields))\
+                     .filter(Receipt.id.in_([hit.receipt_id for hit in hits]), Receipt.user_id == g.user.id)\
+                     .all()
+        by_id = {receipt.id: receipt for receipt in receipts}
+
+        return jsonify({
+            'results': [{
+                'receipt': by_id[hit.receipt_id].to_dict(fields),
+                'snippet': hit.snippet,
+                'score': hit.score
+            } for hit in hits if hit.receipt_id in by_id],
+            'next_offset': offset + len(hits) if more else None
+        })
+    except ReceiptSearchError as e:
+        raise APIError(str(e), status_code=400)
+    except Exception as e:
+        logger.error(f"Failed to search receipts: {str(e)}")
+        raise APIError("Failed to search receipts", status_code=500)
+
 @api_bp.route('/receipts/<int:receipt_id>', methods=['GET'])
 def get_receipt(receipt_id):
-    """Get a single receipt by ID"""
+    """Get a single receipt by ID, limited to fields=... if given"""
     try:
-        with get_db() as db:
-            receipt = db.query(Receipt).get(receipt_id)
-            if not receipt:
-                raise APIError("Receipt not found", status_code=404)
-            return jsonify(receipt.to_dict())
+        fields = parse_fields(request.args.get('fields'))
+    except ReceiptQueryError as e:
+        raise APIError(str(e), status_code=400)
+
+    try:
+        db = get_db()
+        receipt = db.query(Receipt).options(*load_fields(fields)).filter(Receipt.id == receipt_id).first()
+        if not receipt:
+            raise APIError("Receipt not found", status_code=404)
+        return jsonify(receipt.to_dict(fields))
     except APIError:
         raise
     except Exception as e:
         logger.error(f"Failed to get receipt {receipt_id}: {str(e)}")
         raise APIError("Failed to fetch receipt", status_code=500)
 
+@api_bp.route('/receipts/<int:receipt_id>/content', methods=['GET'])
+@require_auth
+def get_receipt_content(receipt_id):
+    """The OCR content JSON of one of the user's receipts"""
+    try:
+        db = get_db()
+        row = db.query(Receipt.content)\
+                .filter(Receipt.id == receipt_id, Receipt.user_id == g.user.id)\
+                .first()
+        if not row:
+            raise APIError("Receipt not found", status_code=404)
+        return jsonify({'id': receipt_id, 'content': row.content})
+    except APIError:
+        raise
+    except Exception as e:
+        logger.error(f"Failed to get content for receipt {receipt_id}: {str(e)}")
+        raise APIError("Failed to fetch receipt content", status_code=500)
+
 @api_bp.route('/receipts/<int:receipt_id>/update', methods=['PATCH'])
 @validate_request
 def update_receipt_fields(receipt_id):
@@ -253,58 +475,58 @@ def update_receipt_fields(receipt_id):
             details=validation_errors
         )
 
+    def update_fields(db):
+        receipt = db.query(Receipt).get(receipt_id)
+        if not receipt:
+            raise APIError("Receipt not found", status_code=404)
+
+        # Track changes and update fields
+        updated_fields = {}
+        for field in ['vendor', 'amount', 'date', 'payment_method', 'category', 'status']:
+            # Only update fields present in the request data
+            if field in data:
+                old_value = getattr(receipt, field)
+                new_value = data[field]
+
+                if old_value != new_value:
+                    # Create change history record
+                    change = ReceiptChangeHistory(
+                        receipt_id=receipt_id,
+                        field_name=field,
+                        new_value=new_value,
+                        changed_at=datetime.utcnow(),
+                        changed_by="system"  # Replace with actual user ID when auth is implemented
+                    )
+                    db.add(change)
+
+                    # Update receipt field
+                    setattr(receipt, field, new_value)
+                    updated_fields[field] = new_value
+
+        # Return the full receipt data, preserving all fields
+        receipt_data = {
+            "id": receipt.id,
+            "image_path": receipt.image_path,
+            "vendor": receipt.vendor,
+            "amount": receipt.amount,
+            "date": receipt.date,
+            "payment_method": receipt.payment_method,
+            "category": receipt.category,
+            "status": receipt.status,
+            "content": receipt.content,
+        }
+        return updated_fields, receipt_data
+
     try:
-        with get_db() as db:
-            receipt = db.query(Receipt).get(receipt_id)
-            if not receipt:
-                raise APIError("Receipt not found", status_code=404)
-
-            # Track changes and update fields
-            updated_fields = {}
-            for field in ['vendor', 'amount', 'date', 'payment_method', 'category', 'status']:
-                # Only update fields present in the request data
-                if field in data:
-                    old_value = getattr(receipt, field)
-                    new_value = data[field]
-
-                    if old_value != new_value:
-                        # Create change history record
-                        change = ReceiptChangeHistory(
-                            receipt_id=receipt_id,
-                            field_name=field,
-                            new_value=new_value,
-                            changed_at=datetime.utcnow(),
-                            changed_by="system"  # Replace with actual user ID when auth is implemented
-                        )
-                        db.add(change)
-
-                        # Update receipt field
-                        setattr(receipt, field, new_value)
-                        updated_fields[field] = new_value
-
-            # Commit the changes
-            db.commit()
-
-            # Return the full receipt data, preserving all fields
-            receipt_data = {
-                "id": receipt.id,
-                "image_path": receipt.image_path,
-                "vendor": receipt.vendor,
-                "amount": receipt.amount,
-                "date": receipt.date,
-                "payment_method": receipt.payment_method,
-                "category": receipt.category,
-                "status": receipt.status,
-                "content": receipt.content,
-            }
-
-            return jsonify({
-                "success": True,
-                "receipt_id": receipt_id,
-                "updated_fields": updated_fields,
-                "updated_at": datetime.utcnow().isoformat(),
-                "receipt": receipt_data,
-            }), HTTPStatus.OK
+        updated_fields, receipt_data = db_writer.run(update_fields)
+
+        return jsonify({
+            "success": True,
+            "receipt_id": receipt_id,
+            "updated_fields": updated_fields,
+            "updated_at": datetime.utcnow().isoformat(),
+            "receipt": receipt_data,
+        }), HTTPStatus.OK
 
     except APIError:
         raise
@@ -319,33 +541,34 @@ def update_receipt_fields(receipt_id):
 @api_bp.route('/receipts/<int:receipt_id>', methods=['DELETE'])
 def delete_receipt(receipt_id):
     """Delete a receipt"""
+    def delete(db):
+        receipt = db.query(Receipt).get(receipt_id)
+        if not receipt:
+            logger.warning(f"Attempted to delete non-existent receipt: {receipt_id}")
+            raise APIError("Receipt not found", status_code=404)
+
+        logger.info(f"Found receipt to delete: ID={receipt_id}, user_id={receipt.user_id}")
+        db.delete(receipt)
+        return receipt.image_path
+
     try:
-        with get_db() as db:
-            logger.info(f"Starting delete operation for receipt_id: {receipt_id}")
-            receipt = db.query(Receipt).get(receipt_id)
-            if not receipt:
-                logger.warning(f"Attempted to delete non-existent receipt: {receipt_id}")
-                raise APIError("Receipt not found", status_code=404)
+        logger.info(f"Starting delete operation for receipt_id: {receipt_id}")
 
-            logger.info(f"Found receipt to delete: ID={receipt_id}, user_id={receipt.user_id}")
+        # Delete database record, then the image once the delete has committed
+        filename = db_writer.run(delete)
+        logger.info(f"Successfully deleted receipt {receipt_id} from database")
 
-            # Delete image file
-            try:
-                image_path = os.path.join(current_app.config['UPLOAD_FOLDER'], receipt.image_path)
-                if os.path.exists(image_path):
-                    os.remove(image_path)
-                    logger.info(f"Successfully deleted image file: {image_path}")
-            except Exception as e:
-                logger.error(f"Failed to delete image for receipt {receipt_id}: {str(e)}")
-                raise APIError("Failed to delete image file", status_code=500)
-
-            # Delete database record
-            db.delete(receipt)
-            db.commit()
-            logger.info(f"Successfully deleted receipt {receipt_id} from database")
-            
-            return jsonify({'message': 'Receipt deleted successfully'})
-            
+        try:
+            image_path = os.path.join(current_app.config['UPLOAD_FOLDER'], filename)
+            if os.path.exists(image_path):
+                os.remove(image_path)
+                logger.info(f"Successfully deleted image file: {image_path}")
+        except Exception as e:
+            logger.error(f"Failed to delete image for receipt {receipt_id}: {str(e)}")
+            raise APIError("Failed to delete image file", status_code=500)
+
+        return jsonify({'message': 'Receipt deleted successfully'})
+        
     except APIError:
         raise
     except Exception as e:
@@ -366,24 +589,24 @@ def get_image(filename):
 @api_bp.route('/receipts/<int:receipt_id>/history', methods=['GET'])
 def get_receipt_history(receipt_id):
     try:
-        with get_db() as db:
-            # Verify receipt exists
-            receipt = db.query(Receipt).get(receipt_id)
-            if not receipt:
-                raise APIError("Receipt not found", status_code=404)
-
-            # Get changes ordered by timestamp
-            changes = db.query(ReceiptChangeHistory)\
-                       .filter(ReceiptChangeHistory.receipt_id == receipt_id)\
-                       .order_by(ReceiptChangeHistory.changed_at.desc())\
-                       .all()
-
-            return jsonify([{
-                'field': change.field_name,
-                'new_value': change.new_value,
-                'changed_at': change.changed_at.isoformat(),
-                'changed_by': change.changed_by
-            } for change in changes])
+        db = get_db()
+        # Verify receipt exists
+        receipt = db.query(Receipt).get(receipt_id)
+        if not receipt:
+            raise APIError("Receipt not found", status_code=404)
+
+        # Get changes ordered by timestamp
+        changes = db.query(ReceiptChangeHistory)\
+                   .filter(ReceiptChangeHistory.receipt_id == receipt_id)\
+                   .order_by(ReceiptChangeHistory.changed_at.desc())\
+                   .all()
+
+        return jsonify([{
+            'field': change.field_name,
+            'new_value': change.new_value,
+            'changed_at': change.changed_at.isoformat(),
+            'changed_by': change.changed_by
+        } for change in changes])
 
     except APIError:
         raise
@@ -461,19 +684,50 @@ def categorize_text():
         )
 
 @api_bp.route('/options', methods=['GET'])
+@require_auth
+@conditional_on_data_version
 def get_options():
     """Get all available options for filters"""
     try:
-        with get_db() as db:
-            # Get unique vendors from database
-            vendors = [r[0] for r in db.query(Receipt.vendor).distinct().all() if r[0] != 'Missing']
-            
-            return jsonify({
-                'categories': config.expense_categories,
-                'payment_methods': config.payment_methods,
-                'statuses': config.receipt_statuses,
-                'vendors': sorted(vendors)
-            })
+        db = get_db()
+        # Unique vendors for this user, read from ix_receipts_user_vendor
+        vendors = [r[0] for r in db.query(Receipt.vendor)
+                                     .filter(Receipt.user_id == g.user.id)
+                                     .distinct().all() if r[0] and r[0] != 'Missing']
+        
+        return jsonify({
+            'categories': config.expense_categories,
+            'payment_methods': config.payment_methods,
+            'statuses': config.receipt_statuses,
+            'vendors': sorted(vendors)
+        })
     except Exception as e:
         logger.error(f"Failed to get options: {str(e)}")
-        raise APIError("Failed to fetch options", status_code=500, details={'error': str(e)})
\ No newline at end of file
+        raise APIError("Failed to fetch options", status_code=500, details={'error': str(e)})
+
+@api_bp.route('/summary', methods=['GET'])
+@require_auth
+@conditional_on_data_version
+def get_summary():
+    """Spending totals by category, month and status for the dashboard and Form 1040 pages.
+
+    Pass tax_year to limit the totals to one year; tax_years lists every
+    year the user has receipts in.
+    """
+    try:
+        tax_year = int(request.args['tax_year']) if request.args.get('tax_year') else None
+    except ValueError:
+        raise APIError("tax_year must be an integer", status_code=400)
+
+    try:
+        db = get_db()
+        return jsonify(summarize_receipts(db, g.user.id, tax_year))
+    except Exception as e:
+        logger.error(f"Failed to summarize receipts: {str(e)}")
+        raise APIError("Failed to summarize receipts", status_code=500, details={'error': str(e)})
+
+@api_bp.route('/metrics', methods=['GET'])
+def get_metrics():
+    """LLM call, cache and vendor index metrics in Prometheus text format"""
+    body, content_type = render_metrics()
+    return Response(body, content_type=content_type)
@@ -1,6 +1,6 @@
-from flask import Flask, jsonify
+from flask import Flask, Request, jsonify, current_app
 from flask_cors import CORS
-from api.routes import api_bp
+from api.routes import api_bp, ocr_job_queue
 from config import config
 import logging
 from werkzeug.middleware.proxy_fix import ProxyFix
@@ -8,7 +8,7 @@ from werkzeug.exceptions import HTTPException
 from api.errors import APIError, handle_api_error, handle_http_error, handle_generic_error
 from api.auth import auth_bp
 from models import User, Receipt
-from database import init_db
+from database import init_db, close_db
 import os
 
 # Configure logging
@@ -17,9 +17,21 @@ logging.basicConfig(
     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
 )
 
+class UploadRequest(Request):
+    """Request that allows a larger body for multi-file batch uploads"""
+    @property
+    def max_content_length(self):
+        if current_app and self.endpoint == 'api.upload_batch':
+            return current_app.config['BATCH_MAX_CONTENT_LENGTH']
+        return super().max_content_length
+
 app = Flask(__name__)
+app.request_class = UploadRequest
 init_db()
 
+# One database session per request, shared by require_auth and the route
+app.teardown_appcontext(close_db)
+
 # Create upload directory if it doesn't exist
 upload_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'uploads')
 os.makedirs(upload_dir, exist_ok=True)
@@ -43,8 +55,12 @@ app.wsgi_app = ProxyFix(app.wsgi_app, x_proto=1, x_host=1)
 app.config['UPLOAD_FOLDER'] = upload_dir
 app.config['UPLOAD_TIMEOUT'] = 120
 app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB max file size
+app.config['BATCH_MAX_CONTENT_LENGTH'] = config.upload_batch_max_bytes  # whole /upload/batch body
 app.config['PROPAGATE_EXCEPTIONS'] = True  # Enable full error reporting
 
+# Resume OCR jobs left unfinished by a previous run
+ocr_job_queue.init_app(app)
+
 # Register error handlers
 app.register_error_handler(APIError, handle_api_error)
 app.register_error_handler(HTTPException, handle_http_error)
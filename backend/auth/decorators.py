@@ -3,6 +3,7 @@ from flask import request, g
 from werkzeug.exceptions import Unauthorized
 from database import get_db
 from models.user import User
+from services.user_cache import user_cache
 from .jwt import decode_token
 import logging
 
@@ -20,15 +21,20 @@ def require_auth(f):
             
         token = auth_header.split(' ')[1]
         try:
-            payload = decode_token(token)
-            user_id = payload['user_id']
-            db = get_db()
-            user = db.query(User).filter(User.id == user_id).first()
-            
-            if not user:
-                logger.error(f"User not found: {user_id}")  # Debug log
-                raise Unauthorized('User not found')
-                
+            user = user_cache.get(token)
+            if user is None:
+                payload = decode_token(token)
+                user_id = payload['user_id']
+                generation = user_cache.generation(user_id)
+                db = get_db()
+                row = db.query(User).filter(User.id == user_id).first()
+
+                if not row:
+                    logger.error(f"User not found: {user_id}")  # Debug log
+                    raise Unauthorized('User not found')
+
+                user = user_cache.put(token, row, payload.get('exp'), generation)
+
             g.user = user
             
         except Exception as e:
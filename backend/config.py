@@ -7,6 +7,37 @@ class Config:
         # Database path relative to this file (config.py)
         self.db_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'receipts.db')
         self.upload_folder = os.getenv('UPLOAD_FOLDER', 'uploads')
+        self.upload_chunk_size = int(os.getenv('UPLOAD_CHUNK_SIZE', 64 * 1024))
+        self.upload_probe_max_bytes = int(os.getenv('UPLOAD_PROBE_MAX_BYTES', 256 * 1024))  # image header search limit
+
+        # Multi-file batch uploads
+        self.upload_batch_max_files = int(os.getenv('UPLOAD_BATCH_MAX_FILES', 200))
+        self.upload_batch_workers = int(os.getenv('UPLOAD_BATCH_WORKERS', 8))  # extractions in flight per batch
+        self.upload_batch_max_bytes = int(os.getenv('UPLOAD_BATCH_MAX_BYTES', 512 * 1024 * 1024))
+
+        # Database connection pool (file databases only)
+        self.db_pool_size = int(os.getenv('DB_POOL_SIZE', 5))
+        self.db_max_overflow = int(os.getenv('DB_MAX_OVERFLOW', 10))
+        self.db_pool_recycle = int(os.getenv('DB_POOL_RECYCLE', 1800))  # seconds
+        self.db_pool_timeout = int(os.getenv('DB_POOL_TIMEOUT', 30))  # seconds to wait for a connection
+
+        # One writer thread per process for database mutations (file databases only)
+        self.db_writer_enabled = os.getenv('DB_WRITER_ENABLED', 'true').lower() == 'true'
+        self.db_writer_max_batch = int(os.getenv('DB_WRITER_MAX_BATCH', 64))  # writes per commit
+        self.db_writer_max_delay_ms = float(os.getenv('DB_WRITER_MAX_DELAY_MS', 0))  # wait for more writes before committing
+        self.db_writer_timeout_seconds = int(os.getenv('DB_WRITER_TIMEOUT_SECONDS', 30))
+
+        # SQLite pragmas applied to every new connection
+        self.sqlite_journal_mode = os.getenv('SQLITE_JOURNAL_MODE', 'WAL')
+        self.sqlite_synchronous = os.getenv('SQLITE_SYNCHRONOUS', 'NORMAL')
+        self.sqlite_cache_size = int(os.getenv('SQLITE_CACHE_SIZE', -64000))  # negative = KiB, so 64 MB
+        self.sqlite_mmap_size = int(os.getenv('SQLITE_MMAP_SIZE', 256 * 1024 * 1024))
+        self.sqlite_busy_timeout = int(os.getenv('SQLITE_BUSY_TIMEOUT', 5000))  # ms
+        self.sqlite_temp_store = os.getenv('SQLITE_TEMP_STORE', 'MEMORY')
+
+        # GET /api/receipts pagination
+        self.receipts_page_size = int(os.getenv('RECEIPTS_PAGE_SIZE', 50))
+        self.receipts_max_page_size = int(os.getenv('RECEIPTS_MAX_PAGE_SIZE', 200))
         
         # Single source of truth for expense categories
         self.expense_categories = [
@@ -50,6 +81,69 @@ class Config:
             "Rejected"
         ]
 
+        # Shared OpenAI HTTP transport (timeouts in seconds)
+        self.openai_connect_timeout = float(os.getenv('OPENAI_CONNECT_TIMEOUT', 5.0))
+        self.openai_read_timeout = float(os.getenv('OPENAI_READ_TIMEOUT', 60.0))
+        self.openai_max_connections = int(os.getenv('OPENAI_MAX_CONNECTIONS', 50))
+        self.openai_max_keepalive_connections = int(os.getenv('OPENAI_MAX_KEEPALIVE_CONNECTIONS', 20))
+        self.openai_max_retries = int(os.getenv('OPENAI_MAX_RETRIES', 2))
+
+        # Authenticated users cached per token by require_auth (in-process; other
+        # workers see a user change once their entries expire)
+        self.user_cache_enabled = os.getenv('USER_CACHE_ENABLED', 'true').lower() == 'true'
+        self.user_cache_max_entries = int(os.getenv('USER_CACHE_MAX_ENTRIES', 10000))
+        self.user_cache_ttl_seconds = int(os.getenv('USER_CACHE_TTL_SECONDS', 60))
+
+        # Background OCR job queue
+        self.ocr_worker_count = int(os.getenv('OCR_WORKER_COUNT', 2))
+        self.ocr_queue_size = int(os.getenv('OCR_QUEUE_SIZE', 50))
+        self.ocr_job_lease_seconds = int(os.getenv('OCR_JOB_LEASE_SECONDS', 300))
+
+        # OCR result cache (in-process LRU budget in bytes, backed by the ocr_cache table)
+        self.ocr_cache_enabled = os.getenv('OCR_CACHE_ENABLED', 'true').lower() == 'true'
+        self.ocr_cache_max_bytes = int(os.getenv('OCR_CACHE_MAX_BYTES', 32 * 1024 * 1024))
+
+        # Memoized categorization (in-process TTL LRU, optionally shared through
+        # the categorization_cache table so every worker benefits)
+        self.categorization_cache_enabled = os.getenv('CATEGORIZATION_CACHE_ENABLED', 'true').lower() == 'true'
+        self.categorization_cache_max_entries = int(os.getenv('CATEGORIZATION_CACHE_MAX_ENTRIES', 10000))
+        self.categorization_cache_ttl_seconds = int(os.getenv('CATEGORIZATION_CACHE_TTL_SECONDS', 7 * 24 * 3600))
+        self.categorization_cache_shared = os.getenv('CATEGORIZATION_CACHE_SHARED', 'true').lower() == 'true'
+
+        # OCR extraction backend: openai, record, replay or stub. record saves live
+        # responses under ocr_replay_dir keyed by image hash; replay and stub serve
+        # responses offline with synthetic latency for load testing
+        self.ocr_backend = os.getenv('OCR_BACKEND', 'openai').lower()
+        self.ocr_replay_dir = os.getenv('OCR_REPLAY_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'ocr_replay'))
+        self.ocr_replay_fallback_stub = os.getenv('OCR_REPLAY_FALLBACK_STUB', 'false').lower() == 'true'
+        self.ocr_backend_latency_ms = float(os.getenv('OCR_BACKEND_LATENCY_MS', 0))
+        self.ocr_backend_latency_jitter_ms = float(os.getenv('OCR_BACKEND_LATENCY_JITTER_MS', 0))
+
+        # Constrain OCR responses with a JSON schema instead of repairing free text
+        self.ocr_structured_outputs = os.getenv('OCR_STRUCTURED_OUTPUTS', 'true').lower() == 'true'
+
+        # Ask the OCR call for the expense category too; the separate
+        # categorization call then only runs when that answer is unusable
+        self.ocr_combined_categorization = os.getenv('OCR_COMBINED_CATEGORIZATION', 'true').lower() == 'true'
+
+        # Per-user vendor history used to categorize without calling the LLM
+        self.vendor_index_enabled = os.getenv('VENDOR_INDEX_ENABLED', 'true').lower() == 'true'
+        self.vendor_index_min_support = int(os.getenv('VENDOR_INDEX_MIN_SUPPORT', 2))
+        self.vendor_index_min_confidence = float(os.getenv('VENDOR_INDEX_MIN_CONFIDENCE', 0.8))
+        self.vendor_index_correction_weight = int(os.getenv('VENDOR_INDEX_CORRECTION_WEIGHT', 3))
+        self.vendor_index_ttl_seconds = int(os.getenv('VENDOR_INDEX_TTL_SECONDS', 300))
+
+        # Image pre-processing before OCR
+        self.ocr_preprocess_enabled = os.getenv('OCR_PREPROCESS_ENABLED', 'true').lower() == 'true'
+        self.ocr_image_max_dimension = int(os.getenv('OCR_IMAGE_MAX_DIMENSION', 2048))
+        self.ocr_image_quality = int(os.getenv('OCR_IMAGE_QUALITY', 80))
+        self.ocr_image_grayscale = os.getenv('OCR_IMAGE_GRAYSCALE', 'true').lower() == 'true'
+
+        # PDF rasterization
+        self.pdf_render_dpi = int(os.getenv('PDF_RENDER_DPI', 150))
+        self.pdf_max_pages = int(os.getenv('PDF_MAX_PAGES', 20))
+        self.pdf_page_workers = int(os.getenv('PDF_PAGE_WORKERS', 4))
+
     # JWT configurations
     JWT_ACCESS_TOKEN_EXPIRES = timedelta(minutes=int(os.getenv('TOKEN_EXPIRE_MINUTES', 30)))
     REFRESH_TOKEN_EXPIRE_DAYS = 7
@@ -1,18 +1,117 @@
-from sqlalchemy import create_engine
+from flask import g, has_app_context
+from sqlalchemy import create_engine, event
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 from config import config
-import os
+import logging
+
+logger = logging.getLogger(__name__)
 
-print(f"[database.py] Current working directory: {os.getcwd()}")
-print(f"[database.py] Database path from config: {config.db_path}")
 SQLALCHEMY_DATABASE_URL = f"sqlite:///{config.db_path}"
-print(f"[database.py] Full database URL: {SQLALCHEMY_DATABASE_URL}")
+
+def engine_options():
+    """Pool settings for the engine; in-memory SQLite keeps its single-connection pool"""
+    if config.db_path == ':memory:':
+        return {}
+    return {
+        'pool_size': config.db_pool_size,
+        'max_overflow': config.db_max_overflow,
+        'pool_recycle': config.db_pool_recycle,
+        'pool_timeout': config.db_pool_timeout,
+    }
+
+JOURNAL_MODES = {'DELETE', 'TRUNCATE', 'PERSIST', 'MEMORY', 'WAL', 'OFF'}
+SYNCHRONOUS_MODES = {'OFF', 'NORMAL', 'FULL', 'EXTRA'}
+TEMP_STORES = {'DEFAULT', 'FILE', 'MEMORY'}
+
+def _choice(name, value, allowed):
+    value = str(value).upper()
+    if value not in allowed:
+        raise ValueError(f"{name} must be one of {', '.join(sorted(allowed))}, got {value}")
+    return value
+
+def connection_profile(db_path=None):
+    """PRAGMA name -> value for each new connection, from config.
+
+    WAL lets readers carry on while one writer commits, and with
+    synchronous=NORMAL a commit no longer waits for an fsync (the WAL is
+    synced at checkpoints), so concurrent PATCHes from several gunicorn
+    workers queue on busy_timeout instead of failing with "database is
+    locked". Journal mode and mmap do not apply to in-memory databases.
+    """
+    profile = {}
+    if (db_path or config.db_path) != ':memory:':
+        profile['journal_mode'] = _choice('SQLITE_JOURNAL_MODE', config.sqlite_journal_mode, JOURNAL_MODES)
+        profile['mmap_size'] = int(config.sqlite_mmap_size)
+    profile['synchronous'] = _choice('SQLITE_SYNCHRONOUS', config.sqlite_synchronous, SYNCHRONOUS_MODES)
+    profile['cache_size'] = int(config.sqlite_cache_size)
+    profile['busy_timeout'] = int(config.sqlite_busy_timeout)
+    profile['temp_store'] = _choice('SQLITE_TEMP_STORE', config.sqlite_temp_store, TEMP_STORES)
+    return profile
+
+def apply_pragmas(dbapi_connection, profile):
+    """Run PRAGMA statements on a raw sqlite3 connection"""
+    cursor = dbapi_connection.cursor()
+    try:
+        for name, value in profile.items():
+            cursor.execute(f"PRAGMA {name} = {value}")
+    finally:
+        cursor.close()
 
 engine = create_engine(
-    SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False}
+    SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False}, **engine_options()
 )
+SQLITE_PROFILE = connection_profile()
+
+@event.listens_for(engine, 'connect')
+def _configure_connection(dbapi_connection, connection_record):
+    apply_pragmas(dbapi_connection, SQLITE_PROFILE)
+
+# Whether request reads and writes use separate connections; an in-memory
+# database exists only on the connection that created it
+SEPARATE_READS = config.db_path != ':memory:'
+
+def create_read_engine(url=SQLALCHEMY_DATABASE_URL, profile=None):
+    """Pool of query_only connections for request handlers.
+
+    Reads never take the write lock, and a write that slips past
+    services.db_writer fails loudly instead of contending with it.
+    """
+    read_engine = create_engine(url, connect_args={"check_same_thread": False}, **engine_options())
+    profile = dict(SQLITE_PROFILE if profile is None else profile, query_only='ON')
+
+    @event.listens_for(read_engine, 'connect')
+    def _configure_read_connection(dbapi_connection, connection_record):
+        apply_pragmas(dbapi_connection, profile)
+
+    return read_engine
+
+def create_writer_engine(url=SQLALCHEMY_DATABASE_URL, profile=None):
+    """Single-connection engine for the writer thread.
+
+    pysqlite's own transaction handling is switched off so SQLAlchemy
+    controls it: every transaction starts with BEGIN IMMEDIATE, taking the
+    write lock up front, and SAVEPOINTs nest inside it as they should.
+    """
+    writer_engine = create_engine(url, connect_args={"check_same_thread": False}, pool_size=1, max_overflow=0)
+    profile = SQLITE_PROFILE if profile is None else profile
+
+    @event.listens_for(writer_engine, 'connect')
+    def _configure_writer_connection(dbapi_connection, connection_record):
+        dbapi_connection.isolation_level = None
+        apply_pragmas(dbapi_connection, profile)
+
+    @event.listens_for(writer_engine, 'begin')
+    def _begin_immediate(connection):
+        connection.exec_driver_sql("BEGIN IMMEDIATE")
+
+    return writer_engine
+
+read_engine = create_read_engine() if SEPARATE_READS else engine
+
+logger.info(f"Database URL: {SQLALCHEMY_DATABASE_URL}")
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+ReadSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=read_engine)
 
 Base = declarative_base()
 
@@ -20,17 +119,35 @@ def init_db():
     # Import models so they're registered with Base
     from models.receipt import Receipt
     from models.user import User
+    from models.job import OCRJob
+    from models.ocr_cache import OCRCacheEntry
+    from models.categorization_cache import CategorizationCacheEntry
+    from models.user_data_version import UserDataVersion
+    from models.receipt_summary import ReceiptSummary
+    from models import receipt_search
     
     # Create tables
     Base.metadata.create_all(bind=engine)
 
-# Add this function to get database session
 def get_db():
-    db = SessionLocal()
-    print(f"[database.py] Creating new database session with URL: {db.get_bind().url}")
-    try:
-        return db
-    except Exception as e:
-        print(f"[database.py] Error creating database session: {str(e)}")
+    """The database session for the current request.
+
+    Inside a Flask app context the first call opens a session on the read
+    pool and keeps it on g, so require_auth and the route handler share one
+    session and one pooled connection; close_db, registered with
+    teardown_appcontext, returns it when the app context is torn down.
+    Request handlers write through services.db_writer. Outside an app
+    context (scripts, worker threads) every call returns a new read/write
+    session that the caller must close.
+    """
+    if not has_app_context():
+        return SessionLocal()
+    if 'db_session' not in g:
+        g.db_session = ReadSessionLocal()
+    return g.db_session
+
+def close_db(exception=None):
+    """Close the request's session, rolling back anything uncommitted and returning its connection to the pool"""
+    db = g.pop('db_session', None)
+    if db is not None:
         db.close()
-        raise e 
\ No newline at end of file
@@ -0,0 +1,15 @@
+import os
+import shutil
+
+# Every worker writes its metrics here and /api/metrics sums them across workers.
+# Must be set before the app (and prometheus_client) is imported by the workers.
+metrics_dir = os.environ.setdefault('PROMETHEUS_MULTIPROC_DIR', '/tmp/ten40-metrics')
+
+def on_starting(server):
+    """Start each server run with empty metrics"""
+    shutil.rmtree(metrics_dir, ignore_errors=True)
+    os.makedirs(metrics_dir, exist_ok=True)
+
+def child_exit(server, worker):
+    from prometheus_client import multiprocess
+    multiprocess.mark_process_dead(worker.pid)
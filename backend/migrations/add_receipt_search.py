@@ -0,0 +1,20 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database import engine
+from models.receipt_search import create_search_index, drop_search_index, rebuild_search_index
+
+def upgrade(bind=engine):
+    """Create the receipts_fts table and triggers, then index existing receipts"""
+    with bind.begin() as connection:
+        create_search_index(connection)
+        count = rebuild_search_index(connection)
+    print(f"Indexed {count} receipts for search")
+
+def downgrade(bind=engine):
+    with bind.begin() as connection:
+        drop_search_index(connection)
+
+if __name__ == "__main__":
+    upgrade()
@@ -0,0 +1,70 @@
+import sys
+import os
+import time
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import inspect, text
+from database import engine
+from utils.receipt_values import parse_amount_cents, parse_receipt_date
+
+BATCH_SIZE = 500
+
+def add_columns(bind=engine):
+    """Add receipts.amount_cents and receipts.receipt_date if they are missing"""
+    columns = {column['name'] for column in inspect(bind).get_columns('receipts')}
+    with bind.begin() as connection:
+        if 'amount_cents' not in columns:
+            connection.execute(text("ALTER TABLE receipts ADD COLUMN amount_cents INTEGER"))
+        if 'receipt_date' not in columns:
+            connection.execute(text("ALTER TABLE receipts ADD COLUMN receipt_date DATE"))
+
+def backfill(bind=engine, batch_size=BATCH_SIZE, pause_seconds=0.0):
+    """Parse amount/date text into the typed columns in short id-ordered batches.
+
+    Each batch is its own transaction, so the write lock is held only
+    briefly and the app keeps serving while this runs. Only rows where both
+    typed columns are still NULL are touched; the original text is kept.
+    Returns the number of rows examined.
+    """
+    last_id = 0
+    examined = 0
+    while True:
+        with bind.begin() as connection:
+            rows = connection.execute(text(
+                "SELECT id, amount, date FROM receipts "
+                "WHERE id > :last_id AND amount_cents IS NULL AND receipt_date IS NULL "
+                "ORDER BY id LIMIT :limit"
+            ), {'last_id': last_id, 'limit': batch_size}).fetchall()
+            if not rows:
+                break
+
+            updates = []
+            for receipt_id, amount, date in rows:
+                receipt_date = parse_receipt_date(date)
+                updates.append({
+                    'id': receipt_id,
+                    'amount_cents': parse_amount_cents(amount),
+                    'receipt_date': receipt_date.isoformat() if receipt_date else None
+                })
+            connection.execute(text(
+                "UPDATE receipts SET amount_cents = :amount_cents, receipt_date = :receipt_date WHERE id = :id"
+            ), updates)
+
+        last_id = rows[-1][0]
+        examined += len(rows)
+        print(f"Backfilled receipts up to id {last_id} ({examined} rows)")
+        if pause_seconds:
+            time.sleep(pause_seconds)
+    return examined
+
+def upgrade(bind=engine):
+    add_columns(bind)
+    backfill(bind)
+
+def downgrade():
+    with engine.begin() as connection:
+        connection.execute(text("ALTER TABLE receipts DROP COLUMN receipt_date"))
+        connection.execute(text("ALTER TABLE receipts DROP COLUMN amount_cents"))
+
+if __name__ == "__main__":
+    upgrade()
@@ -0,0 +1,41 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import inspect, text
+from database import engine
+
+# (name, table, columns) - kept in step with __table_args__ in models/receipt.py
+INDEXES = [
+    ('ix_receipts_user_receipt_date', 'receipts', ('user_id', 'receipt_date')),
+    ('ix_receipts_user_category', 'receipts', ('user_id', 'category')),
+    ('ix_receipts_user_status', 'receipts', ('user_id', 'status')),
+    ('ix_receipts_user_vendor', 'receipts', ('user_id', 'vendor')),
+    ('ix_receipts_user_amount_cents', 'receipts', ('user_id', 'amount_cents')),
+    ('ix_receipt_change_history_receipt_changed_at', 'receipt_change_history', ('receipt_id', 'changed_at')),
+]
+
+def upgrade(bind=engine):
+    """Create the composite indexes and refresh the planner statistics.
+
+    Needs the receipts.receipt_date and amount_cents columns, which
+    add_typed_amount_date adds (it sorts first in run_migrations). Safe to
+    run more than once.
+    """
+    columns = {column['name'] for column in inspect(bind).get_columns('receipts')}
+    with bind.begin() as connection:
+        for name, table, index_columns in INDEXES:
+            if table == 'receipts' and not set(index_columns) <= columns:
+                print(f"Skipping {name}: receipts is missing {set(index_columns) - columns}")
+                continue
+            connection.execute(text(f"CREATE INDEX IF NOT EXISTS {name} ON {table} ({', '.join(index_columns)})"))
+            print(f"Created index {name}")
+        connection.execute(text("ANALYZE"))
+
+def downgrade(bind=engine):
+    with bind.begin() as connection:
+        for name, _, _ in INDEXES:
+            connection.execute(text(f"DROP INDEX IF EXISTS {name}"))
+
+if __name__ == "__main__":
+    upgrade()
@@ -0,0 +1,34 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import inspect
+from database import engine
+import models  # registers users for the receipt_summaries foreign key
+from models.receipt_summary import ReceiptSummary, create_summary_triggers, drop_summary_triggers, rebuild_receipt_summaries
+
+def upgrade(bind=engine):
+    """Create receipt_summaries and its triggers, then summarize existing receipts.
+
+    Needs the receipts.receipt_date and amount_cents columns, which
+    add_typed_amount_date adds (it sorts first in run_migrations). Safe to
+    run more than once.
+    """
+    columns = {column['name'] for column in inspect(bind).get_columns('receipts')}
+    missing = {'receipt_date', 'amount_cents'} - columns
+    if missing:
+        print(f"Skipping receipt_summaries: receipts is missing {missing}")
+        return
+    with bind.begin() as connection:
+        ReceiptSummary.__table__.create(connection, checkfirst=True)
+        create_summary_triggers(connection)
+        count = rebuild_receipt_summaries(connection)
+    print(f"Wrote {count} receipt summary rows")
+
+def downgrade(bind=engine):
+    with bind.begin() as connection:
+        drop_summary_triggers(connection)
+        ReceiptSummary.__table__.drop(connection, checkfirst=True)
+
+if __name__ == "__main__":
+    upgrade()
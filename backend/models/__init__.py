@@ -1,4 +1,10 @@
 from .receipt import Receipt
 from .user import User
+from .job import OCRJob
+from .ocr_cache import OCRCacheEntry
+from .categorization_cache import CategorizationCacheEntry
+from .user_data_version import UserDataVersion
+from .receipt_summary import ReceiptSummary
+from . import receipt_search
 
-# This ensures both models are loaded when 'models' is imported 
\ No newline at end of file
+# This ensures all models are loaded when 'models' is imported 
\ No newline at end of file
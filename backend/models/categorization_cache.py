@@ -0,0 +1,14 @@
+from datetime import datetime
+from sqlalchemy import Column, Integer, String, DateTime
+from database import Base
+
+class CategorizationCacheEntry(Base):
+    """Persisted categorization keyed by normalized input hash and category-list version"""
+    __tablename__ = "categorization_cache"
+
+    key = Column(String(64), primary_key=True)
+    version = Column(String(64), primary_key=True)
+    category = Column(String(100), nullable=False)
+    hit_count = Column(Integer, nullable=False, default=0)
+    created_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+    last_hit_at = Column(DateTime, nullable=True)
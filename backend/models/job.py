@@ -0,0 +1,37 @@
+from datetime import datetime
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Text
+from database import Base
+
+class OCRJob(Base):
+    """Background OCR job for an uploaded receipt image"""
+    __tablename__ = "ocr_jobs"
+
+    QUEUED = 'queued'
+    PROCESSING = 'processing'
+    COMPLETED = 'completed'
+    FAILED = 'failed'
+
+    id = Column(String(36), primary_key=True)
+    user_id = Column(Integer, ForeignKey('users.id'), nullable=False)
+    image_path = Column(String(255), nullable=False)
+    original_filename = Column(String(255))
+    status = Column(String(20), nullable=False, default=QUEUED)
+    receipt_id = Column(Integer, ForeignKey('receipts.id', ondelete='SET NULL'), nullable=True)
+    error = Column(Text)
+    attempts = Column(Integer, nullable=False, default=0)
+    created_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+    updated_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+
+    def to_dict(self):
+        """Convert job to dictionary"""
+        return {
+            'id': self.id,
+            'status': self.status,
+            'image_path': self.image_path,
+            'original_filename': self.original_filename,
+            'receipt_id': self.receipt_id,
+            'error': self.error,
+            'attempts': self.attempts,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None
+        }
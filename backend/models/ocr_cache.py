@@ -0,0 +1,14 @@
+from datetime import datetime
+from sqlalchemy import Column, Integer, String, DateTime, Text
+from database import Base
+
+class OCRCacheEntry(Base):
+    """Persisted OCR result keyed by image hash and prompt/model version"""
+    __tablename__ = "ocr_cache"
+
+    image_hash = Column(String(64), primary_key=True)
+    version = Column(String(64), primary_key=True)
+    content = Column(Text, nullable=False)
+    hit_count = Column(Integer, nullable=False, default=0)
+    created_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+    last_hit_at = Column(DateTime, nullable=True)
@@ -1,9 +1,23 @@
-from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, Text
-from sqlalchemy.orm import relationship
+from sqlalchemy import Column, Integer, String, Float, Date, DateTime, ForeignKey, Text, Index
+from sqlalchemy.orm import relationship, validates, deferred
 from database import Base
+from utils.receipt_values import parse_amount_cents, parse_receipt_date
+
+# Field names in Receipt.to_dict(), and accepted in its fields= projection
+RECEIPT_FIELDS = ('id', 'image_path', 'vendor', 'amount', 'amount_cents', 'date', 'receipt_date',
+                  'payment_method', 'category', 'content', 'status', 'type')
 
 class Receipt(Base):
     __tablename__ = "receipts"
+    # Every list query is scoped to one user, so each index leads with
+    # user_id and then the column that user filters or sorts on
+    __table_args__ = (
+        Index('ix_receipts_user_receipt_date', 'user_id', 'receipt_date'),
+        Index('ix_receipts_user_category', 'user_id', 'category'),
+        Index('ix_receipts_user_status', 'user_id', 'status'),
+        Index('ix_receipts_user_vendor', 'user_id', 'vendor'),
+        Index('ix_receipts_user_amount_cents', 'user_id', 'amount_cents'),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey('users.id'), nullable=False)
@@ -14,29 +28,53 @@ class Receipt(Base):
     category = Column(String(50))
     status = Column(String(20), nullable=False, default='pending')
     image_path = Column(String(255), nullable=False)
-    content = Column(Text)
+    # Full OCR JSON, by far the widest column; loaded only when read or
+    # undeferred so list queries do not pull it off disk
+    content = deferred(Column(Text))
+
+    # Typed copies of amount/date so SQLite can sort, filter and sum; the
+    # original OCR text stays in amount/date
+    amount_cents = Column(Integer, nullable=True)
+    receipt_date = Column(Date, nullable=True)
     
     # Use string reference to avoid circular import
     user = relationship("User", back_populates="receipts")
     changes = relationship("ReceiptChangeHistory", back_populates="receipt")
 
-    def to_dict(self):
-        """Convert receipt to dictionary"""
-        return {
-            'id': self.id,
-            'image_path': self.image_path,
-            'vendor': self.vendor or 'Missing',
-            'amount': self.amount or 'Missing',
-            'date': self.date or 'Missing',
-            'payment_method': self.payment_method or 'Missing',
-            'category': self.category or 'Other Expenses',
-            'content': self.content,
-            'status': self.status,
-            'type': 'Expenses'
-        }
+    @validates('amount')
+    def _set_amount_cents(self, key, value):
+        self.amount_cents = parse_amount_cents(value)
+        return value
+
+    @validates('date')
+    def _set_receipt_date(self, key, value):
+        self.receipt_date = parse_receipt_date(value)
+        return value
+
+    def to_dict(self, fields=None):
+        """Convert receipt to dictionary, limited to the given field names if any.
+
+        content is only read when it is included, so a projection without it
+        never loads the deferred column.
+        """
+        return {field: self._field_value(field) for field in (fields or RECEIPT_FIELDS)}
+
+    def _field_value(self, field):
+        if field in ('vendor', 'amount', 'date', 'payment_method'):
+            return getattr(self, field) or 'Missing'
+        if field == 'category':
+            return self.category or 'Other Expenses'
+        if field == 'receipt_date':
+            return self.receipt_date.isoformat() if self.receipt_date else None
+        if field == 'type':
+            return 'Expenses'
+        return getattr(self, field)
 
 class ReceiptChangeHistory(Base):
     __tablename__ = "receipt_change_history"
+    __table_args__ = (
+        Index('ix_receipt_change_history_receipt_changed_at', 'receipt_id', 'changed_at'),
+    )
     
     id = Column(Integer, primary_key=True)
     receipt_id = Column(Integer, ForeignKey('receipts.id', ondelete='CASCADE'), nullable=False)
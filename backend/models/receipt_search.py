@@ -0,0 +1,61 @@
+from sqlalchemy import event, text
+from models.receipt import Receipt
+
+# FTS5 index over each receipt's vendor, payment method and OCR text lines,
+# one row per receipt with rowid = receipts.id. owner holds "u<user_id>" so
+# a search only walks the posting lists of the searching user's receipts.
+SEARCH_TABLE = 'receipts_fts'
+
+# The OCR lines live in receipts.content as JSON: {"text": ["line", ...], ...}
+_TEXT_LINES = (
+    "CASE WHEN json_valid({row}.content) "
+    "THEN (SELECT group_concat(value, char(10)) FROM json_each({row}.content, '$.text')) END"
+)
+
+def _index_row(row: str) -> str:
+    return (
+        f"INSERT INTO {SEARCH_TABLE} (rowid, owner, vendor, payment_method, text) "
+        f"VALUES ({row}.id, 'u' || {row}.user_id, {row}.vendor, {row}.payment_method, {_TEXT_LINES.format(row=row)});"
+    )
+
+CREATE_STATEMENTS = [
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS {SEARCH_TABLE} USING fts5("
+    "owner, vendor, payment_method, text, tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3')",
+    f"CREATE TRIGGER IF NOT EXISTS receipts_fts_insert AFTER INSERT ON receipts BEGIN {_index_row('NEW')} END",
+    f"CREATE TRIGGER IF NOT EXISTS receipts_fts_update AFTER UPDATE OF user_id, vendor, payment_method, content "
+    f"ON receipts BEGIN DELETE FROM {SEARCH_TABLE} WHERE rowid = OLD.id; {_index_row('NEW')} END",
+    f"CREATE TRIGGER IF NOT EXISTS receipts_fts_delete AFTER DELETE ON receipts "
+    f"BEGIN DELETE FROM {SEARCH_TABLE} WHERE rowid = OLD.id; END",
+]
+
+DROP_STATEMENTS = [
+    "DROP TRIGGER IF EXISTS receipts_fts_insert",
+    "DROP TRIGGER IF EXISTS receipts_fts_update",
+    "DROP TRIGGER IF EXISTS receipts_fts_delete",
+    f"DROP TABLE IF EXISTS {SEARCH_TABLE}",
+]
+
+def create_search_index(connection):
+    """Create the FTS table and the triggers that keep it in step with receipts"""
+    for statement in CREATE_STATEMENTS:
+        connection.execute(text(statement))
+
+def drop_search_index(connection):
+    for statement in DROP_STATEMENTS:
+        connection.execute(text(statement))
+
+def rebuild_search_index(connection) -> int:
+    """Re-index every receipt from scratch; returns the number of rows indexed"""
+    connection.execute(text(f"DELETE FROM {SEARCH_TABLE}"))
+    connection.execute(text(
+        f"INSERT INTO {SEARCH_TABLE} (rowid, owner, vendor, payment_method, text) "
+        f"SELECT r.id, 'u' || r.user_id, r.vendor, r.payment_method, {_TEXT_LINES.format(row='r')} FROM receipts r"
+    ))
+    connection.execute(text(f"INSERT INTO {SEARCH_TABLE} ({SEARCH_TABLE}) VALUES ('optimize')"))
+    return connection.execute(text(f"SELECT count(*) FROM {SEARCH_TABLE}")).scalar()
+
+# Created and dropped with the receipts table, so create_all/drop_all in
+# init_db set it up for new databases; existing ones use
+# migrations/add_receipt_search.py
+event.listen(Receipt.__table__, 'after_create', lambda target, connection, **kw: create_search_index(connection))
+event.listen(Receipt.__table__, 'before_drop', lambda target, connection, **kw: drop_search_index(connection))
@@ -0,0 +1,111 @@
+from sqlalchemy import Column, Integer, String, ForeignKey, event, text
+from database import Base
+
+# Receipts without a parseable date are counted under tax year and month 0
+UNDATED = 0
+
+# Receipt.to_dict() shows a missing category as this, so summaries group it the same way
+DEFAULT_CATEGORY = 'Other Expenses'
+
+class ReceiptSummary(Base):
+    """Running totals of a user's receipts per tax year, month, category and status.
+
+    Kept in step with receipts by the triggers below, inside the same
+    transaction as the insert, update or delete, so a dashboard reads a
+    handful of rows per category instead of every receipt.
+    """
+    __tablename__ = "receipt_summaries"
+
+    user_id = Column(Integer, ForeignKey('users.id', ondelete='CASCADE'), primary_key=True)
+    tax_year = Column(Integer, primary_key=True)
+    month = Column(Integer, primary_key=True)
+    category = Column(String(50), primary_key=True)
+    status = Column(String(20), primary_key=True)
+    receipt_count = Column(Integer, nullable=False, default=0)
+    amount_cents = Column(Integer, nullable=False, default=0)
+    # Receipts in the group whose amount could not be parsed, so are not in amount_cents
+    unpriced_count = Column(Integer, nullable=False, default=0)
+
+SUMMARY_TABLE = ReceiptSummary.__tablename__
+
+def _key(row: str) -> dict:
+    return {
+        'user_id': f"{row}.user_id",
+        'tax_year': f"COALESCE(CAST(strftime('%Y', {row}.receipt_date) AS INTEGER), {UNDATED})",
+        'month': f"COALESCE(CAST(strftime('%m', {row}.receipt_date) AS INTEGER), {UNDATED})",
+        'category': f"COALESCE(NULLIF({row}.category, ''), '{DEFAULT_CATEGORY}')",
+        'status': f"{row}.status",
+    }
+
+def _matches(row: str) -> str:
+    return ' AND '.join(f"{column} = {value}" for column, value in _key(row).items())
+
+def _add(row: str) -> str:
+    key = _key(row)
+    return (
+        f"INSERT INTO {SUMMARY_TABLE} ({', '.join(key)}, receipt_count, amount_cents, unpriced_count) "
+        f"VALUES ({', '.join(key.values())}, 1, COALESCE({row}.amount_cents, 0), {row}.amount_cents IS NULL) "
+        f"ON CONFLICT ({', '.join(key)}) DO UPDATE SET "
+        "receipt_count = receipt_count + 1, "
+        "amount_cents = amount_cents + excluded.amount_cents, "
+        "unpriced_count = unpriced_count + excluded.unpriced_count;"
+    )
+
+def _remove(row: str) -> str:
+    return (
+        f"UPDATE {SUMMARY_TABLE} SET receipt_count = receipt_count - 1, "
+        f"amount_cents = amount_cents - COALESCE({row}.amount_cents, 0), "
+        f"unpriced_count = unpriced_count - ({row}.amount_cents IS NULL) "
+        f"WHERE {_matches(row)}; "
+        f"DELETE FROM {SUMMARY_TABLE} WHERE {_matches(row)} AND receipt_count <= 0;"
+    )
+
+TRIGGER_STATEMENTS = [
+    f"CREATE TRIGGER IF NOT EXISTS receipt_summaries_insert AFTER INSERT ON receipts BEGIN {_add('NEW')} END",
+    "CREATE TRIGGER IF NOT EXISTS receipt_summaries_update "
+    "AFTER UPDATE OF user_id, amount_cents, receipt_date, category, status ON receipts "
+    f"BEGIN {_remove('OLD')} {_add('NEW')} END",
+    f"CREATE TRIGGER IF NOT EXISTS receipt_summaries_delete AFTER DELETE ON receipts BEGIN {_remove('OLD')} END",
+]
+
+DROP_STATEMENTS = [
+    "DROP TRIGGER IF EXISTS receipt_summaries_insert",
+    "DROP TRIGGER IF EXISTS receipt_summaries_update",
+    "DROP TRIGGER IF EXISTS receipt_summaries_delete",
+]
+
+def create_summary_triggers(connection):
+    """Create the triggers that keep receipt_summaries in step with receipts"""
+    for statement in TRIGGER_STATEMENTS:
+        connection.execute(text(statement))
+
+def drop_summary_triggers(connection):
+    for statement in DROP_STATEMENTS:
+        connection.execute(text(statement))
+
+def rebuild_receipt_summaries(connection, user_id=None) -> int:
+    """Recompute summaries from the receipts table, for one user or everyone.
+
+    Returns the number of summary rows written.
+    """
+    key = _key('r')
+    if user_id is None:
+        summaries, receipts, params = "", "", {}
+    else:
+        summaries, receipts, params = "WHERE user_id = :user_id", "WHERE r.user_id = :user_id", {'user_id': user_id}
+
+    connection.execute(text(f"DELETE FROM {SUMMARY_TABLE} {summaries}"), params)
+    return connection.execute(text(
+        f"INSERT INTO {SUMMARY_TABLE} ({', '.join(key)}, receipt_count, amount_cents, unpriced_count) "
+        f"SELECT {', '.join(key.values())}, count(*), COALESCE(sum(r.amount_cents), 0), "
+        f"sum(r.amount_cents IS NULL) FROM receipts r {receipts} "
+        f"GROUP BY {', '.join(str(n) for n in range(1, len(key) + 1))}"
+    ), params).rowcount
+
+# The triggers reference both tables, so they are created once create_all
+# has made every table; existing databases use
+# migrations/add_user_summaries.py
+@event.listens_for(Base.metadata, 'after_create')
+def _create_triggers(target, connection, tables=None, **kw):
+    if tables is None or ReceiptSummary.__table__ in tables:
+        create_summary_triggers(connection)
@@ -0,0 +1,11 @@
+from datetime import datetime
+from sqlalchemy import Column, Integer, DateTime, ForeignKey
+from database import Base
+
+class UserDataVersion(Base):
+    """Counter bumped whenever any of a user's receipts is inserted, updated or deleted"""
+    __tablename__ = "user_data_versions"
+
+    user_id = Column(Integer, ForeignKey('users.id', ondelete='CASCADE'), primary_key=True)
+    version = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime, nullable=False, default=datetime.utcnow)
@@ -0,0 +1,44 @@
+import re
+from pydantic import BaseModel, ConfigDict, Field, field_validator, create_model
+from typing import List, Literal, Type
+from config import config
+
+CURRENCY_PATTERN = re.compile(r'^\$(\d+\.\d{2})$')
+
+class ReceiptExtraction(BaseModel):
+    """Receipt fields returned by the Vision model in structured output mode"""
+    model_config = ConfigDict(extra='forbid')
+
+    Vendor: str = Field(description="Store or company name")
+    Amount: str = Field(description="Total amount paid, e.g. '12.34 USD'")
+    Date: str = Field(description="Receipt date")
+    Payment_Method: str = Field(description="Payment type, e.g. 'Credit Card'")
+    text: List[str] = Field(description="Every line of text on the receipt, in order")
+
+    @field_validator('Amount')
+    @classmethod
+    def normalize_amount(cls, value: str) -> str:
+        """Match the '12.34 USD' format stored for free-text responses"""
+        return CURRENCY_PATTERN.sub(r'\1 USD', value.strip())
+
+# Constraining Category to an enum means the model cannot answer outside the list
+CategorizedReceiptExtraction = create_model(
+    'CategorizedReceiptExtraction',
+    __base__=ReceiptExtraction,
+    Category=(Literal[tuple(config.expense_categories)],
+              Field(description="IRS Schedule C expense category that best fits this receipt"))
+)
+
+def extraction_model() -> Type[ReceiptExtraction]:
+    return CategorizedReceiptExtraction if config.ocr_combined_categorization else ReceiptExtraction
+
+def response_format(model: Type[BaseModel]) -> dict:
+    """A strict json_schema response_format for the chat completions API"""
+    return {
+        'type': 'json_schema',
+        'json_schema': {
+            'name': 'receipt',
+            'strict': True,
+            'schema': model.model_json_schema()
+        }
+    }
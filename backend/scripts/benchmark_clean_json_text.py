@@ -0,0 +1,40 @@
+import sys
+import os
+import json
+import timeit
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.ocr_service import clean_json_text
+from tests.test_clean_json_text import legacy_clean_json_text
+
+def long_receipt(lines):
+    """A fenced model response for a receipt with many item lines"""
+    content = json.dumps({
+        'Vendor': 'Costco Wholesale',
+        'Amount': '$1234.56',
+        'Date': '2024-05-01',
+        'Payment_Method': 'Visa',
+        'text': [f"ITEM {n:05d} KIRKLAND SIGNATURE\t${n % 100}.{n % 90 + 10}" for n in range(lines)]
+    }, indent=4)
+    return f"**Receipt Data**\nHere is the extracted data in JSON structure:\n```json\n{content}\n```\nNote: done"
+
+INPUTS = {
+    'typical (40 lines)': long_receipt(40),
+    'large (5,000 lines)': long_receipt(5000),
+    'control characters (200 KB)': '{"text": "' + 'abc\x00\x01def\x1f' * 20000 + '"}',
+    # One unclosed opener per repetition on a single line: the old regex rescans to the end of the line each time
+    'adversarial headers (one line)': 'Here is the extracted data ' * 4000 + '{"Vendor": "x"}',
+    'adversarial bold (one line)': '** ' + 'x' * 200000 + ' {"Vendor": "x"}',
+}
+
+def benchmark(name, text, number):
+    assert clean_json_text(text) == legacy_clean_json_text(text)
+    legacy = min(timeit.repeat(lambda: legacy_clean_json_text(text), number=number, repeat=3)) / number
+    current = min(timeit.repeat(lambda: clean_json_text(text), number=number, repeat=3)) / number
+    print(f"{name:<32} {len(text):>10,} {legacy * 1e6:>14,.1f} {current * 1e6:>14,.1f} {legacy / current:>8.1f}x")
+
+if __name__ == "__main__":
+    print(f"{'Input':<32} {'Chars':>10} {'Legacy (us)':>14} {'Current (us)':>14} {'Speedup':>9}")
+    print("-" * 84)
+    for name, text in INPUTS.items():
+        benchmark(name, text, number=1 if 'adversarial' in name else 20)
@@ -0,0 +1,176 @@
+import sys
+import os
+import time
+import random
+import argparse
+import tempfile
+import threading
+import multiprocessing
+from datetime import datetime
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import sessionmaker
+from database import Base, connection_profile, apply_pragmas, create_writer_engine
+import models  # registers every table with Base
+from models.receipt import Receipt, ReceiptChangeHistory
+from services.db_writer import DatabaseWriter
+
+USERS = 50
+RECEIPTS = 20000
+
+def make_engine(path, profile):
+    engine = create_engine(f"sqlite:///{path}", connect_args={"check_same_thread": False})
+    event.listen(engine, 'connect', lambda dbapi_connection, record: apply_pragmas(dbapi_connection, profile))
+    return engine
+
+def seed(path, profile):
+    engine = make_engine(path, profile)
+    Base.metadata.create_all(engine)
+    with engine.begin() as connection:
+        connection.execute(text("INSERT INTO users (id, email, hashed_password) VALUES (:id, :email, 'x')"),
+                           [{'id': n, 'email': f'user{n}@example.com'} for n in range(1, USERS + 1)])
+        connection.execute(text(
+            "INSERT INTO receipts (user_id, vendor, amount, amount_cents, date, receipt_date, category, status, "
+            "image_path, content) VALUES (:user_id, :vendor, '12.00', 1200, '2024-01-01', '2024-01-01', "
+            "'Supplies', 'pending', 'r.png', :content)"
+        ), [{'user_id': n % USERS + 1, 'vendor': f'Vendor {n % 300}',
+             'content': '{"text": ["' + 'ITEM 1.00 ' * 40 + '"]}'} for n in range(RECEIPTS)])
+    engine.dispose()
+
+def worker(path, profile, seconds, write_ratio, seed_value, results):
+    """Mix of receipt list reads and PATCH-style writes, like one gunicorn worker"""
+    rng = random.Random(seed_value)
+    engine = make_engine(path, profile)
+    reads = writes = locked = 0
+    write_latencies = []
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        user_id = rng.randint(1, USERS)
+        try:
+            if rng.random() < write_ratio:
+                start = time.perf_counter()
+                with engine.begin() as connection:
+                    receipt_id = rng.randint(1, RECEIPTS)
+                    connection.execute(text("UPDATE receipts SET status = :status WHERE id = :id"),
+                                       {'status': rng.choice(['pending', 'approved']), 'id': receipt_id})
+                    connection.execute(text(
+                        "INSERT INTO receipt_change_history (receipt_id, field_name, new_value, changed_at, changed_by) "
+                        "VALUES (:id, 'status', 'approved', CURRENT_TIMESTAMP, 'benchmark')"
+                    ), {'id': receipt_id})
+                write_latencies.append(time.perf_counter() - start)
+                writes += 1
+            else:
+                with engine.connect() as connection:
+                    connection.execute(text(
+                        "SELECT id, vendor, amount, date, category, status FROM receipts "
+                        "WHERE user_id = :user_id ORDER BY receipt_date DESC, id DESC LIMIT 50"
+                    ), {'user_id': user_id}).fetchall()
+                reads += 1
+        except OperationalError as e:
+            if 'locked' not in str(e):
+                raise
+            locked += 1
+    engine.dispose()
+    results.put((reads, writes, locked, write_latencies))
+
+def run(name, profile, workers, seconds, write_ratio):
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'benchmark.db')
+        seed(path, profile)
+
+        results = multiprocessing.Queue()
+        processes = [multiprocessing.Process(target=worker, args=(path, profile, seconds, write_ratio, n, results))
+                     for n in range(workers)]
+        for process in processes:
+            process.start()
+        totals = [results.get() for _ in processes]
+        for process in processes:
+            process.join()
+
+    reads = sum(t[0] for t in totals)
+    writes = sum(t[1] for t in totals)
+    locked = sum(t[2] for t in totals)
+    latencies = sorted(latency for t in totals for latency in t[3])
+    p95 = latencies[int(len(latencies) * 0.95)] * 1000 if latencies else 0.0
+    print(f"{name:<10} {reads / seconds:>12,.0f} {writes / seconds:>12,.0f} {locked:>8} {p95:>14.1f}")
+
+def update_status(db, receipt_id, status):
+    """One PATCH-style write: a status change and its history row"""
+    db.query(Receipt).filter(Receipt.id == receipt_id).update({Receipt.status: status}, synchronize_session=False)
+    db.add(ReceiptChangeHistory(receipt_id=receipt_id, field_name='status', new_value=status,
+                                 changed_at=datetime.utcnow(), changed_by='benchmark'))
+
+def run_burst(name, threads, writes_per_thread, use_writer):
+    """Bursty writes from many request threads in one process, with and without the writer"""
+    profile = connection_profile(db_path='benchmark.db')
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'benchmark.db')
+        seed(path, profile)
+        engine = make_engine(path, profile)
+        direct = sessionmaker(bind=engine)
+        writer = None
+        if use_writer:
+            writer_engine = create_writer_engine(f"sqlite:///{path}", profile)
+            writer = DatabaseWriter(sessionmaker(bind=writer_engine), enabled=True)
+        failures = []
+
+        def client(seed_value):
+            rng = random.Random(seed_value)
+            for _ in range(writes_per_thread):
+                receipt_id, status = rng.randint(1, RECEIPTS), rng.choice(['pending', 'approved'])
+                try:
+                    if writer:
+                        writer.run(lambda db: update_status(db, receipt_id, status))
+                    else:
+                        db = direct()
+                        try:
+                            update_status(db, receipt_id, status)
+                            db.commit()
+                        finally:
+                            db.close()
+                except OperationalError:
+                    failures.append(receipt_id)
+
+        workers = [threading.Thread(target=client, args=(n,)) for n in range(threads)]
+        start = time.perf_counter()
+        for worker_thread in workers:
+            worker_thread.start()
+        for worker_thread in workers:
+            worker_thread.join()
+        elapsed = time.perf_counter() - start
+
+        commits = writer.stats()['batches'] if writer else threads * writes_per_thread
+        if writer:
+            writer.shutdown()
+            writer_engine.dispose()
+        engine.dispose()
+    writes = threads * writes_per_thread - len(failures)
+    print(f"{name:<10} {writes / elapsed:>12,.0f} {commits:>10} {len(failures):>8}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Read/write throughput of several processes sharing one SQLite file")
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--seconds', type=float, default=5.0)
+    parser.add_argument('--write-ratio', type=float, default=0.2)
+    parser.add_argument('--burst-threads', type=int, default=16)
+    parser.add_argument('--burst-writes', type=int, default=200)
+    args = parser.parse_args()
+
+    # The engine before connection profiles: rollback journal, synchronous=FULL
+    legacy = {}
+    tuned = connection_profile(db_path='benchmark.db')
+
+    print(f"{args.workers} workers, {args.seconds:.0f}s each, {args.write_ratio:.0%} writes")
+    print(f"{'Profile':<10} {'Reads/s':>12} {'Writes/s':>12} {'Locked':>8} {'p95 write ms':>14}")
+    print("-" * 60)
+    run('legacy', legacy, args.workers, args.seconds, args.write_ratio)
+    run('tuned', tuned, args.workers, args.seconds, args.write_ratio)
+
+    print()
+    print(f"{args.burst_threads} threads in one process, {args.burst_writes} writes each")
+    print(f"{'Writes':<10} {'Writes/s':>12} {'Commits':>10} {'Locked':>8}")
+    print("-" * 43)
+    run_burst('direct', args.burst_threads, args.burst_writes, use_writer=False)
+    run_burst('writer', args.burst_threads, args.burst_writes, use_writer=True)
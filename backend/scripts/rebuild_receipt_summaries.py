@@ -0,0 +1,21 @@
+import sys
+import os
+import argparse
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database import engine
+import models  # registers every table with Base
+from models.receipt_summary import rebuild_receipt_summaries
+
+def rebuild(user_id=None):
+    """Recompute receipt_summaries from the receipts table in one transaction"""
+    with engine.begin() as connection:
+        count = rebuild_receipt_summaries(connection, user_id)
+    scope = f"user {user_id}" if user_id is not None else "all users"
+    print(f"Rebuilt {count} receipt summary rows for {scope}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Recompute the spending summaries behind /api/summary")
+    parser.add_argument('--user-id', type=int, help="only rebuild this user's summaries")
+    args = parser.parse_args()
+    rebuild(args.user_id)
@@ -0,0 +1,163 @@
+import re
+import time
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Dict, Optional
+from config import config
+from sqlalchemy import func
+from database import SessionLocal
+from models.categorization_cache import CategorizationCacheEntry
+from services.db_writer import DatabaseWriter
+from services.vendor_index import normalize_vendor
+
+logger = logging.getLogger(__name__)
+
+def normalize_text(text: Optional[str]) -> str:
+    """Lowercase, strip punctuation and drop numeric tokens (prices, quantities, store numbers)"""
+    if not text:
+        return ''
+    words = re.sub(r'[^a-z0-9]+', ' ', str(text).lower()).split()
+    return ' '.join(word for word in words if not word.isdigit())
+
+def receipt_cache_key(content: Dict) -> Optional[str]:
+    """Hash of the normalized vendor plus the sorted, de-duplicated item lines.
+
+    Returns None when the receipt has nothing to categorize on, so empty
+    inputs are never cached.
+    """
+    vendor = normalize_vendor(content.get('Vendor'))
+    items = content.get('text') or []
+    if isinstance(items, str):
+        items = [items]
+    lines = sorted({line for line in (normalize_text(item) for item in items) if line})
+    if not vendor and not lines:
+        return None
+    return _hash('receipt', vendor, *lines)
+
+def text_cache_key(text: Optional[str]) -> Optional[str]:
+    normalized = normalize_text(text)
+    return _hash('text', normalized) if normalized else None
+
+def _hash(*parts: str) -> str:
+    return hashlib.sha256('\x00'.join(parts).encode('utf-8')).hexdigest()
+
+class CategorizationCache:
+    """Memoized LLM categorizations keyed by normalized input and category-list version.
+
+    The first tier is an in-process LRU bounded by entry count; the second,
+    when shared is enabled, is the categorization_cache table so every
+    worker using the same database benefits. Entries in both tiers expire
+    ttl_seconds after they were stored.
+    """
+
+    def __init__(self, session_factory=SessionLocal, max_entries: Optional[int] = None,
+                 ttl_seconds: Optional[int] = None, shared: Optional[bool] = None,
+                 enabled: Optional[bool] = None, writer: Optional[DatabaseWriter] = None):
+        self.session_factory = session_factory
+        self.writer = writer or DatabaseWriter(session_factory, enabled=False)
+        self.max_entries = config.categorization_cache_max_entries if max_entries is None else max_entries
+        self.ttl_seconds = config.categorization_cache_ttl_seconds if ttl_seconds is None else ttl_seconds
+        self.shared = config.categorization_cache_shared if shared is None else shared
+        self.enabled = config.categorization_cache_enabled if enabled is None else enabled
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.memory_hits = 0
+        self.shared_hits = 0
+        self.misses = 0
+        self.expired = 0
+
+    def get(self, key: Optional[str], version: str) -> Optional[str]:
+        """Return the cached category, or None on a miss"""
+        if not self.enabled or not key:
+            return None
+
+        with self._lock:
+            entry = self._entries.get((key, version))
+            if entry is not None:
+                category, expires_at = entry
+                if expires_at > time.monotonic():
+                    self._entries.move_to_end((key, version))
+                    self.memory_hits += 1
+                    return category
+                del self._entries[(key, version)]
+                self.expired += 1
+
+        loaded = self._load(key, version) if self.shared else None
+        with self._lock:
+            if loaded is None:
+                self.misses += 1
+                return None
+            category, remaining = loaded
+            self.shared_hits += 1
+            self._remember((key, version), category, remaining)
+        return category
+
+    def put(self, key: Optional[str], version: str, category: str):
+        if not self.enabled or not key:
+            return
+
+        with self._lock:
+            self._remember((key, version), category, self.ttl_seconds)
+        if self.shared:
+            self._store(key, version, category)
+
+    def clear(self):
+        """Drop the in-process tier (the shared tier is left intact)"""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            lookups = self.memory_hits + self.shared_hits + self.misses
+            return {
+                'memory_hits': self.memory_hits,
+                'shared_hits': self.shared_hits,
+                'misses': self.misses,
+                'expired': self.expired,
+                'hit_ratio': (self.memory_hits + self.shared_hits) / lookups if lookups else 0.0,
+                'entries': len(self._entries),
+                'max_entries': self.max_entries
+            }
+
+    def _remember(self, key, category: str, ttl_seconds: float):
+        """Insert into the LRU and evict least recently used entries over capacity"""
+        if self.max_entries <= 0:
+            return
+        self._entries.pop(key, None)
+        self._entries[key] = (category, time.monotonic() + ttl_seconds)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def _load(self, key: str, version: str):
+        db = self.session_factory()
+        try:
+            entry = db.query(CategorizationCacheEntry).get((key, version))
+            if entry is None:
+                return None
+            remaining = (entry.created_at + timedelta(seconds=self.ttl_seconds) - datetime.utcnow()).total_seconds()
+            category = entry.category
+        except Exception as e:
+            logger.error(f"Failed to read categorization cache entry {key}: {str(e)}")
+            return None
+        finally:
+            db.close()
+
+        if remaining <= 0:
+            with self._lock:
+                self.expired += 1
+            return None
+        self.writer.submit_logged(lambda session: session.query(CategorizationCacheEntry).filter(
+            CategorizationCacheEntry.key == key, CategorizationCacheEntry.version == version
+        ).update({
+            CategorizationCacheEntry.hit_count: func.coalesce(CategorizationCacheEntry.hit_count, 0) + 1,
+            CategorizationCacheEntry.last_hit_at: datetime.utcnow()
+        }, synchronize_session=False), f"record categorization cache hit {key}")
+        return category, remaining
+
+    def _store(self, key: str, version: str, category: str):
+        self.writer.submit_logged(lambda session: session.merge(CategorizationCacheEntry(
+            key=key, version=version, category=category, hit_count=0, created_at=datetime.utcnow()
+        )), f"write categorization cache entry {key}")
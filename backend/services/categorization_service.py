@@ -1,39 +1,161 @@
-import os
-from openai import OpenAI
-from typing import Dict, Optional
+import asyncio
+import hashlib
+import logging
+from typing import Dict, List, Optional
 from config import config
+from services.openai_client import create_client, get_async_client
+from services.vendor_index import vendor_category_index
+from services.categorization_cache import CategorizationCache, receipt_cache_key, text_cache_key
+from services.db_writer import db_writer
+from services.metrics import llm_call, stats_collector, PARSE_ERROR
+
+logger = logging.getLogger(__name__)
 
 class CategorizationError(Exception):
     """Custom exception for categorization service errors"""
     pass
 
-client = OpenAI(api_key=os.getenv('OPENAI_API_KEY'))
+client = create_client()
 
-class CategorizationService:
-    @staticmethod
-    def categorize_receipt(content: Dict) -> str:
-        """Categorize receipt based on its content using LLM"""
-        try:
-            prompt = f"""
+CATEGORIZATION_MODEL = "gpt-4o-mini"
+
+RECEIPT_PROMPT = """
             Analyze this receipt and categorize it into one of these IRS Schedule C expense categories:
-            {', '.join(config.expense_categories)}
+            {categories}
 
             Receipt details:
-            Vendor: {content.get('Vendor', '')}
-            Items/Description: {content.get('text', [])}
+            Vendor: {vendor}
+            Items/Description: {items}
+
+            Return only the category name, nothing else.
+            """
+
+TEXT_PROMPT = """
+            Categorize this expense description into one of these IRS Schedule C expense categories:
+            {categories}
+
+            Description: {text}
 
             Return only the category name, nothing else.
             """
 
-            response = client.chat.completions.create(
-                model="gpt-4o-mini",
-                messages=[{"role": "user", "content": prompt}],
-                max_tokens=50
-            )
+# Any change to the model, prompts or category list invalidates memoized answers
+CATEGORIZATION_CACHE_VERSION = hashlib.sha256(
+    '\n'.join([CATEGORIZATION_MODEL, RECEIPT_PROMPT, TEXT_PROMPT] + config.expense_categories).encode('utf-8')
+).hexdigest()[:16]
+
+categorization_cache = CategorizationCache(writer=db_writer)
+stats_collector.register('categorization_cache', categorization_cache.stats)
+stats_collector.register('vendor_index', vendor_category_index.stats)
+
+def _completion_request(prompt: str):
+    return dict(
+        model=CATEGORIZATION_MODEL,
+        messages=[{"role": "user", "content": prompt}],
+        max_tokens=50
+    )
+
+def _parse_category(response) -> Optional[str]:
+    """The category named in the response; None when it is not a known category"""
+    category = response.choices[0].message.content.strip()
+    return category if category in config.expense_categories else None
+
+def _complete(prompt: str) -> Optional[str]:
+    with llm_call('categorization', CATEGORIZATION_MODEL) as call:
+        response = client.chat.completions.create(**_completion_request(prompt))
+        call.usage = getattr(response, 'usage', None)
+        category = _parse_category(response)
+        if category is None:
+            call.outcome = PARSE_ERROR
+    return category
+
+async def _complete_async(prompt: str) -> Optional[str]:
+    with llm_call('categorization', CATEGORIZATION_MODEL) as call:
+        response = await get_async_client().chat.completions.create(**_completion_request(prompt))
+        call.usage = getattr(response, 'usage', None)
+        category = _parse_category(response)
+        if category is None:
+            call.outcome = PARSE_ERROR
+    return category
+
+def _receipt_prompt(content: Dict) -> str:
+    return RECEIPT_PROMPT.format(
+        categories=', '.join(config.expense_categories),
+        vendor=content.get('Vendor', ''),
+        items=content.get('text', [])
+    )
+
+class CategorizationService:
+    @staticmethod
+    def categorize_receipt(content: Dict, user_id: Optional[int] = None) -> str:
+        """Categorize receipt based on its content using LLM
+
+        When user_id is given, the user's own history for the vendor is
+        consulted first. Answers are memoized on the normalized vendor and
+        item lines, so the LLM is only called for inputs not seen before.
+        """
+        try:
+            if user_id is not None:
+                category = vendor_category_index.lookup(user_id, content.get('Vendor'))
+                if category:
+                    return category
+
+            key = receipt_cache_key(content)
+            category = categorization_cache.get(key, CATEGORIZATION_CACHE_VERSION)
+            if category:
+                return category
+
+            category = _complete(_receipt_prompt(content))
+            if category is None:
+                return "Other Expenses"
+            categorization_cache.put(key, CATEGORIZATION_CACHE_VERSION, category)
+            return category
+
+        except Exception as e:
+            logger.error(f"Categorization error: {str(e)}")
+            return "Other Expenses"
+
+    @staticmethod
+    async def categorize_receipt_async(content: Dict, user_id: Optional[int] = None) -> str:
+        """Async variant of categorize_receipt for the shared event loop"""
+        try:
+            if user_id is not None:
+                category = await asyncio.to_thread(vendor_category_index.lookup, user_id, content.get('Vendor'))
+                if category:
+                    return category
+
+            key = receipt_cache_key(content)
+            category = await asyncio.to_thread(categorization_cache.get, key, CATEGORIZATION_CACHE_VERSION)
+            if category:
+                return category
+
+            category = await _complete_async(_receipt_prompt(content))
+            if category is None:
+                return "Other Expenses"
+            await asyncio.to_thread(categorization_cache.put, key, CATEGORIZATION_CACHE_VERSION, category)
+            return category
 
-            category = response.choices[0].message.content.strip()
-            return category if category in config.expense_categories else "Other Expenses"
-            
         except Exception as e:
-            print(f"Categorization error: {str(e)}")
-            return "Other Expenses" 
\ No newline at end of file
+            logger.error(f"Categorization error: {str(e)}")
+            return "Other Expenses"
+
+    @staticmethod
+    def categorize(text: str) -> List[str]:
+        """Categorize a free-form expense description, returning the matching categories"""
+        key = text_cache_key(text)
+        category = categorization_cache.get(key, CATEGORIZATION_CACHE_VERSION)
+        if category:
+            return [category]
+
+        try:
+            category = _complete(TEXT_PROMPT.format(
+                categories=', '.join(config.expense_categories),
+                text=text
+            ))
+        except Exception as e:
+            raise CategorizationError(f"Categorization failed: {str(e)}")
+
+        if category is None:
+            return ["Other Expenses"]
+        categorization_cache.put(key, CATEGORIZATION_CACHE_VERSION, category)
+        return [category]
@@ -0,0 +1,50 @@
+import hashlib
+import logging
+from datetime import datetime
+from typing import Iterable
+from sqlalchemy import event
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.orm import Session
+from models.receipt import Receipt
+from models.user_data_version import UserDataVersion
+
+logger = logging.getLogger(__name__)
+
+# Bump when the shape of receipt or options responses changes, so clients
+# holding a body from an older deploy do not get a 304 for it
+ETAG_SCHEMA = 1
+
+def get_data_version(db, user_id: int) -> int:
+    """The user's current data version; 0 until their receipts first change"""
+    version = db.query(UserDataVersion.version).filter(UserDataVersion.user_id == user_id).scalar()
+    return version or 0
+
+def bump_data_versions(connection, user_ids: Iterable[int]):
+    """Increment each user's data version on the given connection's transaction"""
+    now = datetime.utcnow()
+    for user_id in user_ids:
+        statement = insert(UserDataVersion).values(user_id=user_id, version=1, updated_at=now)
+        connection.execute(statement.on_conflict_do_update(
+            index_elements=['user_id'],
+            set_={'version': UserDataVersion.version + 1, 'updated_at': now}
+        ))
+
+def data_version_etag(user_id: int, version: int, *parts) -> str:
+    """Strong ETag for a response that depends only on the user's data version and parts"""
+    digest = hashlib.sha1(repr((ETAG_SCHEMA,) + parts).encode('utf-8')).hexdigest()[:16]
+    return f"{user_id}-{version}-{digest}"
+
+@event.listens_for(Session, 'after_flush')
+def _bump_changed_receipt_owners(session, flush_context):
+    """Bump once per user with receipts in this flush, inside the same transaction.
+
+    A 200-file batch upload is one bump rather than 200, and the bump
+    commits or rolls back together with the receipts.
+    """
+    user_ids = {obj.user_id for obj in session.new if isinstance(obj, Receipt)}
+    user_ids.update(obj.user_id for obj in session.deleted if isinstance(obj, Receipt))
+    user_ids.update(obj.user_id for obj in session.dirty
+                    if isinstance(obj, Receipt) and session.is_modified(obj, include_collections=False))
+    user_ids.discard(None)
+    if user_ids:
+        bump_data_versions(session.connection(), sorted(user_ids))
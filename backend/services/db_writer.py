@@ -0,0 +1,186 @@
+import atexit
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Callable, List, Optional, Tuple
+from sqlalchemy.orm import sessionmaker
+from config import config
+import database
+from services.metrics import stats_collector
+
+logger = logging.getLogger(__name__)
+
+class DatabaseWriter:
+    """Runs this process's database mutations on one thread and one connection.
+
+    SQLite allows a single writer at a time, so rather than letting request
+    threads and OCR workers queue up on the file lock, writes are submitted
+    here as functions of a session. The writer thread takes whatever tasks
+    are waiting (up to max_batch), runs each inside its own SAVEPOINT so a
+    failing task is rolled back on its own, and commits the batch once.
+    Results are handed back through futures once the commit has succeeded.
+
+    This only serializes writes within one process. Under gunicorn every
+    worker has its own writer, and those writers still take turns on the
+    SQLite write lock through BEGIN IMMEDIATE and busy_timeout.
+
+    Sessions use expire_on_commit=False and are closed after the commit, so
+    tasks should return plain values (or to_dict() output) rather than rely
+    on lazy loading afterwards.
+
+    When disabled (e.g. for an in-memory database, which exists only on the
+    connection that created it) tasks run inline on the caller's thread,
+    still one at a time.
+    """
+
+    def __init__(self, session_factory: Optional[sessionmaker] = None, max_batch: Optional[int] = None,
+                 max_delay_ms: Optional[float] = None, timeout_seconds: Optional[int] = None,
+                 enabled: Optional[bool] = None):
+        self.max_batch = max_batch or config.db_writer_max_batch
+        self.max_delay = (config.db_writer_max_delay_ms if max_delay_ms is None else max_delay_ms) / 1000
+        self.timeout_seconds = timeout_seconds or config.db_writer_timeout_seconds
+        if enabled is None:
+            enabled = config.db_writer_enabled and database.SEPARATE_READS
+        self.enabled = enabled
+        self._session_factory = session_factory
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+        self._inline_lock = threading.Lock()
+        self._batches = 0
+        self._tasks = 0
+        self._failed = 0
+        self._largest_batch = 0
+
+    @property
+    def session_factory(self) -> sessionmaker:
+        if self._session_factory is None:
+            if self.enabled:
+                self._session_factory = sessionmaker(bind=database.create_writer_engine(), autoflush=False)
+            else:
+                self._session_factory = database.SessionLocal
+        return self._session_factory
+
+    def submit(self, fn: Callable) -> Future:
+        """Schedule fn(session) and return a future for its result"""
+        future = Future()
+        if not self.enabled:
+            with self._inline_lock:
+                self._execute([(fn, future)])
+            return future
+
+        if threading.current_thread() is self._thread:
+            raise RuntimeError("Database writer tasks cannot submit further writes")
+        self._ensure_started()
+        self._queue.put((fn, future))
+        return future
+
+    def submit_logged(self, fn: Callable, action: str):
+        """Schedule fn(session) without waiting for it; a failure is logged as "Failed to <action>"
+
+        For best-effort writes such as cache entries and hit counts, where
+        the caller has nothing to do with the result.
+        """
+        def log_failure(future):
+            if future.exception() is not None:
+                logger.error(f"Failed to {action}: {str(future.exception())}")
+
+        try:
+            self.submit(fn).add_done_callback(log_failure)
+        except Exception as e:
+            logger.error(f"Failed to {action}: {str(e)}")
+
+    def run(self, fn: Callable, timeout: Optional[float] = None):
+        """Run fn(session) on the writer and return its result, re-raising its error"""
+        return self.submit(fn).result(timeout or self.timeout_seconds)
+
+    def shutdown(self, wait: bool = True):
+        """Finish queued writes and stop the writer thread"""
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is not None:
+            self._queue.put(None)
+            if wait:
+                thread.join()
+
+    def stats(self) -> dict:
+        return {
+            'batches': self._batches,
+            'tasks': self._tasks,
+            'failed': self._failed,
+            'largest_batch': self._largest_batch,
+            'queued': self._queue.qsize(),
+            'tasks_per_commit': self._tasks / self._batches if self._batches else 0.0
+        }
+
+    def _ensure_started(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._loop, name='db-writer', daemon=True)
+                self._thread.start()
+
+    def _next_batch(self) -> Tuple[List[Tuple[Callable, Future]], bool]:
+        """Block for one task, then take whatever else is waiting"""
+        batch = []
+        item = self._queue.get()
+        deadline = time.monotonic() + self.max_delay
+        while item is not None:
+            batch.append(item)
+            if len(batch) >= self.max_batch:
+                return batch, False
+            try:
+                remaining = deadline - time.monotonic()
+                item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                return batch, False
+        return batch, True
+
+    def _loop(self):
+        stopping = False
+        while not stopping:
+            batch, stopping = self._next_batch()
+            if batch:
+                self._execute(batch)
+
+    def _execute(self, batch: List[Tuple[Callable, Future]]):
+        batch = [(fn, future) for fn, future in batch if future.set_running_or_notify_cancel()]
+        results = []
+        session = self.session_factory(expire_on_commit=False)
+        try:
+            for fn, future in batch:
+                # A task on its own needs no SAVEPOINT; the transaction is its own
+                savepoint = session.begin_nested() if len(batch) > 1 else None
+                try:
+                    result = fn(session)
+                    session.flush()
+                    if savepoint is not None:
+                        savepoint.commit()
+                    results.append((future, result, None))
+                except Exception as e:
+                    (savepoint or session).rollback()
+                    results.append((future, None, e))
+
+            session.commit()
+        except Exception as e:
+            session.rollback()
+            logger.error(f"Database writer failed to commit a batch of {len(batch)}: {str(e)}", exc_info=True)
+            errors = {id(future): error for future, _, error in results if error is not None}
+            results = [(future, None, errors.get(id(future), e)) for _, future in batch]
+        finally:
+            session.close()
+
+        self._batches += 1
+        self._tasks += len(results)
+        self._largest_batch = max(self._largest_batch, len(results))
+        for future, result, error in results:
+            if error is not None:
+                self._failed += 1
+                future.set_exception(error)
+            else:
+                future.set_result(result)
+
+db_writer = DatabaseWriter()
+stats_collector.register('db_writer', db_writer.stats)
+atexit.register(db_writer.shutdown)
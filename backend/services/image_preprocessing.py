@@ -0,0 +1,80 @@
+import io
+import logging
+from typing import Dict, Optional
+from PIL import Image, ImageOps
+from config import config
+
+logger = logging.getLogger(__name__)
+
+# Image types the Vision API accepts as-is
+SUPPORTED_MIME_TYPES = {'image/jpeg', 'image/png', 'image/gif', 'image/webp'}
+
+def preprocessing_signature() -> str:
+    """Settings that change the image sent to the Vision API (used in cache keys)"""
+    if not config.ocr_preprocess_enabled:
+        return "raw"
+    return (f"max={config.ocr_image_max_dimension};q={config.ocr_image_quality};"
+            f"gray={config.ocr_image_grayscale}")
+
+def preprocess_image(image_bytes: bytes, max_dimension: Optional[int] = None,
+                     quality: Optional[int] = None, grayscale: Optional[bool] = None) -> Dict:
+    """Shrink a receipt image before it is sent to the Vision API.
+
+    Applies EXIF orientation, optionally converts to grayscale, downsamples so
+    the longest side is at most max_dimension and re-encodes as JPEG. JPEG
+    sources are decoded in draft mode, letting libjpeg scale down by a power
+    of two while decoding instead of materialising the full-size bitmap.
+    If re-encoding does not make the payload smaller the original bytes are
+    kept. Returns the payload, its MIME type and the byte counts before and
+    after.
+    """
+    max_dimension = max_dimension or config.ocr_image_max_dimension
+    quality = quality or config.ocr_image_quality
+    grayscale = config.ocr_image_grayscale if grayscale is None else grayscale
+    original_bytes = len(image_bytes)
+
+    try:
+        with Image.open(io.BytesIO(image_bytes)) as img:
+            source_format = img.format
+            source_mime = Image.MIME.get(source_format, 'application/octet-stream')
+            original_size = img.size
+
+            if source_format == 'JPEG':
+                img.draft('L' if grayscale else 'RGB', (max_dimension, max_dimension))
+
+            processed = ImageOps.exif_transpose(img)
+            if grayscale:
+                processed = processed.convert('L')
+            elif processed.mode not in ('RGB', 'L'):
+                processed = processed.convert('RGB')
+            processed.thumbnail((max_dimension, max_dimension), Image.LANCZOS)
+
+            output = io.BytesIO()
+            processed.save(output, format='JPEG', quality=quality, optimize=True)
+            data = output.getvalue()
+            size = processed.size
+    except Exception as e:
+        logger.warning(f"Image pre-processing skipped: {str(e)}")
+        return {
+            'data': image_bytes,
+            'mime_type': 'image/jpeg',
+            'original_bytes': original_bytes,
+            'processed_bytes': original_bytes,
+            'size': None
+        }
+
+    if len(data) >= original_bytes and size == original_size and source_mime in SUPPORTED_MIME_TYPES:
+        # Nothing gained by re-encoding; send the original with its real type
+        data, mime_type = image_bytes, source_mime
+    else:
+        mime_type = 'image/jpeg'
+
+    logger.info(f"Pre-processed image {original_size} -> {size}: "
+                f"{original_bytes} -> {len(data)} bytes ({mime_type})")
+    return {
+        'data': data,
+        'mime_type': mime_type,
+        'original_bytes': original_bytes,
+        'processed_bytes': len(data),
+        'size': size
+    }
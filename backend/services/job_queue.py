@@ -0,0 +1,189 @@
+import os
+import logging
+import threading
+import uuid
+from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+from config import config
+from database import SessionLocal
+from models.job import OCRJob
+from services.receipt_pipeline import extract_and_categorize, build_receipt
+from services.db_writer import DatabaseWriter
+
+logger = logging.getLogger(__name__)
+
+class JobQueueFullError(Exception):
+    """Raised when the OCR job queue has no free slots"""
+    pass
+
+class OCRJobQueue:
+    """Bounded worker pool for OCR jobs persisted in the ocr_jobs table.
+
+    Jobs are written to the database before they are handed to the pool, so
+    anything still queued (or stuck in processing past its lease) when the
+    process dies is picked up again by recover_pending() on the next start.
+    Job state changes and the receipts workers create go through writer;
+    without one they are written inline with session_factory.
+    """
+
+    def __init__(self, session_factory=SessionLocal, upload_folder: Optional[str] = None,
+                 max_workers: Optional[int] = None, max_pending: Optional[int] = None,
+                 lease_seconds: Optional[int] = None, writer: Optional[DatabaseWriter] = None):
+        self.session_factory = session_factory
+        self.writer = writer or DatabaseWriter(session_factory, enabled=False)
+        self.upload_folder = upload_folder or config.upload_folder
+        self.max_workers = max_workers or config.ocr_worker_count
+        self.max_pending = config.ocr_queue_size if max_pending is None else max_pending
+        self.lease_seconds = lease_seconds or config.ocr_job_lease_seconds
+        self._slots = threading.BoundedSemaphore(self.max_workers + self.max_pending)
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        """Bind to the app's upload folder and resume unfinished jobs"""
+        self.upload_folder = app.config['UPLOAD_FOLDER']
+        self.recover_pending()
+
+    @property
+    def executor(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.max_workers,
+                    thread_name_prefix='ocr-job'
+                )
+            return self._executor
+
+    def enqueue(self, user_id: int, image_path: str, original_filename: Optional[str] = None) -> OCRJob:
+        """Persist a new job for a saved upload and schedule it"""
+        if not self._slots.acquire(blocking=False):
+            raise JobQueueFullError("OCR job queue is full")
+
+        def add_job(db):
+            job = OCRJob(
+                id=str(uuid.uuid4()),
+                user_id=user_id,
+                image_path=image_path,
+                original_filename=original_filename,
+                status=OCRJob.QUEUED
+            )
+            db.add(job)
+            return job
+
+        try:
+            job = self.writer.run(add_job)
+        except Exception:
+            self._slots.release()
+            raise
+
+        logger.info(f"Queued OCR job {job.id} for {image_path}")
+        self._submit(job.id, reserved=True)
+        return job
+
+    def recover_pending(self) -> int:
+        """Re-schedule queued jobs and jobs whose processing lease expired"""
+        cutoff = datetime.utcnow() - timedelta(seconds=self.lease_seconds)
+        stale = self.writer.run(lambda db: db.query(OCRJob).filter(
+            OCRJob.status == OCRJob.PROCESSING,
+            OCRJob.updated_at < cutoff
+        ).update({
+            OCRJob.status: OCRJob.QUEUED,
+            OCRJob.updated_at: datetime.utcnow()
+        }, synchronize_session=False))
+        if stale:
+            logger.warning(f"Reset {stale} OCR jobs with expired leases")
+
+        db = self.session_factory()
+        try:
+            job_ids = [row[0] for row in db.query(OCRJob.id)
+                       .filter(OCRJob.status == OCRJob.QUEUED)
+                       .order_by(OCRJob.created_at)
+                       .all()]
+        finally:
+            db.close()
+
+        for job_id in job_ids:
+            self._submit(job_id, reserved=False)
+
+        if job_ids:
+            logger.info(f"Recovered {len(job_ids)} pending OCR jobs")
+        return len(job_ids)
+
+    def shutdown(self, wait: bool = True):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=wait)
+                self._executor = None
+
+    def _submit(self, job_id: str, reserved: bool):
+        future = self.executor.submit(self._run, job_id)
+        if reserved:
+            future.add_done_callback(lambda _: self._slots.release())
+
+    def _claim(self, job_id: str) -> Optional[OCRJob]:
+        """Atomically move a job from queued to processing, returning it if claimed"""
+        def claim(db):
+            claimed = db.query(OCRJob).filter(
+                OCRJob.id == job_id,
+                OCRJob.status == OCRJob.QUEUED
+            ).update({
+                OCRJob.status: OCRJob.PROCESSING,
+                OCRJob.attempts: OCRJob.attempts + 1,
+                OCRJob.updated_at: datetime.utcnow()
+            }, synchronize_session=False)
+            return db.query(OCRJob).get(job_id) if claimed == 1 else None
+
+        return self.writer.run(claim)
+
+    def _complete(self, job_id: str, receipt_data: dict, category: str) -> int:
+        """Save the receipt and link it to the job in one transaction"""
+        def complete(db):
+            job = db.query(OCRJob).get(job_id)
+            receipt = build_receipt(receipt_data, category, job.image_path, job.user_id)
+            db.add(receipt)
+            db.flush()
+
+            job.receipt_id = receipt.id
+            job.status = OCRJob.COMPLETED
+            job.error = None
+            job.updated_at = datetime.utcnow()
+            return receipt.id
+
+        return self.writer.run(complete)
+
+    def _fail(self, job_id: str, error: str):
+        def fail(db):
+            job = db.query(OCRJob).get(job_id)
+            job.status = OCRJob.FAILED
+            job.error = error
+            job.updated_at = datetime.utcnow()
+
+        self.writer.run(fail)
+
+    def _run(self, job_id: str):
+        try:
+            job = self._claim(job_id)
+            if job is None:
+                logger.info(f"OCR job {job_id} already claimed, skipping")
+                return
+
+            filepath = os.path.join(self.upload_folder, job.image_path)
+
+            try:
+                receipt_data, category = extract_and_categorize(filepath, user_id=job.user_id)
+                receipt_id = self._complete(job_id, receipt_data, category)
+                logger.info(f"OCR job {job_id} completed with receipt {receipt_id}")
+
+            except Exception as e:
+                logger.error(f"OCR job {job_id} failed: {str(e)}")
+                self._fail(job_id, str(e))
+
+                # Clean up file if processing failed
+                try:
+                    os.remove(filepath)
+                except OSError:
+                    pass
+
+        except Exception as e:
+            logger.error(f"Unexpected error running OCR job {job_id}: {str(e)}", exc_info=True)
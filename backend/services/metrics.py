@@ -0,0 +1,113 @@
+import os
+import time
+import logging
+from contextlib import contextmanager
+from typing import Callable, Dict
+from prometheus_client import CollectorRegistry, Histogram, generate_latest, CONTENT_TYPE_LATEST, REGISTRY
+from prometheus_client.core import GaugeMetricFamily
+
+logger = logging.getLogger(__name__)
+
+# Outcome labels for LLM calls
+OK = 'ok'
+PARSE_ERROR = 'parse_error'
+API_ERROR = 'api_error'
+
+LLM_CALL_SECONDS = Histogram(
+    'ten40_llm_call_duration_seconds',
+    'Wall time of one LLM API call',
+    ['service', 'model', 'outcome'],
+    buckets=(0.1, 0.25, 0.5, 1, 2, 3, 5, 8, 13, 20, 30, 60)
+)
+LLM_TOKENS = Histogram(
+    'ten40_llm_tokens',
+    'Tokens used by one LLM API call, from response.usage',
+    ['service', 'model', 'kind'],
+    buckets=(50, 100, 250, 500, 1000, 2000, 4000, 8000, 16000)
+)
+OCR_IMAGE_BYTES = Histogram(
+    'ten40_ocr_image_bytes',
+    'Size of the image sent to the Vision model after pre-processing',
+    ['model'],
+    buckets=(16e3, 64e3, 128e3, 256e3, 512e3, 1e6, 2e6, 4e6, 8e6)
+)
+
+class LLMCall:
+    """Outcome and usage of one timed LLM call, filled in by the caller"""
+
+    def __init__(self):
+        self.outcome = OK
+        self.usage = None
+
+def record_usage(service: str, model: str, usage):
+    """Record prompt/completion token counts from an OpenAI usage object or dict"""
+    if usage is None:
+        return
+    for kind in ('prompt_tokens', 'completion_tokens'):
+        value = usage.get(kind) if isinstance(usage, dict) else getattr(usage, kind, None)
+        if isinstance(value, int):
+            LLM_TOKENS.labels(service, model, kind.split('_')[0]).observe(value)
+
+@contextmanager
+def llm_call(service: str, model: str):
+    """Time an LLM call; exceptions are recorded as api_error and re-raised.
+
+    The caller sets call.outcome to PARSE_ERROR when the response cannot be
+    used and call.usage to the response's usage for token counts.
+    """
+    call = LLMCall()
+    start = time.perf_counter()
+    try:
+        yield call
+    except Exception:
+        call.outcome = API_ERROR
+        raise
+    finally:
+        LLM_CALL_SECONDS.labels(service, model, call.outcome).observe(time.perf_counter() - start)
+        record_usage(service, model, call.usage)
+
+class StatsCollector:
+    """Exposes the stats() dicts of in-process caches as gauges.
+
+    These are per worker, so every sample carries a pid label rather than
+    being summed across processes.
+    """
+
+    def __init__(self):
+        self.sources: Dict[str, Callable[[], Dict]] = {}
+
+    def register(self, name: str, stats: Callable[[], Dict]):
+        self.sources[name] = stats
+
+    def collect(self):
+        pid = str(os.getpid())
+        for name, stats in self.sources.items():
+            try:
+                values = stats()
+            except Exception as e:
+                logger.error(f"Failed to collect {name} stats: {str(e)}")
+                continue
+            for key, value in values.items():
+                if isinstance(value, (int, float)) and not isinstance(value, bool):
+                    gauge = GaugeMetricFamily(f"ten40_{name}_{key}", f"{name} {key.replace('_', ' ')}", labels=['pid'])
+                    gauge.add_metric([pid], value)
+                    yield gauge
+
+stats_collector = StatsCollector()
+if not os.getenv('PROMETHEUS_MULTIPROC_DIR'):
+    REGISTRY.register(stats_collector)
+
+def render_metrics() -> tuple:
+    """Metrics in Prometheus text format, and their content type.
+
+    When PROMETHEUS_MULTIPROC_DIR is set (see gunicorn.conf.py) histograms
+    are read from the files every worker writes there, so any worker can
+    answer a scrape with totals for the whole server.
+    """
+    registry = REGISTRY
+    if os.getenv('PROMETHEUS_MULTIPROC_DIR'):
+        from prometheus_client import multiprocess
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        registry.register(stats_collector)
+    return generate_latest(registry), CONTENT_TYPE_LATEST
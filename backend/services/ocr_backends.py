@@ -0,0 +1,208 @@
+import os
+import json
+import time
+import random
+import asyncio
+import logging
+from abc import ABC, abstractmethod
+from typing import Dict, Optional
+from config import config
+
+logger = logging.getLogger(__name__)
+
+class OCRBackendError(Exception):
+    """Custom exception for OCR backend errors"""
+    pass
+
+class OCRCompletion:
+    """The model's answer to one Vision request"""
+
+    def __init__(self, content: Optional[str], refusal: Optional[str] = None, usage: Optional[Dict] = None):
+        self.content = content
+        self.refusal = refusal
+        self.usage = usage
+
+    def to_dict(self) -> Dict:
+        return {'content': self.content, 'refusal': self.refusal, 'usage': self.usage}
+
+class OCRBackend(ABC):
+    """The extraction step of the OCR pipeline: one Vision request in, one completion out.
+
+    request is the chat completions payload built by OCRService; image_hash
+    is the SHA-256 of the image bytes it was built from. Caching, PDF
+    splitting, pre-processing and parsing stay in OCRService, so every
+    backend exercises the same upload path.
+    """
+    name = 'base'
+    # Results from backends that do not call the real model get their own cache namespace
+    cache_tag = ''
+
+    @abstractmethod
+    def complete(self, request: Dict, image_hash: str) -> OCRCompletion:
+        pass
+
+    @abstractmethod
+    async def complete_async(self, request: Dict, image_hash: str) -> OCRCompletion:
+        pass
+
+class OpenAIBackend(OCRBackend):
+    """Calls the OpenAI chat completions API"""
+    name = 'openai'
+
+    def __init__(self, client, async_client_factory):
+        self.client = client
+        self.async_client_factory = async_client_factory
+
+    def complete(self, request: Dict, image_hash: str) -> OCRCompletion:
+        return self._completion(self.client.chat.completions.create(**request))
+
+    async def complete_async(self, request: Dict, image_hash: str) -> OCRCompletion:
+        return self._completion(await self.async_client_factory().chat.completions.create(**request))
+
+    @staticmethod
+    def _completion(response) -> OCRCompletion:
+        message = response.choices[0].message
+        refusal = getattr(message, 'refusal', None)
+        usage = getattr(response, 'usage', None)
+        tokens = {kind: getattr(usage, kind, None) for kind in ('prompt_tokens', 'completion_tokens')}
+        return OCRCompletion(
+            message.content,
+            refusal if isinstance(refusal, str) else None,
+            tokens if all(isinstance(value, int) for value in tokens.values()) else None
+        )
+
+class SyntheticLatency:
+    """Sleeps for latency_ms plus or minus jitter_ms to stand in for upstream response time"""
+
+    def __init__(self, latency_ms: Optional[float] = None, jitter_ms: Optional[float] = None):
+        self.latency_ms = config.ocr_backend_latency_ms if latency_ms is None else latency_ms
+        self.jitter_ms = config.ocr_backend_latency_jitter_ms if jitter_ms is None else jitter_ms
+
+    def seconds(self) -> float:
+        jitter = random.uniform(-self.jitter_ms, self.jitter_ms) if self.jitter_ms else 0
+        return max(0.0, self.latency_ms + jitter) / 1000
+
+    def wait(self):
+        delay = self.seconds()
+        if delay:
+            time.sleep(delay)
+
+    async def wait_async(self):
+        delay = self.seconds()
+        if delay:
+            await asyncio.sleep(delay)
+
+class StubBackend(OCRBackend):
+    """Answers every request locally with a deterministic synthetic receipt.
+
+    Stands in for a stub API server: no network, a valid response for both
+    the free-text and structured output prompts, and configurable latency.
+    """
+    name = 'stub'
+    cache_tag = 'stub'
+
+    def __init__(self, latency: Optional[SyntheticLatency] = None):
+        self.latency = latency or SyntheticLatency()
+
+    def complete(self, request: Dict, image_hash: str) -> OCRCompletion:
+        self.latency.wait()
+        return self._completion(image_hash)
+
+    async def complete_async(self, request: Dict, image_hash: str) -> OCRCompletion:
+        await self.latency.wait_async()
+        return self._completion(image_hash)
+
+    @staticmethod
+    def _completion(image_hash: str) -> OCRCompletion:
+        seed = int(image_hash[:8], 16)
+        vendor = f"Stub Vendor {image_hash[:6].upper()}"
+        amount = f"{seed % 100000 / 100:.2f} USD"
+        receipt = {
+            'Vendor': vendor,
+            'Amount': amount,
+            'Date': f"2024-{seed % 12 + 1:02d}-{seed % 28 + 1:02d}",
+            'Payment_Method': config.payment_methods[seed % len(config.payment_methods)],
+            'text': [vendor, 'ITEM 1', f"TOTAL {amount}"]
+        }
+        if config.ocr_combined_categorization:
+            receipt['Category'] = config.expense_categories[seed % len(config.expense_categories)]
+        return OCRCompletion(json.dumps(receipt))
+
+class ReplayBackend(OCRBackend):
+    """Serves completions recorded earlier, keyed by image hash, with synthetic latency.
+
+    In record mode every request goes to the wrapped backend and its
+    completion is saved as <replay_dir>/<image_hash>.json. In replay mode
+    those files are served back; images with no recording go to fallback
+    when one is set and are an error otherwise.
+    """
+    name = 'replay'
+
+    def __init__(self, replay_dir: Optional[str] = None, record_from: Optional[OCRBackend] = None,
+                 fallback: Optional[OCRBackend] = None, latency: Optional[SyntheticLatency] = None):
+        self.replay_dir = replay_dir or config.ocr_replay_dir
+        self.record_from = record_from
+        self.fallback = fallback
+        self.cache_tag = fallback.cache_tag if fallback else ''
+        self.latency = latency or SyntheticLatency()
+        os.makedirs(self.replay_dir, exist_ok=True)
+
+    def complete(self, request: Dict, image_hash: str) -> OCRCompletion:
+        if self.record_from:
+            completion = self.record_from.complete(request, image_hash)
+            self._save(image_hash, completion)
+            return completion
+
+        completion = self._load(image_hash)
+        if completion is None:
+            return self._miss(image_hash).complete(request, image_hash)
+        self.latency.wait()
+        return completion
+
+    async def complete_async(self, request: Dict, image_hash: str) -> OCRCompletion:
+        if self.record_from:
+            completion = await self.record_from.complete_async(request, image_hash)
+            await asyncio.to_thread(self._save, image_hash, completion)
+            return completion
+
+        completion = await asyncio.to_thread(self._load, image_hash)
+        if completion is None:
+            return await self._miss(image_hash).complete_async(request, image_hash)
+        await self.latency.wait_async()
+        return completion
+
+    def _path(self, image_hash: str) -> str:
+        return os.path.join(self.replay_dir, f"{image_hash}.json")
+
+    def _load(self, image_hash: str) -> Optional[OCRCompletion]:
+        try:
+            with open(self._path(image_hash)) as f:
+                recorded = json.load(f)
+        except FileNotFoundError:
+            return None
+        return OCRCompletion(recorded.get('content'), recorded.get('refusal'), recorded.get('usage'))
+
+    def _save(self, image_hash: str, completion: OCRCompletion):
+        tmp_path = f"{self._path(image_hash)}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(completion.to_dict(), f)
+        os.replace(tmp_path, self._path(image_hash))
+        logger.info(f"Recorded OCR response for {image_hash}")
+
+    def _miss(self, image_hash: str) -> OCRBackend:
+        if self.fallback is None:
+            raise OCRBackendError(f"No recorded OCR response for image {image_hash}")
+        return self.fallback
+
+def create_backend(name: str, client, async_client_factory) -> OCRBackend:
+    """Build the backend selected by OCR_BACKEND (openai, record, replay or stub)"""
+    if name == 'openai':
+        return OpenAIBackend(client, async_client_factory)
+    if name == 'record':
+        return ReplayBackend(record_from=OpenAIBackend(client, async_client_factory))
+    if name == 'replay':
+        fallback = StubBackend() if config.ocr_replay_fallback_stub else None
+        return ReplayBackend(fallback=fallback)
+    if name == 'stub':
+        return StubBackend()
+    raise OCRBackendError(f"Unknown OCR backend: {name}")
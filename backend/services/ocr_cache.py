@@ -0,0 +1,128 @@
+import json
+import logging
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from typing import Dict, Optional
+from config import config
+from sqlalchemy import func
+from database import SessionLocal
+from models.ocr_cache import OCRCacheEntry
+from services.db_writer import DatabaseWriter
+
+logger = logging.getLogger(__name__)
+
+class OCRResultCache:
+    """Two-tier cache of OCR results keyed by image SHA-256 and prompt/model version.
+
+    The first tier is an in-process LRU bounded by the total size of the cached
+    JSON; the second is the ocr_cache table, which survives restarts and is
+    shared by every worker using the same database. Database hits are promoted
+    into the LRU.
+    """
+
+    def __init__(self, session_factory=SessionLocal, max_bytes: Optional[int] = None,
+                 enabled: Optional[bool] = None, writer: Optional[DatabaseWriter] = None):
+        self.session_factory = session_factory
+        self.writer = writer or DatabaseWriter(session_factory, enabled=False)
+        self.max_bytes = config.ocr_cache_max_bytes if max_bytes is None else max_bytes
+        self.enabled = config.ocr_cache_enabled if enabled is None else enabled
+        self._entries = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+        self.memory_hits = 0
+        self.db_hits = 0
+        self.misses = 0
+
+    def get(self, image_hash: str, version: str) -> Optional[Dict]:
+        """Return the cached OCR content, or None on a miss"""
+        if not self.enabled:
+            return None
+
+        key = (image_hash, version)
+        with self._lock:
+            payload = self._entries.get(key)
+            if payload is not None:
+                self._entries.move_to_end(key)
+                self.memory_hits += 1
+                return json.loads(payload)
+
+        payload = self._load(image_hash, version)
+        with self._lock:
+            if payload is None:
+                self.misses += 1
+                return None
+            self.db_hits += 1
+            self._remember(key, payload)
+        return json.loads(payload)
+
+    def put(self, image_hash: str, version: str, content: Dict):
+        """Store successfully parsed OCR content in both tiers"""
+        if not self.enabled:
+            return
+
+        payload = json.dumps(content)
+        with self._lock:
+            self._remember((image_hash, version), payload)
+        self._store(image_hash, version, payload)
+
+    def clear(self):
+        """Drop the in-process tier (the database tier is left intact)"""
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+
+    def stats(self) -> Dict:
+        with self._lock:
+            lookups = self.memory_hits + self.db_hits + self.misses
+            return {
+                'memory_hits': self.memory_hits,
+                'db_hits': self.db_hits,
+                'misses': self.misses,
+                'hit_ratio': (self.memory_hits + self.db_hits) / lookups if lookups else 0.0,
+                'entries': len(self._entries),
+                'bytes': self._size,
+                'max_bytes': self.max_bytes
+            }
+
+    def _remember(self, key, payload: str):
+        """Insert into the LRU and evict least recently used entries over budget"""
+        size = len(payload)
+        if size > self.max_bytes:
+            return
+
+        old = self._entries.pop(key, None)
+        if old is not None:
+            self._size -= len(old)
+
+        self._entries[key] = payload
+        self._size += size
+        while self._size > self.max_bytes:
+            _, evicted = self._entries.popitem(last=False)
+            self._size -= len(evicted)
+
+    def _load(self, image_hash: str, version: str) -> Optional[str]:
+        db = self.session_factory()
+        try:
+            entry = db.query(OCRCacheEntry).get((image_hash, version))
+            payload = entry.content if entry is not None else None
+        except Exception as e:
+            logger.error(f"Failed to read OCR cache entry {image_hash}: {str(e)}")
+            return None
+        finally:
+            db.close()
+
+        if payload is not None:
+            self.writer.submit_logged(lambda session: session.query(OCRCacheEntry).filter(
+                OCRCacheEntry.image_hash == image_hash, OCRCacheEntry.version == version
+            ).update({
+                OCRCacheEntry.hit_count: func.coalesce(OCRCacheEntry.hit_count, 0) + 1,
+                OCRCacheEntry.last_hit_at: datetime.utcnow()
+            }, synchronize_session=False), f"record OCR cache hit {image_hash}")
+        return payload
+
+    def _store(self, image_hash: str, version: str, payload: str):
+        self.writer.submit_logged(
+            lambda session: session.merge(OCRCacheEntry(image_hash=image_hash, version=version, content=payload)),
+            f"write OCR cache entry {image_hash}"
+        )
@@ -1,79 +1,32 @@
-import os
+import re
 import json
 import base64
+import asyncio
+import hashlib
 import logging
-from openai import OpenAI
-from dotenv import load_dotenv
+from config import config
+from services.openai_client import create_client, get_async_client
+from services.ocr_cache import OCRResultCache
+from services.db_writer import db_writer
+from services.image_preprocessing import preprocess_image, preprocessing_signature
+from services.pdf_service import is_pdf, extract_pdf_receipt_data, extract_pdf_receipt_data_async
+from services.ocr_backends import create_backend
+from services.metrics import llm_call, stats_collector, OCR_IMAGE_BYTES, PARSE_ERROR
+from schemas.receipt import extraction_model, response_format
+from pydantic import ValidationError
 
 class OCRServiceError(Exception):
     """Custom exception for OCR service errors"""
     pass
 
-# Load environment variables
-load_dotenv()
-
 logger = logging.getLogger(__name__)
 
-# Initialize the OpenAI client with error handling
-try:
-    client = OpenAI(api_key=os.getenv('OPENAI_API_KEY'))
-    if not os.getenv('OPENAI_API_KEY'):
-        logger.error("OPENAI_API_KEY not found in environment variables")
-except Exception as e:
-    logger.error(f"Failed to initialize OpenAI client: {str(e)}")
-    raise
+client = create_client()
+ocr_backend = create_backend(config.ocr_backend, client, get_async_client)
 
-def clean_json_text(json_text: str) -> str:
-    """Clean and format JSON text for parsing"""
-    import re
-    
-    # Remove markdown code block syntax and headers
-    json_text = re.sub(r'\*\*.*?\*\*', '', json_text)
-    json_text = re.sub(r'Here is the extracted data.*?structure:', '', json_text)
-    json_text = re.sub(r'```json\s*', '', json_text)
-    json_text = re.sub(r'```\s*', '', json_text)
-    json_text = re.sub(r'Note:.*', '', json_text)
-    
-    # Find the JSON object
-    start = json_text.find('{')
-    end = json_text.rfind('}') + 1
-    if start >= 0 and end > start:
-        json_text = json_text[start:end]
-    
-    # Only clean up currency format if needed
-    json_text = re.sub(r'\$(\d+\.\d{2})(?!\s*USD)', r'\1 USD', json_text)
-    
-    # Remove any control characters
-    json_text = ''.join(char for char in json_text if ord(char) >= 32 or char in '\n\r\t')
-    
-    return json_text.strip()
+OCR_MODEL = "gpt-4o-mini"
 
-class OCRService:
-    @staticmethod
-    def extract_receipt_data(image_path):
-        """Extract receipt data using gpt-4o-mini"""
-        try:
-            logger.info(f"Processing receipt image: {image_path}")
-            
-            # Read image file and convert to base64
-            try:
-                with open(image_path, 'rb') as f:
-                    image_bytes = f.read()
-                base64_image = base64.b64encode(image_bytes).decode('utf-8')
-            except Exception as e:
-                logger.error(f"Failed to read image file: {str(e)}")
-                raise
-
-            try:
-                response = client.chat.completions.create(
-                    model="gpt-4o-mini",
-                    messages=[
-                        {
-                            "role": "user",
-                            "content": [
-                                {
-                                    "type": "text",
-                                    "text": """Extract the text from this image and format the output as a JSON object with two parts:
+OCR_PROMPT = """Extract the text from this image and format the output as a JSON object with two parts:
 1. The main fields at the root level (use exactly these field names):
    - Vendor
    - Amount
@@ -96,34 +49,262 @@ Example format:
 }
 
 Capture every line of text, including store details, items, prices, subtotals, taxes, and any additional information."""
-                                },  
-                                {
-                                    "type": "image_url",
-                                    "image_url": {
-                                        "url": f"data:image/jpeg;base64,{base64_image}"
-                                    }
-                                }
-                            ]
+
+# Asking for the category in the same response saves a second LLM round trip
+CATEGORY_PROMPT = """
+
+Also include a "Category" field at the root level containing the IRS Schedule C expense category that best fits this receipt. It must be exactly one of these values:
+{categories}"""
+
+if config.ocr_combined_categorization:
+    OCR_PROMPT += CATEGORY_PROMPT.format(categories=', '.join(config.expense_categories))
+
+# In structured output mode the API constrains the response to this schema,
+# so it is parsed straight into the model with no cleanup pass
+OCR_RESPONSE_MODEL = extraction_model()
+OCR_RESPONSE_FORMAT = response_format(OCR_RESPONSE_MODEL) if config.ocr_structured_outputs else None
+
+# Any change to the model, prompt, response schema or image pre-processing invalidates
+# previously cached results; synthetic backends never share entries with real ones
+OCR_CACHE_VERSION = hashlib.sha256(
+    f"{OCR_MODEL}\n{OCR_PROMPT}\n{json.dumps(OCR_RESPONSE_FORMAT)}\n{preprocessing_signature()}\n{ocr_backend.cache_tag}".encode('utf-8')
+).hexdigest()[:16]
+
+ocr_cache = OCRResultCache(writer=db_writer)
+stats_collector.register('ocr_cache', ocr_cache.stats)
+
+# Precompiled cleanup patterns, applied in this order by clean_json_text
+CODE_FENCE_JSON_PATTERN = re.compile(r'```json\s*')
+CODE_FENCE_PATTERN = re.compile(r'```\s*')
+NOTE_PATTERN = re.compile(r'Note:.*')
+CURRENCY_PATTERN = re.compile(r'\$(\d+\.\d{2})(?!\s*USD)')
+
+# str.translate table deleting control characters other than \n, \r and \t
+CONTROL_CHARS = dict.fromkeys(code for code in range(32) if chr(code) not in '\n\r\t')
+
+def _remove_line_spans(text: str, opener: str, closer: str) -> str:
+    """Remove opener...closer spans within a line, like re.sub(opener + '.*?' + closer, '').
+
+    Runs in linear time: once an opener has no closer before the end of its
+    line, no later opener on that line can match either, so the rest of the
+    line is skipped instead of being rescanned from every start position.
+    """
+    if opener not in text:
+        return text
+
+    parts = []
+    kept_from = search_from = 0
+    while True:
+        start = text.find(opener, search_from)
+        if start < 0:
+            break
+        line_end = text.find('\n', start)
+        if line_end < 0:
+            line_end = len(text)
+        end = text.find(closer, start + len(opener), line_end)
+        if end < 0:
+            search_from = line_end + 1
+            continue
+        parts.append(text[kept_from:start])
+        kept_from = search_from = end + len(closer)
+
+    if not parts:
+        return text
+    parts.append(text[kept_from:])
+    return ''.join(parts)
+
+def clean_json_text(json_text: str) -> str:
+    """Clean and format JSON text for parsing"""
+    # Remove markdown code block syntax and headers
+    json_text = _remove_line_spans(json_text, '**', '**')
+    json_text = _remove_line_spans(json_text, 'Here is the extracted data', 'structure:')
+    if '```' in json_text:
+        json_text = CODE_FENCE_JSON_PATTERN.sub('', json_text)
+        json_text = CODE_FENCE_PATTERN.sub('', json_text)
+    if 'Note:' in json_text:
+        json_text = NOTE_PATTERN.sub('', json_text)
+
+    # Find the JSON object
+    start = json_text.find('{')
+    end = json_text.rfind('}') + 1
+    if start >= 0 and end > start:
+        json_text = json_text[start:end]
+
+    # Only clean up currency format if needed
+    if '$' in json_text:
+        json_text = CURRENCY_PATTERN.sub(r'\1 USD', json_text)
+
+    # Remove any control characters
+    json_text = json_text.translate(CONTROL_CHARS)
+
+    return json_text.strip()
+
+def _read_image(image_path):
+    try:
+        with open(image_path, 'rb') as f:
+            return f.read()
+    except Exception as e:
+        logger.error(f"Failed to read image file: {str(e)}")
+        raise
+
+def _image_url(image_bytes) -> str:
+    """Downscale and re-encode so less data is held in memory and sent upstream"""
+    mime_type = 'image/jpeg'
+    if config.ocr_preprocess_enabled:
+        processed = preprocess_image(image_bytes)
+        image_bytes, mime_type = processed.pop('data'), processed['mime_type']
+    OCR_IMAGE_BYTES.labels(OCR_MODEL).observe(len(image_bytes))
+    return f"data:{mime_type};base64,{base64.b64encode(image_bytes).decode('ascii')}"
+
+def _vision_request(image_url: str):
+    request = dict(
+        model=OCR_MODEL,
+        messages=[
+            {
+                "role": "user",
+                "content": [
+                    {
+                        "type": "text",
+                        "text": OCR_PROMPT
+                    },
+                    {
+                        "type": "image_url",
+                        "image_url": {
+                            "url": image_url
                         }
-                    ],
-                    max_tokens=1000
-                )
-                
-                content = response.choices[0].message.content
-
-                try:
-                    # Clean and format the entire response
-                    cleaned_json = clean_json_text(content)
-                    data = json.loads(cleaned_json)
-                    return {'content': data}
-                except json.JSONDecodeError as e:
-                    logger.error(f"Failed to parse OCR response: {str(e)}")
-                    return {'content': f"Error parsing JSON: {str(e)}"}
+                    }
+                ]
+            }
+        ],
+        max_tokens=1000
+    )
+    if OCR_RESPONSE_FORMAT:
+        request['response_format'] = OCR_RESPONSE_FORMAT
+    return request
+
+def _parse_response(completion):
+    """Parse the model output into receipt content, or an error string"""
+    content = completion.content
+
+    if OCR_RESPONSE_FORMAT:
+        if completion.refusal:
+            logger.error(f"Vision API refused the request: {completion.refusal}")
+            return f"Vision API Refusal: {completion.refusal}"
+        try:
+            return OCR_RESPONSE_MODEL.model_validate_json(content or '').model_dump()
+        except ValidationError as e:
+            logger.error(f"OCR response does not match the receipt schema: {str(e)}")
+            return f"Error parsing structured output: {str(e)}"
+
+    try:
+        # Clean and format the entire response
+        cleaned_json = clean_json_text(content)
+        return json.loads(cleaned_json)
+    except json.JSONDecodeError as e:
+        logger.error(f"Failed to parse OCR response: {str(e)}")
+        return f"Error parsing JSON: {str(e)}"
+
+def _cache_result(image_hash: str, result):
+    """Cache parsed content; errors and partially failed PDFs are retried next time"""
+    content = result['content']
+    if not isinstance(content, str) and 'failed_pages' not in content:
+        ocr_cache.put(image_hash, OCR_CACHE_VERSION, content)
+
+class OCRService:
+    @staticmethod
+    def extract_receipt_data(image_path, image_bytes=None, image_hash=None):
+        """Extract receipt data using gpt-4o-mini
+
+        Callers that already hold the upload in memory (see upload_ingest) pass
+        image_bytes and image_hash so the file is not read and hashed again.
+        """
+        try:
+            logger.info(f"Processing receipt image: {image_path}")
+            
+            # Read image file unless the caller already has it in memory
+            if image_bytes is None:
+                image_bytes = _read_image(image_path)
+
+            # Identical uploads skip the Vision API entirely
+            image_hash = image_hash or hashlib.sha256(image_bytes).hexdigest()
+            cached = ocr_cache.get(image_hash, OCR_CACHE_VERSION)
+            if cached is not None:
+                logger.info(f"OCR cache hit for {image_hash}")
+                return {'content': cached}
+
+            # Multi-page documents are rasterized and OCR'd page by page
+            if is_pdf(image_bytes):
+                result = extract_pdf_receipt_data(image_bytes, OCRService.extract_receipt_data, source=image_path)
+                _cache_result(image_hash, result)
+                return result
 
+            image_url = _image_url(image_bytes)
+            del image_bytes
+
+            try:
+                with llm_call('ocr', OCR_MODEL) as call:
+                    completion = ocr_backend.complete(_vision_request(image_url), image_hash)
+                    call.usage = completion.usage
+                    content = _parse_response(completion)
+                    if isinstance(content, str):
+                        call.outcome = PARSE_ERROR
             except Exception as e:
                 logger.error(f"Failed to process image with Vision API: {str(e)}")
                 return {'content': f"Vision API Error: {str(e)}"}
+
+            result = {'content': content}
+            _cache_result(image_hash, result)
+            return result
             
         except Exception as e:
             logger.error(f"OCR process failed: {str(e)}")
-            return {'content': f"OCR Error: {str(e)}"}
\ No newline at end of file
+            return {'content': f"OCR Error: {str(e)}"}
+
+    @staticmethod
+    async def extract_receipt_data_async(image_path, image_bytes=None, image_hash=None):
+        """Async variant of extract_receipt_data for the shared event loop.
+
+        The Vision call awaits the pooled AsyncOpenAI client; file reads,
+        cache lookups and image pre-processing run in worker threads so the
+        loop stays free for other in-flight requests.
+        """
+        try:
+            logger.info(f"Processing receipt image: {image_path}")
+
+            if image_bytes is None:
+                image_bytes = await asyncio.to_thread(_read_image, image_path)
+
+            image_hash = image_hash or hashlib.sha256(image_bytes).hexdigest()
+            cached = await asyncio.to_thread(ocr_cache.get, image_hash, OCR_CACHE_VERSION)
+            if cached is not None:
+                logger.info(f"OCR cache hit for {image_hash}")
+                return {'content': cached}
+
+            if is_pdf(image_bytes):
+                result = await extract_pdf_receipt_data_async(
+                    image_bytes, OCRService.extract_receipt_data_async, source=image_path
+                )
+                await asyncio.to_thread(_cache_result, image_hash, result)
+                return result
+
+            image_url = await asyncio.to_thread(_image_url, image_bytes)
+            del image_bytes
+
+            try:
+                with llm_call('ocr', OCR_MODEL) as call:
+                    completion = await ocr_backend.complete_async(_vision_request(image_url), image_hash)
+                    call.usage = completion.usage
+                    content = _parse_response(completion)
+                    if isinstance(content, str):
+                        call.outcome = PARSE_ERROR
+            except Exception as e:
+                logger.error(f"Failed to process image with Vision API: {str(e)}")
+                return {'content': f"Vision API Error: {str(e)}"}
+
+            result = {'content': content}
+            await asyncio.to_thread(_cache_result, image_hash, result)
+            return result
+
+        except Exception as e:
+            logger.error(f"OCR process failed: {str(e)}")
+            return {'content': f"OCR Error: {str(e)}"}
@@ -0,0 +1,111 @@
+import os
+import asyncio
+import logging
+import threading
+import httpx
+from concurrent.futures import Future
+from typing import Awaitable, Optional, TypeVar
+from dotenv import load_dotenv
+from openai import OpenAI, AsyncOpenAI, DefaultHttpxClient, DefaultAsyncHttpxClient, Timeout
+from config import config
+
+# Load environment variables
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar('T')
+
+def _timeout() -> Timeout:
+    return Timeout(config.openai_read_timeout, connect=config.openai_connect_timeout)
+
+def _limits() -> httpx.Limits:
+    return httpx.Limits(
+        max_connections=config.openai_max_connections,
+        max_keepalive_connections=config.openai_max_keepalive_connections
+    )
+
+if not os.getenv('OPENAI_API_KEY'):
+    logger.error("OPENAI_API_KEY not found in environment variables")
+
+# One connection pool shared by every synchronous client in the process
+http_client = DefaultHttpxClient(limits=_limits(), timeout=_timeout())
+
+def create_client() -> OpenAI:
+    """A synchronous OpenAI client over the shared connection pool"""
+    return OpenAI(
+        api_key=os.getenv('OPENAI_API_KEY'),
+        max_retries=config.openai_max_retries,
+        http_client=http_client
+    )
+
+class AsyncClientRunner:
+    """Owns one background event loop and the AsyncOpenAI client bound to it.
+
+    An async HTTP connection pool belongs to the loop it was first used on,
+    so every coroutine that touches the async client must run on this loop:
+    submit it with run() or submit() rather than asyncio.run(). Many
+    in-flight requests then share one thread and one pooled transport.
+    """
+
+    def __init__(self):
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._client: Optional[AsyncOpenAI] = None
+        self._lock = threading.Lock()
+
+    @property
+    def client(self) -> AsyncOpenAI:
+        self._ensure_started()
+        return self._client
+
+    def submit(self, coro: Awaitable[T]) -> 'Future[T]':
+        """Schedule a coroutine on the shared loop and return a concurrent Future"""
+        self._ensure_started()
+        return asyncio.run_coroutine_threadsafe(coro, self._loop)
+
+    def run(self, coro: Awaitable[T], timeout: Optional[float] = None) -> T:
+        """Run a coroutine on the shared loop and block until it finishes"""
+        return self.submit(coro).result(timeout)
+
+    def shutdown(self):
+        with self._lock:
+            if self._loop is None:
+                return
+            loop, thread, async_client = self._loop, self._thread, self._client
+            self._loop = self._thread = self._client = None
+
+        try:
+            asyncio.run_coroutine_threadsafe(async_client.close(), loop).result(timeout=5)
+        except Exception as e:
+            logger.error(f"Failed to close async OpenAI client: {str(e)}")
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join(timeout=5)
+        loop.close()
+
+    def _ensure_started(self):
+        if self._loop is not None:
+            return
+        with self._lock:
+            if self._loop is not None:
+                return
+            loop = asyncio.new_event_loop()
+            thread = threading.Thread(target=loop.run_forever, name='openai-async', daemon=True)
+            thread.start()
+            self._client = AsyncOpenAI(
+                api_key=os.getenv('OPENAI_API_KEY'),
+                max_retries=config.openai_max_retries,
+                http_client=DefaultAsyncHttpxClient(limits=_limits(), timeout=_timeout())
+            )
+            self._thread = thread
+            self._loop = loop
+            logger.info("Started async OpenAI client loop")
+
+async_runner = AsyncClientRunner()
+
+def get_async_client() -> AsyncOpenAI:
+    """The shared AsyncOpenAI client; only await it from coroutines run on async_runner"""
+    return async_runner.client
+
+def run_async(coro: Awaitable[T], timeout: Optional[float] = None) -> T:
+    return async_runner.run(coro, timeout)
@@ -0,0 +1,151 @@
+import asyncio
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+from config import config
+
+logger = logging.getLogger(__name__)
+
+PDF_MAGIC = b'%PDF-'
+
+# Summary fields and which page wins when several pages have a value
+FIRST_PAGE_FIELDS = ['Vendor', 'Date', 'Payment_Method', 'Category']
+LAST_PAGE_FIELDS = ['Amount']  # totals are printed at the end of an invoice
+
+class PDFServiceError(Exception):
+    """Custom exception for PDF rasterization errors"""
+    pass
+
+def is_pdf(data) -> bool:
+    return data is not None and bytes(data[:len(PDF_MAGIC)]) == PDF_MAGIC
+
+def iter_pdf_pages(pdf_bytes, dpi: Optional[int] = None,
+                   max_pages: Optional[int] = None) -> Iterator[Tuple[int, bytes]]:
+    """Lazily rasterize a PDF, yielding (page_number, jpeg_bytes) one page at a time.
+
+    Each page bitmap is encoded and released before the next page is
+    rendered, so a long invoice never has more than one bitmap in memory.
+    """
+    try:
+        import pymupdf
+    except ImportError:
+        raise PDFServiceError("PDF support requires PyMuPDF (pip install PyMuPDF)")
+
+    dpi = dpi or config.pdf_render_dpi
+    max_pages = max_pages or config.pdf_max_pages
+
+    try:
+        doc = pymupdf.open(stream=bytes(pdf_bytes), filetype='pdf')
+    except Exception as e:
+        raise PDFServiceError(f"Failed to open PDF: {str(e)}")
+
+    try:
+        if doc.page_count > max_pages:
+            logger.warning(f"PDF has {doc.page_count} pages, only the first {max_pages} will be processed")
+
+        for index in range(min(doc.page_count, max_pages)):
+            pixmap = doc[index].get_pixmap(dpi=dpi, colorspace=pymupdf.csGRAY)
+            page_image = pixmap.tobytes('jpeg', jpg_quality=config.ocr_image_quality)
+            del pixmap
+            yield index + 1, page_image
+    finally:
+        doc.close()
+
+def merge_page_results(pages: List[Dict]) -> Dict:
+    """Merge per-page OCR results into a single receipt content document"""
+    merged = {}
+    for field in FIRST_PAGE_FIELDS:
+        merged[field] = next((page[field] for page in pages if page.get(field)), '')
+    for field in LAST_PAGE_FIELDS:
+        merged[field] = next((page[field] for page in reversed(pages) if page.get(field)), '')
+
+    merged['text'] = []
+    for page in pages:
+        merged['text'].extend(page.get('text') or [])
+    merged['pages'] = len(pages)
+    return merged
+
+def extract_pdf_receipt_data(pdf_bytes, extract_page: Callable, source: str = 'pdf',
+                             max_workers: Optional[int] = None) -> Dict:
+    """OCR every page of a PDF concurrently and merge the results.
+
+    extract_page has the signature of OCRService.extract_receipt_data. At most
+    max_workers rendered pages are in flight at once; rendering the next
+    page waits for a slot, which keeps peak memory bounded.
+    """
+    max_workers = max_workers or config.pdf_page_workers
+    in_flight = threading.BoundedSemaphore(max_workers)
+    futures = []
+
+    try:
+        with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='pdf-page') as pool:
+            for page_number, page_image in iter_pdf_pages(pdf_bytes):
+                in_flight.acquire()
+                future = pool.submit(extract_page, f"{source}#page{page_number}", image_bytes=page_image)
+                future.add_done_callback(lambda _: in_flight.release())
+                futures.append((page_number, future))
+                del page_image
+    except PDFServiceError as e:
+        logger.error(f"PDF processing failed for {source}: {str(e)}")
+        return {'content': f"PDF Error: {str(e)}"}
+
+    return _collect_pages(source, [(page_number, future.result()) for page_number, future in futures])
+
+async def extract_pdf_receipt_data_async(pdf_bytes, extract_page: Callable, source: str = 'pdf',
+                                         max_workers: Optional[int] = None) -> Dict:
+    """Async variant of extract_pdf_receipt_data for the shared event loop.
+
+    extract_page has the signature of OCRService.extract_receipt_data_async.
+    Pages are rendered in a worker thread and their OCR calls run as
+    concurrent tasks, with at most max_workers rendered pages in flight.
+    """
+    max_workers = max_workers or config.pdf_page_workers
+    in_flight = asyncio.Semaphore(max_workers)
+    tasks = []
+
+    async def extract(page_number, page_image):
+        try:
+            return await extract_page(f"{source}#page{page_number}", image_bytes=page_image)
+        finally:
+            in_flight.release()
+
+    pages = iter_pdf_pages(pdf_bytes)
+    try:
+        while True:
+            await in_flight.acquire()
+            page = await asyncio.to_thread(next, pages, None)
+            if page is None:
+                in_flight.release()
+                break
+            tasks.append((page[0], asyncio.create_task(extract(*page))))
+            del page
+    except PDFServiceError as e:
+        logger.error(f"PDF processing failed for {source}: {str(e)}")
+        for _, task in tasks:
+            task.cancel()
+        return {'content': f"PDF Error: {str(e)}"}
+    finally:
+        pages.close()
+
+    results = await asyncio.gather(*(task for _, task in tasks))
+    return _collect_pages(source, [(page_number, result) for (page_number, _), result in zip(tasks, results)])
+
+def _collect_pages(source: str, page_results: List[Tuple[int, Dict]]) -> Dict:
+    """Merge (page_number, OCR result) pairs, recording pages that failed"""
+    pages, errors = [], []
+    for page_number, result in page_results:
+        content = result['content']
+        if isinstance(content, str):  # It's an error message
+            errors.append(f"page {page_number}: {content}")
+        else:
+            pages.append(content)
+
+    if not pages:
+        return {'content': errors[0] if errors else "PDF Error: document has no pages"}
+
+    merged = merge_page_results(pages)
+    if errors:
+        logger.warning(f"Some PDF pages failed for {source}: {errors}")
+        merged['failed_pages'] = errors
+    return {'content': merged}
@@ -0,0 +1,106 @@
+import json
+import asyncio
+import logging
+from typing import Dict, List, Optional, Tuple
+from config import config
+from models.receipt import Receipt
+from services.ocr_service import OCRService
+from services.categorization_service import CategorizationService
+from services.vendor_index import vendor_category_index
+
+logger = logging.getLogger(__name__)
+
+class ReceiptProcessingError(Exception):
+    """Raised when OCR cannot produce receipt data for an image"""
+    pass
+
+def extract_and_categorize(image_path: str, image_bytes=None, image_hash: Optional[str] = None,
+                           user_id: Optional[int] = None) -> Tuple[Dict, str]:
+    """Run OCR and categorization for a saved receipt image"""
+    ocr_result = OCRService.extract_receipt_data(image_path, image_bytes=image_bytes, image_hash=image_hash)
+    receipt_data = _receipt_data(ocr_result)
+
+    category = _known_category(receipt_data, user_id)
+    if category:
+        return receipt_data, category
+
+    try:
+        category = CategorizationService.categorize_receipt(receipt_data)
+        logger.info(f"Categorized as: {category}")
+    except Exception as e:
+        logger.error(f"Categorization error: {str(e)}")
+        category = "Other expenses"
+
+    return receipt_data, category
+
+async def extract_and_categorize_async(image_path: str, image_bytes=None, image_hash: Optional[str] = None,
+                                       user_id: Optional[int] = None) -> Tuple[Dict, str]:
+    """Async variant of extract_and_categorize; run it on services.openai_client.async_runner"""
+    ocr_result = await OCRService.extract_receipt_data_async(image_path, image_bytes=image_bytes, image_hash=image_hash)
+    receipt_data = _receipt_data(ocr_result)
+
+    category = await asyncio.to_thread(_known_category, receipt_data, user_id)
+    if category:
+        return receipt_data, category
+
+    try:
+        category = await CategorizationService.categorize_receipt_async(receipt_data)
+        logger.info(f"Categorized as: {category}")
+    except Exception as e:
+        logger.error(f"Categorization error: {str(e)}")
+        category = "Other expenses"
+
+    return receipt_data, category
+
+async def extract_and_categorize_many(uploads: List[Tuple[str, Optional[str]]], user_id: Optional[int] = None,
+                                      concurrency: Optional[int] = None) -> List:
+    """Extract many (image_path, image_hash) uploads concurrently on one event loop.
+
+    Returns one (receipt_data, category) tuple or exception per upload, in order.
+    """
+    in_flight = asyncio.Semaphore(concurrency or config.upload_batch_workers)
+
+    async def extract(image_path, image_hash):
+        async with in_flight:
+            return await extract_and_categorize_async(image_path, image_hash=image_hash, user_id=user_id)
+
+    return await asyncio.gather(*(extract(path, image_hash) for path, image_hash in uploads),
+                                return_exceptions=True)
+
+def _receipt_data(ocr_result: Dict) -> Dict:
+    receipt_data = ocr_result['content']
+
+    if isinstance(receipt_data, str):  # It's an error message
+        raise ReceiptProcessingError(receipt_data)
+
+    logger.info(f"Receipt data: {receipt_data}")
+    return receipt_data
+
+def _known_category(receipt_data: Dict, user_id: Optional[int]) -> Optional[str]:
+    """A category that needs no categorization call, if there is one"""
+    # The user's own history for this vendor beats any model guess
+    category = vendor_category_index.lookup(user_id, receipt_data.get('Vendor'))
+    if category:
+        logger.info(f"Categorized from vendor history as: {category}")
+        return category
+
+    # Use the category returned with the OCR response when it is valid
+    category = receipt_data.get('Category')
+    if category in config.expense_categories:
+        logger.info(f"Categorized by OCR as: {category}")
+        return category
+    return None
+
+def build_receipt(receipt_data: Dict, category: str, image_path: str, user_id: int) -> Receipt:
+    """Create an unsaved Receipt row from OCR output"""
+    return Receipt(
+        image_path=image_path,
+        content=json.dumps(receipt_data),  # Serialize dict to JSON string
+        user_id=user_id,
+        category=category,
+        vendor=receipt_data.get('Vendor', ''),
+        amount=receipt_data.get('Amount', '0.00'),
+        date=receipt_data.get('Date', ''),
+        payment_method=receipt_data.get('Payment_Method', ''),
+        status='Pending'
+    )
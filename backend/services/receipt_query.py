@@ -0,0 +1,223 @@
+import json
+import base64
+import binascii
+from datetime import date
+from typing import Any, Dict, List, Optional, Tuple
+from sqlalchemy import or_
+from sqlalchemy.orm import load_only, undefer
+from models.receipt import Receipt, RECEIPT_FIELDS
+from utils.receipt_values import parse_amount_cents
+from config import config
+
+# Sort keys accepted in ?sort=, prefixed with '-' for descending
+SORT_COLUMNS = {
+    'date': Receipt.receipt_date,
+    'amount': Receipt.amount_cents,
+    'vendor': Receipt.vendor,
+    'category': Receipt.category,
+    'status': Receipt.status,
+    'id': Receipt.id,
+}
+DEFAULT_SORT = '-date'
+
+# Query parameters that can be repeated to match any of several values
+LIST_FILTERS = {
+    'category': Receipt.category,
+    'status': Receipt.status,
+    'payment_method': Receipt.payment_method,
+    'vendor': Receipt.vendor,
+}
+
+# Default projection for list pages: everything but the OCR content blob
+LIST_FIELDS = tuple(field for field in RECEIPT_FIELDS if field != 'content')
+
+# Any of these on GET /api/receipts selects the paginated response
+QUERY_PARAMS = {'limit', 'cursor', 'sort', 'date_from', 'date_to', 'amount_min', 'amount_max', *LIST_FILTERS}
+
+class ReceiptQueryError(Exception):
+    """Raised when list query parameters are invalid"""
+    pass
+
+def encode_cursor(sort: str, value: Any, receipt_id: int) -> str:
+    """Opaque cursor pointing just past the given row in the given sort order"""
+    if isinstance(value, date):
+        value = value.isoformat()
+    payload = json.dumps({'s': sort, 'v': value, 'id': receipt_id}, separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii').rstrip('=')
+
+def decode_cursor(cursor: str, sort: str) -> Tuple[Any, int]:
+    """The (sort value, id) of the last row of the previous page"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+        value, receipt_id = payload['v'], int(payload['id'])
+        cursor_sort = payload['s']
+    except (ValueError, KeyError, TypeError, binascii.Error):
+        raise ReceiptQueryError("Invalid cursor")
+
+    if cursor_sort != sort:
+        raise ReceiptQueryError("Cursor was issued for a different sort order")
+    if value is not None and sort.lstrip('-') == 'date':
+        try:
+            value = date.fromisoformat(value)
+        except (TypeError, ValueError):
+            raise ReceiptQueryError("Invalid cursor")
+    return value, receipt_id
+
+class ReceiptQuery:
+    """Filters, sort order and page position for one GET /api/receipts call.
+
+    Pagination is keyset based: the cursor carries the sort value and id of
+    the last row returned, and the next page starts strictly after it, so
+    each page is an index range read no matter how deep it is.
+    """
+
+    def __init__(self, filters: Optional[Dict[str, List[str]]] = None, date_from: Optional[date] = None,
+                 date_to: Optional[date] = None, amount_min: Optional[int] = None, amount_max: Optional[int] = None,
+                 sort: str = DEFAULT_SORT, limit: Optional[int] = None, cursor: Optional[str] = None):
+        if sort.lstrip('-') not in SORT_COLUMNS:
+            raise ReceiptQueryError(f"Unknown sort key '{sort}'. Use one of: {', '.join(SORT_COLUMNS)}")
+        self.filters = filters or {}
+        self.date_from = date_from
+        self.date_to = date_to
+        self.amount_min = amount_min
+        self.amount_max = amount_max
+        self.sort = sort
+        self.limit = min(max(limit or config.receipts_page_size, 1), config.receipts_max_page_size)
+        self.after = decode_cursor(cursor, sort) if cursor else None
+
+    @classmethod
+    def from_args(cls, args) -> 'ReceiptQuery':
+        """Build a query from request.args"""
+        filters = {name: values for name in LIST_FILTERS if (values := [v for v in args.getlist(name) if v])}
+        return cls(
+            filters=filters,
+            date_from=_parse_date(args.get('date_from'), 'date_from'),
+            date_to=_parse_date(args.get('date_to'), 'date_to'),
+            amount_min=_parse_amount(args.get('amount_min'), 'amount_min'),
+            amount_max=_parse_amount(args.get('amount_max'), 'amount_max'),
+            sort=args.get('sort') or DEFAULT_SORT,
+            limit=_parse_int(args.get('limit'), 'limit'),
+            cursor=args.get('cursor') or None
+        )
+
+    @property
+    def descending(self) -> bool:
+        return self.sort.startswith('-')
+
+    @property
+    def sort_column(self):
+        return SORT_COLUMNS[self.sort.lstrip('-')]
+
+    def page(self, query, user_id: int) -> Tuple[List[Receipt], Optional[str]]:
+        """One page of a Receipt query for this user, and the cursor for the next page"""
+        rows = self._fetch(self._filtered(query, user_id))
+        if len(rows) <= self.limit:
+            return rows, None
+        rows = rows[:self.limit]
+        last = rows[-1]
+        return rows, encode_cursor(self.sort, getattr(last, self.sort_column.key), last.id)
+
+    def _filtered(self, query, user_id: int):
+        query = query.filter(Receipt.user_id == user_id)
+        for name, values in self.filters.items():
+            column = LIST_FILTERS[name]
+            query = query.filter(column == values[0] if len(values) == 1 else column.in_(values))
+        if self.date_from:
+            query = query.filter(Receipt.receipt_date >= self.date_from)
+        if self.date_to:
+            query = query.filter(Receipt.receipt_date <= self.date_to)
+        if self.amount_min is not None:
+            query = query.filter(Receipt.amount_cents >= self.amount_min)
+        if self.amount_max is not None:
+            query = query.filter(Receipt.amount_cents <= self.amount_max)
+        return query
+
+    def _ordered(self, query, size: int):
+        column = self.sort_column
+        if column is Receipt.id:
+            order = [Receipt.id.desc() if self.descending else Receipt.id.asc()]
+        elif self.descending:
+            order = [column.desc(), Receipt.id.desc()]
+        else:
+            order = [column.asc(), Receipt.id.asc()]
+        return query.order_by(*order).limit(size).all()
+
+    def _fetch(self, query) -> List[Receipt]:
+        """Up to limit + 1 rows after the cursor; the extra row shows there is a next page.
+
+        SQLite puts NULLs first in ascending order and last in descending
+        order. Each condition below is a single index range so deep pages
+        cost the same as the first; when the cursor sits at the end of the
+        non-NULL rows (descending) or in the NULL rows (ascending), the page
+        is topped up from the other group with a second range read.
+        """
+        size = self.limit + 1
+        column = self.sort_column
+        if not self.after:
+            return self._ordered(query, size)
+
+        value, last_id = self.after
+        if column is Receipt.id:
+            return self._ordered(query.filter(Receipt.id < last_id if self.descending else Receipt.id > last_id), size)
+
+        if self.descending:
+            if value is None:
+                return self._ordered(query.filter(column.is_(None), Receipt.id < last_id), size)
+            rows = self._ordered(query.filter(column <= value, or_(column < value, Receipt.id < last_id)), size)
+            if len(rows) < size:
+                rows += self._ordered(query.filter(column.is_(None)), size - len(rows))
+            return rows
+
+        if value is None:
+            rows = self._ordered(query.filter(column.is_(None), Receipt.id > last_id), size)
+            if len(rows) < size:
+                rows += self._ordered(query.filter(column.isnot(None)), size - len(rows))
+            return rows
+        return self._ordered(query.filter(column >= value, or_(column > value, Receipt.id > last_id)), size)
+
+def parse_fields(value: Optional[str], default: Optional[Tuple[str, ...]] = None) -> Optional[Tuple[str, ...]]:
+    """Field names from ?fields=vendor,amount,date; id is always included"""
+    if not value:
+        return default
+    fields = [field.strip() for field in value.split(',') if field.strip()]
+    unknown = [field for field in fields if field not in RECEIPT_FIELDS]
+    if unknown:
+        raise ReceiptQueryError(f"Unknown fields: {', '.join(unknown)}. Use any of: {', '.join(RECEIPT_FIELDS)}")
+    return tuple(dict.fromkeys(['id'] + fields))
+
+def load_fields(fields: Optional[Tuple[str, ...]], *extra) -> list:
+    """Query options that load exactly the columns to_dict(fields) reads.
+
+    Columns outside the projection, including content, are never read. With
+    no projection every column is loaded up front, content included, so
+    to_dict() does not go back for it row by row.
+    """
+    if fields is None:
+        return [undefer(Receipt.content)]
+    columns = {getattr(Receipt, field) for field in fields if field != 'type'}
+    return [load_only(Receipt.id, *columns, *extra)]
+
+def _parse_int(value: Optional[str], name: str) -> Optional[int]:
+    if not value:
+        return None
+    try:
+        return int(value)
+    except ValueError:
+        raise ReceiptQueryError(f"{name} must be an integer")
+
+def _parse_date(value: Optional[str], name: str) -> Optional[date]:
+    if not value:
+        return None
+    try:
+        return date.fromisoformat(value)
+    except ValueError:
+        raise ReceiptQueryError(f"{name} must be a date in YYYY-MM-DD format")
+
+def _parse_amount(value: Optional[str], name: str) -> Optional[int]:
+    if not value:
+        return None
+    cents = parse_amount_cents(value)
+    if cents is None:
+        raise ReceiptQueryError(f"{name} must be an amount such as 12.50")
+    return cents
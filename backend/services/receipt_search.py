@@ -0,0 +1,84 @@
+import re
+import html
+import logging
+from typing import List, Optional, Tuple
+from sqlalchemy import text
+from models.receipt_search import SEARCH_TABLE
+from config import config
+
+logger = logging.getLogger(__name__)
+
+MAX_TERMS = 10
+
+# snippet() wraps matches in these; they are swapped for <mark> after the
+# OCR text has been HTML-escaped
+MATCH_START = '\x02'
+MATCH_END = '\x03'
+
+# Snippets of the OCR text, vendor and payment method columns, in the order
+# they are preferred; the owner column always matches so is never used
+SNIPPET_COLUMNS = (3, 1, 2)
+
+SEARCH_SQL = f"""
+    SELECT rowid,
+           bm25({SEARCH_TABLE}, 0.0, 10.0, 4.0, 1.0) AS score,
+           {', '.join(f"snippet({SEARCH_TABLE}, {column}, char(2), char(3), '…', 12)" for column in SNIPPET_COLUMNS)}
+    FROM {SEARCH_TABLE}
+    WHERE {SEARCH_TABLE} MATCH :match
+    ORDER BY score
+    LIMIT :limit OFFSET :offset
+"""
+
+class ReceiptSearchError(Exception):
+    """Raised when a search query has nothing to search for or a bad offset"""
+    pass
+
+class SearchHit:
+    """One ranked search result: a receipt id and a highlighted snippet"""
+
+    def __init__(self, receipt_id: int, snippet: str, score: float):
+        self.receipt_id = receipt_id
+        self.snippet = snippet
+        self.score = score
+
+def match_expression(user_id: int, query: str) -> str:
+    """FTS5 MATCH expression for free text such as "home depot drill" or "4242".
+
+    Every word must match, as a prefix, in the vendor, payment method or
+    OCR lines of one of the user's receipts. Words are quoted so FTS5
+    operators typed by the user are searched for literally.
+    """
+    terms = re.findall(r'\w+', (query or '').lower())[:MAX_TERMS]
+    if not terms:
+        raise ReceiptSearchError("Search query must contain at least one letter or digit")
+    words = ' '.join(f'"{term}"*' for term in terms)
+    return f'owner : "u{user_id}" AND {{vendor payment_method text}} : ({words})'
+
+def highlight(snippet: Optional[str]) -> str:
+    """HTML-safe snippet with matches wrapped in <mark>"""
+    escaped = html.escape(snippet or '')
+    return escaped.replace(MATCH_START, '<mark>').replace(MATCH_END, '</mark>')
+
+def _best_snippet(snippets: List[Optional[str]]) -> Optional[str]:
+    """The first column snippet that contains a match"""
+    for snippet in snippets:
+        if snippet and MATCH_START in snippet:
+            return snippet
+    return snippets[0]
+
+def search_receipts(db, user_id: int, query: str, limit: Optional[int] = None,
+                    offset: int = 0) -> Tuple[List[SearchHit], bool]:
+    """Best-ranked hits for the user's query, and whether there are more after them"""
+    if offset < 0:
+        raise ReceiptSearchError("offset must not be negative")
+    limit = min(max(limit or config.receipts_page_size, 1), config.receipts_max_page_size)
+    rows = db.execute(text(SEARCH_SQL), {
+        'match': match_expression(user_id, query),
+        'limit': limit + 1,
+        'offset': offset
+    }).fetchall()
+
+    hits = [SearchHit(receipt_id, highlight(_best_snippet(snippets)), score)
+            for receipt_id, score, *snippets in rows[:limit]]
+    logger.info(f"Search for user {user_id} matched {len(hits)} receipts at offset {offset}")
+    return hits, len(rows) > limit
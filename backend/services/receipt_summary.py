@@ -0,0 +1,53 @@
+import logging
+from typing import Dict, List, Optional
+from models.receipt_summary import ReceiptSummary, UNDATED
+
+logger = logging.getLogger(__name__)
+
+COUNTERS = ('receipt_count', 'amount_cents', 'unpriced_count')
+
+def _period(value: int) -> Optional[int]:
+    return None if value == UNDATED else value
+
+def _grouped(rows: List[ReceiptSummary], key) -> Dict:
+    """Sum the counters of rows sharing key(row)"""
+    groups = {}
+    for row in rows:
+        totals = groups.setdefault(key(row), dict.fromkeys(COUNTERS, 0))
+        for counter in COUNTERS:
+            totals[counter] += getattr(row, counter)
+    return groups
+
+def summarize_receipts(db, user_id: int, tax_year: Optional[int] = None) -> Dict:
+    """Spending totals by category, month and status, read from receipt_summaries.
+
+    Reads one row per (tax year, month, category, status) the user has
+    receipts in, so the cost follows the number of categories rather than
+    the number of receipts. Amounts are in cents; unpriced_count counts
+    receipts whose amount could not be parsed and so are not in the sums.
+    Receipts without a date are reported with tax_year and month null.
+    """
+    query = db.query(ReceiptSummary).filter(ReceiptSummary.user_id == user_id)
+    if tax_year is not None:
+        query = query.filter(ReceiptSummary.tax_year == tax_year)
+    rows = query.all()
+
+    tax_years = [row[0] for row in db.query(ReceiptSummary.tax_year)
+                 .filter(ReceiptSummary.user_id == user_id)
+                 .distinct().order_by(ReceiptSummary.tax_year.desc()).all()]
+
+    by_category = _grouped(rows, lambda row: row.category)
+    by_month = _grouped(rows, lambda row: (row.tax_year, row.month))
+    by_status = _grouped(rows, lambda row: row.status)
+    logger.info(f"Summarized {len(rows)} summary rows for user {user_id}, tax year {tax_year}")
+
+    return {
+        'tax_year': tax_year,
+        'tax_years': [_period(year) for year in tax_years],
+        'totals': _grouped(rows, lambda row: None).get(None, dict.fromkeys(COUNTERS, 0)),
+        'by_category': [dict(category=category, **totals) for category, totals in
+                        sorted(by_category.items(), key=lambda item: (-item[1]['amount_cents'], item[0]))],
+        'by_month': [dict(tax_year=_period(year), month=_period(month), **totals) for (year, month), totals in
+                     sorted(by_month.items())],
+        'by_status': [dict(status=status, **totals) for status, totals in sorted(by_status.items())],
+    }
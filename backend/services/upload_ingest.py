@@ -0,0 +1,118 @@
+import os
+import hashlib
+import logging
+from typing import Optional, Tuple
+from PIL import ImageFile
+from config import config
+
+logger = logging.getLogger(__name__)
+
+# Leading bytes that identify the upload types we accept
+MAGIC_NUMBERS = [
+    (b'\xff\xd8\xff', 'jpeg', 'image/jpeg'),
+    (b'\x89PNG\r\n\x1a\n', 'png', 'image/png'),
+    (b'GIF87a', 'gif', 'image/gif'),
+    (b'GIF89a', 'gif', 'image/gif'),
+    (b'%PDF-', 'pdf', 'application/pdf'),
+]
+
+IMAGE_KINDS = {'jpeg', 'png', 'gif', 'webp'}
+
+class UploadIngestError(Exception):
+    """Raised when an upload cannot be written to disk"""
+    pass
+
+class IngestedUpload:
+    """Result of streaming an upload to disk in a single pass"""
+
+    def __init__(self, path: str, data: Optional[bytearray], size: int, sha256: str, kind: Optional[str],
+                 mime_type: Optional[str], dimensions: Optional[Tuple[int, int]]):
+        self.path = path
+        self.data = data
+        self.size = size
+        self.sha256 = sha256
+        self.kind = kind
+        self.mime_type = mime_type
+        self.dimensions = dimensions
+
+    @property
+    def is_valid_image(self) -> bool:
+        """Recognised image type whose header could be parsed"""
+        return self.kind in IMAGE_KINDS and self.dimensions is not None
+
+    @property
+    def is_supported(self) -> bool:
+        """Valid image, or a PDF to be rasterized page by page"""
+        return self.is_valid_image or self.kind == 'pdf'
+
+def sniff_kind(header: bytes) -> Tuple[Optional[str], Optional[str]]:
+    """Identify the file type from its magic bytes"""
+    for magic, kind, mime_type in MAGIC_NUMBERS:
+        if header.startswith(magic):
+            return kind, mime_type
+    if header[:4] == b'RIFF' and header[8:12] == b'WEBP':
+        return 'webp', 'image/webp'
+    return None, None
+
+def ingest_upload(stream, dest_path: str, chunk_size: Optional[int] = None,
+                  keep_data: bool = True, probe_max_bytes: Optional[int] = None) -> IngestedUpload:
+    """Stream an upload to dest_path, hashing, sniffing and probing it on the way.
+
+    The request body is read exactly once: every chunk is written to disk,
+    fed to the SHA-256 digest and kept in memory so OCR can use the buffer
+    instead of reading the file back. Until the image header has been seen,
+    chunks are also fed to an incremental Pillow parser to learn the
+    dimensions without decoding any pixels. The parser keeps its own copy of
+    what it is fed, so feeding stops once the magic bytes show the upload is
+    not an image (PDFs) or after probe_max_bytes. Pass keep_data=False when
+    many uploads are handled at once and OCR should read them back from disk.
+    """
+    chunk_size = chunk_size or config.upload_chunk_size
+    probe_max_bytes = probe_max_bytes or config.upload_probe_max_bytes
+    digest = hashlib.sha256()
+    buffer = bytearray()
+    header = b''
+    size = 0
+    parser = ImageFile.Parser()
+    dimensions = None
+    probing = True
+
+    try:
+        with open(dest_path, 'wb') as out:
+            while True:
+                chunk = stream.read(chunk_size)
+                if not chunk:
+                    break
+                out.write(chunk)
+                digest.update(chunk)
+                size += len(chunk)
+                if keep_data:
+                    buffer += chunk
+                if len(header) < 16:
+                    header += chunk[:16]
+
+                if probing and len(header) >= 16 and sniff_kind(header)[0] not in IMAGE_KINDS:
+                    probing = False
+                if probing:
+                    try:
+                        parser.feed(chunk[:probe_max_bytes - (size - len(chunk))])
+                    except Exception:
+                        probing = False
+                    if parser.image is not None:
+                        dimensions = parser.image.size
+                        probing = False
+                    elif size >= probe_max_bytes:
+                        probing = False
+    except Exception as e:
+        logger.error(f"Failed to write upload to {dest_path}: {str(e)}")
+        try:
+            os.remove(dest_path)
+        except OSError:
+            pass
+        raise UploadIngestError(str(e))
+
+    kind, mime_type = sniff_kind(header)
+    upload = IngestedUpload(dest_path, buffer if keep_data else None, size, digest.hexdigest(),
+                            kind, mime_type, dimensions)
+    logger.info(f"Ingested upload {dest_path}: {upload.size} bytes, {kind}, {dimensions}, sha256={upload.sha256}")
+    return upload
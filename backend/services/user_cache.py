@@ -0,0 +1,165 @@
+import time
+import logging
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from config import config
+from models.user import User
+from services.metrics import stats_collector
+
+logger = logging.getLogger(__name__)
+
+class CachedUser:
+    """Read-only snapshot of the users row that require_auth puts on g.user.
+
+    Holds no password hash and no session, so one snapshot can be shared by
+    every request presenting the same token.
+    """
+
+    __slots__ = ('id', 'email', 'full_name', 'created_at', 'last_login')
+
+    def __init__(self, id: int, email: str, full_name: Optional[str], created_at=None, last_login=None):
+        self.id = id
+        self.email = email
+        self.full_name = full_name
+        self.created_at = created_at
+        self.last_login = last_login
+
+    @classmethod
+    def from_user(cls, user: User) -> 'CachedUser':
+        return cls(user.id, user.email, user.full_name, user.created_at, user.last_login)
+
+class UserCache:
+    """Bounded LRU of verified token -> CachedUser.
+
+    A hit skips both the JWT signature check and the users query. Entries
+    expire ttl_seconds after they were stored, or when the token itself
+    expires if that is sooner. invalidate(user_id) drops every entry for a
+    user; it is called when a users row changes (see the session listeners
+    below) and on login.
+    """
+
+    def __init__(self, max_entries: Optional[int] = None, ttl_seconds: Optional[int] = None,
+                 enabled: Optional[bool] = None):
+        self.max_entries = config.user_cache_max_entries if max_entries is None else max_entries
+        self.ttl_seconds = config.user_cache_ttl_seconds if ttl_seconds is None else ttl_seconds
+        self.enabled = config.user_cache_enabled if enabled is None else enabled
+        self._entries = OrderedDict()
+        self._tokens_by_user: Dict[int, set] = {}
+        # Bumped by invalidate(), so a lookup that raced a change is not stored
+        self._generations: Dict[int, int] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+        self.invalidations = 0
+
+    def get(self, token: str) -> Optional[CachedUser]:
+        """Return the cached user for a token, or None on a miss"""
+        if not self.enabled:
+            return None
+
+        with self._lock:
+            entry = self._entries.get(token)
+            if entry is None:
+                self.misses += 1
+                return None
+            user, expires_at = entry
+            if expires_at <= time.time():
+                self._discard(token)
+                self.expired += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(token)
+            self.hits += 1
+            return user
+
+    def generation(self, user_id: int) -> int:
+        """Take before loading a user and pass to put()"""
+        with self._lock:
+            return self._generations.get(user_id, 0)
+
+    def put(self, token: str, user: User, token_expires_at: Optional[float] = None,
+            generation: Optional[int] = None) -> CachedUser:
+        """Snapshot a freshly loaded user and cache it for the token"""
+        snapshot = CachedUser.from_user(user)
+        if not self.enabled or self.max_entries <= 0:
+            return snapshot
+
+        expires_at = time.time() + self.ttl_seconds
+        if token_expires_at is not None:
+            expires_at = min(expires_at, token_expires_at)
+        with self._lock:
+            if generation is not None and generation != self._generations.get(user.id, 0):
+                return snapshot
+            self._discard(token)
+            self._entries[token] = (snapshot, expires_at)
+            self._tokens_by_user.setdefault(user.id, set()).add(token)
+            while len(self._entries) > self.max_entries:
+                self._discard(next(iter(self._entries)))
+        return snapshot
+
+    def invalidate(self, user_id: int):
+        """Drop every cached token for the user"""
+        with self._lock:
+            self._generations[user_id] = self._generations.get(user_id, 0) + 1
+            for token in self._tokens_by_user.pop(user_id, ()):
+                self._entries.pop(token, None)
+            self.invalidations += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._tokens_by_user.clear()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'expired': self.expired,
+                'invalidations': self.invalidations,
+                'hit_ratio': self.hits / lookups if lookups else 0.0,
+                'entries': len(self._entries),
+                'max_entries': self.max_entries
+            }
+
+    def _discard(self, token: str):
+        """Remove one entry; the caller holds the lock"""
+        entry = self._entries.pop(token, None)
+        if entry is not None:
+            tokens = self._tokens_by_user.get(entry[0].id)
+            if tokens is not None:
+                tokens.discard(token)
+                if not tokens:
+                    del self._tokens_by_user[entry[0].id]
+
+user_cache = UserCache()
+stats_collector.register('user_cache', user_cache.stats)
+
+@event.listens_for(Session, 'after_flush')
+def _collect_changed_users(session, flush_context):
+    """Remember users changed or deleted in this flush until the transaction commits"""
+    user_ids = {obj.id for obj in session.deleted if isinstance(obj, User)}
+    user_ids.update(obj.id for obj in session.dirty
+                    if isinstance(obj, User) and session.is_modified(obj, include_collections=False))
+    if user_ids:
+        session.info.setdefault('changed_user_ids', set()).update(user_ids)
+
+@event.listens_for(Session, 'after_commit')
+def _invalidate_changed_users(session):
+    """Invalidate after the commit, so a request cannot re-cache the old row in between"""
+    # Releasing a SAVEPOINT also fires after_commit; wait for the outer commit
+    if session.in_nested_transaction():
+        return
+    for user_id in session.info.pop('changed_user_ids', ()):
+        user_cache.invalidate(user_id)
+
+@event.listens_for(Session, 'after_soft_rollback')
+def _forget_changed_users(session, previous_transaction):
+    # A SAVEPOINT rolling back leaves the rest of the writer's batch to commit
+    if not session.in_transaction():
+        session.info.pop('changed_user_ids', None)
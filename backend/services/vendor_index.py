@@ -0,0 +1,205 @@
+import re
+import time
+import logging
+import threading
+from collections import Counter
+from typing import Optional
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session, object_session
+from config import config
+from database import SessionLocal
+from models.receipt import Receipt, ReceiptChangeHistory
+
+logger = logging.getLogger(__name__)
+
+def normalize_vendor(vendor: Optional[str]) -> str:
+    """Normalize a vendor name so "HOME DEPOT #4512" and "Home Depot" match"""
+    if not vendor or vendor == 'Missing':
+        return ''
+    words = re.sub(r'[^a-z0-9]+', ' ', vendor.lower()).split()
+    return ' '.join(word for word in words if not word.isdigit())
+
+class VendorCategoryIndex:
+    """Per-user vendor -> category weights built from past receipts.
+
+    Each receipt contributes one vote for its category under its normalized
+    vendor; receipts whose category the user corrected (a 'category' row in
+    receipt_change_history) vote with correction_weight instead. A user's
+    index is loaded from the database on first use, kept current from
+    Receipt insert/update/delete events in this process once their
+    transaction commits (see the listeners below), and rebuilt after
+    ttl_seconds so changes made by other workers are picked up.
+    """
+
+    def __init__(self, session_factory=SessionLocal, min_support: Optional[int] = None,
+                 min_confidence: Optional[float] = None, correction_weight: Optional[int] = None,
+                 ttl_seconds: Optional[int] = None, enabled: Optional[bool] = None):
+        self.session_factory = session_factory
+        self.min_support = min_support or config.vendor_index_min_support
+        self.min_confidence = min_confidence or config.vendor_index_min_confidence
+        self.correction_weight = correction_weight or config.vendor_index_correction_weight
+        self.ttl_seconds = config.vendor_index_ttl_seconds if ttl_seconds is None else ttl_seconds
+        self.enabled = config.vendor_index_enabled if enabled is None else enabled
+        self._users = {}
+        self._lock = threading.RLock()
+        self.hits = 0
+        self.misses = 0
+
+    def lookup(self, user_id: int, vendor: Optional[str]) -> Optional[str]:
+        """Return the user's usual category for this vendor when confidence is high"""
+        key = normalize_vendor(vendor)
+        if not self.enabled or not user_id or not key:
+            return None
+
+        with self._lock:
+            index = self._get_user(user_id)
+            votes = index['vendors'].get(key)
+            category = None
+            if votes:
+                total = sum(votes.values())
+                top_category, top_weight = votes.most_common(1)[0]
+                if total >= self.min_support and top_weight / total >= self.min_confidence:
+                    category = top_category
+
+            if category:
+                self.hits += 1
+            else:
+                self.misses += 1
+            return category
+
+    def apply(self, user_id: int, receipt_id: int, vendor: Optional[str], category: Optional[str],
+              corrected: bool = False):
+        """Record a receipt's current vendor/category, replacing its previous vote"""
+        with self._lock:
+            index = self._users.get(user_id)
+            if index is None:
+                return  # built from the database on first lookup
+
+            previous = index['receipts'].pop(receipt_id, None)
+            weight = 1
+            if previous is not None:
+                self._vote(index, previous[0], previous[1], -previous[2])
+                weight = previous[2]
+            if corrected:
+                weight = self.correction_weight
+
+            key = normalize_vendor(vendor)
+            if key and category in config.expense_categories:
+                index['receipts'][receipt_id] = (key, category, weight)
+                self._vote(index, key, category, weight)
+
+    def remove(self, user_id: int, receipt_id: int):
+        with self._lock:
+            index = self._users.get(user_id)
+            if index is None:
+                return
+            previous = index['receipts'].pop(receipt_id, None)
+            if previous is not None:
+                self._vote(index, previous[0], previous[1], -previous[2])
+
+    def invalidate(self, user_id: Optional[int] = None):
+        with self._lock:
+            if user_id is None:
+                self._users.clear()
+            else:
+                self._users.pop(user_id, None)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': self.hits / lookups if lookups else 0.0,
+                'users': len(self._users)
+            }
+
+    def _get_user(self, user_id: int):
+        index = self._users.get(user_id)
+        if index is None or time.monotonic() - index['loaded_at'] > self.ttl_seconds:
+            index = self._load_user(user_id)
+            self._users[user_id] = index
+        return index
+
+    def _load_user(self, user_id: int):
+        index = {'loaded_at': time.monotonic(), 'receipts': {}, 'vendors': {}}
+        db = self.session_factory()
+        try:
+            corrected_ids = {row[0] for row in db.query(ReceiptChangeHistory.receipt_id)
+                             .join(Receipt, Receipt.id == ReceiptChangeHistory.receipt_id)
+                             .filter(Receipt.user_id == user_id,
+                                     ReceiptChangeHistory.field_name == 'category')
+                             .distinct()}
+            rows = db.query(Receipt.id, Receipt.vendor, Receipt.category)\
+                     .filter(Receipt.user_id == user_id)\
+                     .all()
+        except Exception as e:
+            logger.error(f"Failed to build vendor index for user {user_id}: {str(e)}")
+            return index
+        finally:
+            db.close()
+
+        for receipt_id, vendor, category in rows:
+            key = normalize_vendor(vendor)
+            if key and category in config.expense_categories:
+                weight = self.correction_weight if receipt_id in corrected_ids else 1
+                index['receipts'][receipt_id] = (key, category, weight)
+                self._vote(index, key, category, weight)
+
+        logger.info(f"Built vendor index for user {user_id}: {len(index['vendors'])} vendors")
+        return index
+
+    @staticmethod
+    def _vote(index, key: str, category: str, weight: int):
+        votes = index['vendors'].setdefault(key, Counter())
+        votes[category] += weight
+        if votes[category] <= 0:
+            del votes[category]
+        if not votes:
+            del index['vendors'][key]
+
+vendor_category_index = VendorCategoryIndex()
+
+def _record(target, method: str, *args):
+    """Queue an index change on the flushing session until its transaction commits"""
+    object_session(target).info.setdefault('vendor_index_changes', []).append((method, args))
+
+@event.listens_for(Receipt, 'after_insert')
+def _receipt_inserted(mapper, connection, target):
+    _record(target, 'apply', target.user_id, target.id, target.vendor, target.category)
+
+@event.listens_for(Receipt, 'after_update')
+def _receipt_updated(mapper, connection, target):
+    corrected = inspect(target).attrs.category.history.has_changes()
+    _record(target, 'apply', target.user_id, target.id, target.vendor, target.category, corrected)
+
+@event.listens_for(Receipt, 'after_delete')
+def _receipt_deleted(mapper, connection, target):
+    _record(target, 'remove', target.user_id, target.id)
+
+@event.listens_for(Session, 'after_transaction_create')
+def _mark_savepoint(session, transaction):
+    """Note how many changes were queued when a SAVEPOINT starts"""
+    if transaction.nested:
+        marks = session.info.setdefault('vendor_index_savepoints', {})
+        marks[transaction] = len(session.info.get('vendor_index_changes', ()))
+
+@event.listens_for(Session, 'after_commit')
+def _apply_changes(session):
+    # Releasing a SAVEPOINT also fires after_commit; wait for the outer commit
+    if session.in_nested_transaction():
+        return
+    session.info.pop('vendor_index_savepoints', None)
+    for method, args in session.info.pop('vendor_index_changes', ()):
+        getattr(vendor_category_index, method)(*args)
+
+@event.listens_for(Session, 'after_soft_rollback')
+def _discard_changes(session, previous_transaction):
+    if not session.in_transaction():
+        session.info.pop('vendor_index_changes', None)
+        session.info.pop('vendor_index_savepoints', None)
+    elif previous_transaction.nested:
+        # Only the rolled-back SAVEPOINT's changes; the rest of the writer's batch still commits
+        mark = session.info.get('vendor_index_savepoints', {}).pop(previous_transaction, None)
+        if mark is not None:
+            del session.info.get('vendor_index_changes', [])[mark:]
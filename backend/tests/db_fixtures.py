@@ -0,0 +1,33 @@
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+from database import Base
+import models  # registers every table with Base
+
+# In-memory database fixtures for the self-contained test modules. conftest.py
+# cannot be relied on, so modules import the fixtures they use explicitly,
+# together with the ones those depend on:
+#     from tests.db_fixtures import engine, session_factory, db
+
+def memory_engine():
+    """In-memory SQLite engine whose single connection is shared across threads"""
+    return create_engine('sqlite://', connect_args={'check_same_thread': False}, poolclass=StaticPool)
+
+@pytest.fixture
+def engine():
+    """An empty in-memory database with every table created"""
+    engine = memory_engine()
+    Base.metadata.create_all(engine)
+    yield engine
+    engine.dispose()
+
+@pytest.fixture
+def session_factory(engine):
+    return sessionmaker(bind=engine)
+
+@pytest.fixture
+def db(session_factory):
+    session = session_factory()
+    yield session
+    session.close()
@@ -1,9 +1,19 @@
 import pytest
 from backend.config import config
+from auth.jwt import create_access_token
+from models.user import User
 
-def test_get_options(client):
+@pytest.fixture
+def auth_headers(db_session):
+    """Bearer token for a user in the test session"""
+    user = User(email='options@example.com', hashed_password='x')
+    db_session.add(user)
+    db_session.flush()
+    return {'Authorization': f'Bearer {create_access_token(user.id)}'}
+
+def test_get_options(client, auth_headers):
     """Test options endpoint returns correct configuration options"""
-    response = client.get('/api/options')
+    response = client.get('/api/options', headers=auth_headers)
     assert response.status_code == 200
     
     data = response.json
@@ -16,4 +26,9 @@ def test_get_options(client):
     # Verify configuration values are correct
     assert set(data['categories']) == set(config.expense_categories)
     assert set(data['payment_methods']) == set(config.payment_methods)
-    assert set(data['statuses']) == set(config.receipt_statuses) 
\ No newline at end of file
+    assert set(data['statuses']) == set(config.receipt_statuses)
+
+def test_get_options_requires_auth(client):
+    """Test options endpoint rejects requests without a token"""
+    response = client.get('/api/options')
+    assert response.status_code == 401
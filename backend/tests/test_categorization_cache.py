@@ -0,0 +1,79 @@
+import pytest
+from unittest.mock import patch, MagicMock
+from services.categorization_cache import CategorizationCache, receipt_cache_key, text_cache_key
+from services.categorization_service import CategorizationService
+from tests.db_fixtures import engine, session_factory
+
+@pytest.fixture
+def cache(session_factory):
+    cache = CategorizationCache(session_factory, max_entries=100, ttl_seconds=3600, shared=True, enabled=True)
+    with patch('services.categorization_service.categorization_cache', cache):
+        yield cache
+
+def llm_response(category):
+    return MagicMock(choices=[MagicMock(message=MagicMock(content=category))])
+
+def test_keys_ignore_formatting_prices_and_item_order():
+    first = receipt_cache_key({'Vendor': 'STAPLES #1123', 'text': ['Paper  4.99', 'Pens 2.50']})
+    second = receipt_cache_key({'Vendor': 'Staples', 'text': ['pens 3.10', 'PAPER 5.49']})
+    assert first == second
+    assert first != receipt_cache_key({'Vendor': 'Staples', 'text': ['Toner']})
+    assert receipt_cache_key({}) is None
+    assert text_cache_key('Lunch with client, $42') == text_cache_key('lunch with CLIENT $17')
+
+def test_lru_eviction(session_factory):
+    cache = CategorizationCache(session_factory, max_entries=2, ttl_seconds=3600, shared=False, enabled=True)
+    cache.put('a', 'v1', 'Meals')
+    cache.put('b', 'v1', 'Travel')
+    assert cache.get('a', 'v1') == 'Meals'  # 'b' is now least recently used
+    cache.put('c', 'v1', 'Supplies')
+
+    assert cache.get('b', 'v1') is None
+    assert cache.get('a', 'v1') == 'Meals'
+    assert cache.get('c', 'v1') == 'Supplies'
+    assert cache.get('a', 'v2') is None  # different category-list version
+    assert cache.stats()['entries'] == 2
+
+def test_entries_expire(session_factory):
+    cache = CategorizationCache(session_factory, max_entries=10, ttl_seconds=0, shared=True, enabled=True)
+    cache.put('a', 'v1', 'Meals')
+    assert cache.get('a', 'v1') is None
+    assert cache.stats()['expired'] == 2  # once in memory, once in the shared tier
+
+def test_shared_tier_serves_other_workers(session_factory):
+    """A second process-local cache finds entries stored by the first"""
+    first = CategorizationCache(session_factory, max_entries=10, ttl_seconds=3600, shared=True, enabled=True)
+    second = CategorizationCache(session_factory, max_entries=10, ttl_seconds=3600, shared=True, enabled=True)
+    first.put('a', 'v1', 'Meals')
+
+    assert second.get('a', 'v1') == 'Meals'
+    assert second.get('a', 'v1') == 'Meals'
+    stats = second.stats()
+    assert stats['shared_hits'] == 1
+    assert stats['memory_hits'] == 1
+    assert stats['hit_ratio'] == 1.0
+
+def test_categorize_receipt_is_memoized(cache):
+    with patch('services.categorization_service.client.chat.completions.create',
+               return_value=llm_response('Office Expenses')) as mock_create:
+        assert CategorizationService.categorize_receipt({'Vendor': 'Staples', 'text': ['Paper 4.99']}) == 'Office Expenses'
+        assert CategorizationService.categorize_receipt({'Vendor': 'STAPLES', 'text': ['PAPER 6.99']}) == 'Office Expenses'
+
+    assert mock_create.call_count == 1
+    assert cache.stats()['memory_hits'] == 1
+
+def test_invalid_answers_are_not_memoized(cache):
+    with patch('services.categorization_service.client.chat.completions.create',
+               return_value=llm_response('Stationery')) as mock_create:
+        CategorizationService.categorize_receipt({'Vendor': 'Staples', 'text': ['Paper']})
+        CategorizationService.categorize_receipt({'Vendor': 'Staples', 'text': ['Paper']})
+
+    assert mock_create.call_count == 2
+
+def test_categorize_text_is_memoized(cache):
+    with patch('services.categorization_service.client.chat.completions.create',
+               return_value=llm_response('Meals')) as mock_create:
+        assert CategorizationService.categorize('Lunch with client') == ['Meals']
+        assert CategorizationService.categorize('lunch with client!') == ['Meals']
+
+    assert mock_create.call_count == 1
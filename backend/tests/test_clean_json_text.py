@@ -0,0 +1,69 @@
+import re
+import json
+import random
+import pytest
+from services.ocr_service import clean_json_text
+
+def legacy_clean_json_text(json_text: str) -> str:
+    """The original implementation, kept as the reference for equivalence"""
+    json_text = re.sub(r'\*\*.*?\*\*', '', json_text)
+    json_text = re.sub(r'Here is the extracted data.*?structure:', '', json_text)
+    json_text = re.sub(r'```json\s*', '', json_text)
+    json_text = re.sub(r'```\s*', '', json_text)
+    json_text = re.sub(r'Note:.*', '', json_text)
+
+    start = json_text.find('{')
+    end = json_text.rfind('}') + 1
+    if start >= 0 and end > start:
+        json_text = json_text[start:end]
+
+    json_text = re.sub(r'\$(\d+\.\d{2})(?!\s*USD)', r'\1 USD', json_text)
+    json_text = ''.join(char for char in json_text if ord(char) >= 32 or char in '\n\r\t')
+    return json_text.strip()
+
+RECEIPT_JSON = json.dumps({
+    'Vendor': 'Trader Joe\'s',
+    'Amount': '$23.47',
+    'Date': '2024-03-02',
+    'Payment_Method': 'Visa',
+    'Category': 'Meals',
+    'text': ['TRADER JOE\'S #552', 'BANANAS $0.99', 'COFFEE $8.99 USD', 'TOTAL $23.47']
+}, indent=4)
+
+# Shapes of responses seen from the Vision model
+CORPUS = [
+    RECEIPT_JSON,
+    f"```json\n{RECEIPT_JSON}\n```",
+    f"```\n{RECEIPT_JSON}\n```\n",
+    f"**Receipt Data**\n\n```json\n{RECEIPT_JSON}\n```",
+    f"Here is the extracted data in the requested JSON structure:\n```json\n{RECEIPT_JSON}\n```\nNote: the date was partially obscured.",
+    f"Here is the extracted data, but no structure marker\n{RECEIPT_JSON}",
+    f"**Note:** amounts are in USD\n{RECEIPT_JSON}\n**End**",
+    f"{RECEIPT_JSON}\x00\x07\x1b",
+    "﻿" + RECEIPT_JSON.replace('\n', '\r\n'),
+    '{"Vendor": "A**B", "Amount": "$5.00", "text": ["**", "** bold ** and **unclosed"]}',
+    '{"Vendor": "Shell", "Amount": "$45.10USD", "text": ["$1.999", "$12.34  USD", "$$3.50"]}',
+    '{"Vendor": "Cafe", "text": ["Note: thank you", "TOTAL $4.50"]}',
+    'I could not read this receipt.',
+    '',
+]
+
+@pytest.mark.parametrize('response', CORPUS)
+def test_matches_legacy_output_on_corpus(response):
+    assert clean_json_text(response) == legacy_clean_json_text(response)
+
+def test_matches_legacy_output_on_random_inputs():
+    """Random mixes of every token the patterns care about"""
+    tokens = ['*', '**', '```', '```json', 'json', 'Note:', 'Here is the extracted data', 'structure:',
+              '$', '$1.23', '$12.345', ' USD', 'USD', '{', '}', '"a": 1', ' ', '\n', '\t', '\r',
+              '\x00', '\x1f', '\x7f', 'é', 'x']
+    rng = random.Random(1040)
+    for _ in range(3000):
+        response = ''.join(rng.choice(tokens) for _ in range(rng.randint(0, 40)))
+        assert clean_json_text(response) == legacy_clean_json_text(response), repr(response)
+
+def test_cleaned_response_parses():
+    data = json.loads(clean_json_text(CORPUS[4]))
+    assert data['Amount'] == '23.47 USD'
+    assert data['text'][1] == 'BANANAS 0.99 USD'
+    assert data['text'][2] == 'COFFEE $8.99 USD'  # already has a currency suffix
@@ -0,0 +1,55 @@
+import pytest
+from models.receipt import Receipt
+from services.data_version import get_data_version, data_version_etag
+from tests.db_fixtures import engine, session_factory, db
+
+def receipt(user_id, vendor='Shell'):
+    return Receipt(user_id=user_id, vendor=vendor, amount='10.00', date='2024-01-01',
+                   category='Travel', status='pending', image_path='r.png')
+
+def test_version_starts_at_zero(db):
+    assert get_data_version(db, 1) == 0
+
+def test_one_bump_per_user_per_flush(db):
+    db.add_all([receipt(1) for _ in range(5)] + [receipt(2)])
+    db.commit()
+    assert get_data_version(db, 1) == 1
+    assert get_data_version(db, 2) == 1
+
+def test_update_and_delete_bump_only_the_owner(db):
+    mine, theirs = receipt(1), receipt(2)
+    db.add_all([mine, theirs])
+    db.commit()
+
+    mine.category = 'Supplies'
+    db.commit()
+    assert get_data_version(db, 1) == 2
+
+    db.delete(mine)
+    db.commit()
+    assert get_data_version(db, 1) == 3
+    assert get_data_version(db, 2) == 1
+
+def test_unchanged_values_do_not_bump(db):
+    mine = receipt(1)
+    db.add(mine)
+    db.commit()
+
+    assert mine.vendor == 'Shell'  # loaded first, as the PATCH route does before it sets
+    mine.vendor = 'Shell'
+    db.commit()
+    assert get_data_version(db, 1) == 1
+
+def test_bump_rolls_back_with_the_receipt(db):
+    db.add(receipt(1))
+    db.flush()
+    db.rollback()
+    assert get_data_version(db, 1) == 0
+
+def test_etag_changes_with_version_and_request():
+    etag = data_version_etag(1, 4, 'api.get_receipts', [])
+    assert etag == data_version_etag(1, 4, 'api.get_receipts', [])
+    assert etag != data_version_etag(1, 5, 'api.get_receipts', [])
+    assert etag != data_version_etag(2, 4, 'api.get_receipts', [])
+    assert etag != data_version_etag(1, 4, 'api.get_options', [])
+    assert etag != data_version_etag(1, 4, 'api.get_receipts', [('limit', '10')])
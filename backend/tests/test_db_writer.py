@@ -0,0 +1,116 @@
+import threading
+import pytest
+from sqlalchemy import text
+from sqlalchemy.exc import IntegrityError, OperationalError
+from sqlalchemy.orm import sessionmaker
+from database import Base, connection_profile, create_read_engine, create_writer_engine
+from models import User  # registers users for the receipts foreign key
+from models.receipt import Receipt, ReceiptChangeHistory
+from services.db_writer import DatabaseWriter
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / 'writer.db')
+
+@pytest.fixture
+def writer_engine(path):
+    engine = create_writer_engine(f"sqlite:///{path}", connection_profile(db_path=path))
+    Base.metadata.create_all(engine)
+    yield engine
+    engine.dispose()
+
+@pytest.fixture
+def writer(writer_engine):
+    writer = DatabaseWriter(sessionmaker(bind=writer_engine), max_batch=64, max_delay_ms=0, enabled=True)
+    yield writer
+    writer.shutdown()
+
+def add_receipt(vendor):
+    def add(db):
+        receipt = Receipt(user_id=1, vendor=vendor, image_path='r.png', status='pending')
+        db.add(receipt)
+        db.flush()
+        return receipt.id
+    return add
+
+def vendors(engine):
+    with engine.connect() as connection:
+        return [row[0] for row in connection.execute(text("SELECT vendor FROM receipts ORDER BY id"))]
+
+def test_waiting_writes_share_one_commit(writer, writer_engine):
+    started, release = threading.Event(), threading.Event()
+
+    def block(db):
+        started.set()
+        release.wait(5)
+
+    first = writer.submit(block)
+    started.wait(5)
+    futures = [writer.submit(add_receipt(f'Vendor {n}')) for n in range(10)]
+    release.set()
+
+    ids = [future.result(5) for future in futures]
+    first.result(5)
+    assert len(set(ids)) == 10
+    assert writer.stats()['batches'] == 2
+    assert writer.stats()['largest_batch'] == 10
+    assert vendors(writer_engine) == [f'Vendor {n}' for n in range(10)]
+
+def test_failed_write_is_rolled_back_alone(writer, writer_engine):
+    started, release = threading.Event(), threading.Event()
+
+    def block(db):
+        started.set()
+        release.wait(5)
+
+    def fail(db):
+        add_receipt('Half written')(db)
+        raise ValueError('bad receipt')
+
+    def fail_on_flush(db):
+        add_receipt('Also half written')(db)
+        db.add(ReceiptChangeHistory(receipt_id=1, field_name='vendor', new_value='x'))  # no changed_at
+
+    writer.submit(block)
+    started.wait(5)
+    futures = [writer.submit(task) for task in
+               (add_receipt('Before'), fail, add_receipt('Between'), fail_on_flush, add_receipt('After'))]
+    release.set()
+
+    with pytest.raises(ValueError, match='bad receipt'):
+        futures[1].result(5)
+    with pytest.raises(IntegrityError):
+        futures[3].result(5)
+    assert all(futures[n].result(5) for n in (0, 2, 4))
+    assert vendors(writer_engine) == ['Before', 'Between', 'After']
+    assert writer.stats()['failed'] == 2
+
+def test_results_are_usable_after_commit(writer):
+    receipt = writer.run(lambda db: db.merge(Receipt(user_id=1, vendor='Shell', image_path='r.png')))
+    assert receipt.id and receipt.vendor == 'Shell'
+
+def test_disabled_writer_runs_inline(writer_engine):
+    writer = DatabaseWriter(sessionmaker(bind=writer_engine), enabled=False)
+    assert writer.run(add_receipt('Inline'))
+    assert writer._thread is None
+    assert vendors(writer_engine) == ['Inline']
+
+def test_submit_logged_logs_failures(writer, writer_engine, caplog):
+    def fail(db):
+        raise ValueError('bad entry')
+
+    writer.submit_logged(add_receipt('Logged'), 'write a receipt')
+    writer.submit_logged(fail, 'write a bad entry')
+    writer.run(lambda db: None)  # both tasks are done once a later one is
+    assert vendors(writer_engine) == ['Logged']
+    assert 'Failed to write a bad entry: bad entry' in caplog.text
+
+def test_read_pool_rejects_writes(path, writer_engine):
+    read_engine = create_read_engine(f"sqlite:///{path}", connection_profile(db_path=path))
+    try:
+        with read_engine.connect() as connection:
+            assert connection.execute(text("SELECT COUNT(*) FROM receipts")).scalar() == 0
+            with pytest.raises(OperationalError, match='readonly'):
+                connection.execute(text("INSERT INTO receipts (user_id, image_path) VALUES (1, 'r.png')"))
+    finally:
+        read_engine.dispose()
@@ -0,0 +1,57 @@
+import io
+from PIL import Image, ImageDraw
+from services.image_preprocessing import preprocess_image
+
+def create_photo(width=4000, height=3000, fmt='JPEG', exif=None):
+    """Create a noisy phone-sized photo"""
+    img = Image.effect_noise((width, height), 64).convert('RGB')
+    draw = ImageDraw.Draw(img)
+    draw.rectangle((0, 0, width // 4, height // 4), fill=(255, 0, 0))
+    output = io.BytesIO()
+    if exif is not None:
+        img.save(output, format=fmt, quality=95, exif=exif)
+    else:
+        img.save(output, format=fmt, quality=95)
+    return output.getvalue()
+
+def test_large_jpeg_is_downsampled():
+    """Phone photos are shrunk to the max dimension and re-encoded as grayscale JPEG"""
+    photo = create_photo()
+    result = preprocess_image(photo, max_dimension=1024, quality=75, grayscale=True)
+
+    assert result['mime_type'] == 'image/jpeg'
+    assert result['original_bytes'] == len(photo)
+    assert result['processed_bytes'] == len(result['data'])
+    assert result['processed_bytes'] < result['original_bytes']
+    assert max(result['size']) <= 1024
+
+    with Image.open(io.BytesIO(result['data'])) as img:
+        assert img.mode == 'L'
+        assert max(img.size) <= 1024
+
+def test_exif_orientation_is_applied():
+    """Rotated camera images are turned upright before downsampling"""
+    exif = Image.Exif()
+    exif[0x0112] = 6  # Rotate 90 CW
+    photo = create_photo(width=800, height=400, exif=exif)
+
+    result = preprocess_image(photo, max_dimension=400, quality=75, grayscale=False)
+    width, height = result['size']
+    assert height > width
+
+def test_png_keeps_real_mime_type_when_not_shrunk():
+    """Small images that do not benefit from re-encoding are sent unchanged"""
+    img = Image.new('1', (64, 64), color=1)
+    output = io.BytesIO()
+    img.save(output, format='PNG')
+    png = output.getvalue()
+
+    result = preprocess_image(png, max_dimension=2048, quality=95, grayscale=True)
+    assert result['data'] == png
+    assert result['mime_type'] == 'image/png'
+
+def test_unreadable_input_is_passed_through():
+    """Bytes Pillow cannot decode are returned untouched"""
+    result = preprocess_image(b'not an image')
+    assert result['data'] == b'not an image'
+    assert result['processed_bytes'] == result['original_bytes']
@@ -0,0 +1,112 @@
+import pytest
+from datetime import date, datetime, timedelta
+from sqlalchemy import event, text
+from models.receipt import Receipt, ReceiptChangeHistory
+from services.receipt_query import ReceiptQuery, encode_cursor
+from migrations.add_user_scoped_indexes import INDEXES, upgrade, downgrade
+from tests.db_fixtures import memory_engine, engine, session_factory, db
+
+CATEGORIES = ['Travel', 'Supplies', 'Utilities', 'Meals']
+STATUSES = ['pending', 'approved', 'rejected']
+
+@pytest.fixture
+def session(db):
+    # Many users with a handful of receipts each, like production
+    changed_at = datetime(2024, 1, 1)
+    for n in range(2000):
+        db.add(Receipt(
+            user_id=n % 200 + 1,
+            vendor=f'Vendor {n % 300}',
+            amount=f'{n % 97}.50 USD',
+            date=f'2024-{n % 12 + 1:02d}-{n % 28 + 1:02d}',
+            category=CATEGORIES[n % len(CATEGORIES)],
+            status=STATUSES[n % len(STATUSES)],
+            image_path=f'{n}.png'
+        ))
+    db.flush()
+    for n in range(2000):
+        db.add(ReceiptChangeHistory(receipt_id=n % 500 + 1, field_name='vendor', new_value='x',
+                                    changed_at=changed_at + timedelta(minutes=n)))
+    db.commit()
+    db.execute(text("ANALYZE"))
+    return db
+
+def query_plan(db, query):
+    statement = query.statement.compile(db.bind, compile_kwargs={'literal_binds': True})
+    rows = db.execute(text(f"EXPLAIN QUERY PLAN {statement}")).fetchall()
+    return ' | '.join(row[-1] for row in rows)
+
+def test_model_indexes_match_migration():
+    model_indexes = {index.name: tuple(column.name for column in index.columns)
+                     for table in (Receipt.__table__, ReceiptChangeHistory.__table__)
+                     for index in table.indexes if index.name.startswith('ix_receipt')}
+    assert {name: columns for name, _, columns in INDEXES}.items() <= model_indexes.items()
+
+@pytest.mark.parametrize('build, index', [
+    (lambda q: q.filter(Receipt.user_id == 7), 'ix_receipts_user_'),
+    (lambda q: q.filter(Receipt.user_id == 7).order_by(Receipt.receipt_date.desc()), 'ix_receipts_user_receipt_date'),
+    (lambda q: q.filter(Receipt.user_id == 7, Receipt.category == 'Travel'), 'ix_receipts_user_category'),
+    (lambda q: q.filter(Receipt.user_id == 7, Receipt.status == 'approved'), 'ix_receipts_user_status'),
+    (lambda q: q.filter(Receipt.user_id == 7, Receipt.vendor == 'Vendor 7'), 'ix_receipts_user_vendor'),
+    (lambda q: q.filter(Receipt.user_id == 7).order_by(Receipt.amount_cents), 'ix_receipts_user_amount_cents'),
+])
+def test_receipt_list_queries_use_user_indexes(session, build, index):
+    plan = query_plan(session, build(session.query(Receipt)))
+    assert f'SEARCH receipts USING INDEX {index}' in plan
+
+def test_receipt_list_sort_needs_no_temp_btree(session):
+    plan = query_plan(session, session.query(Receipt).filter(Receipt.user_id == 7).order_by(Receipt.receipt_date.desc()))
+    assert 'USE TEMP B-TREE' not in plan
+
+def test_deep_receipt_page_is_an_index_range(session):
+    """The SQL a cursor page actually runs is a bounded range on the sort index"""
+    statements = []
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        statements.append((statement, parameters))
+
+    receipt_query = ReceiptQuery(sort='-date', cursor=encode_cursor('-date', date(2024, 6, 1), 1000))
+    event.listen(session.bind, 'before_cursor_execute', capture)
+    try:
+        receipt_query.page(session.query(Receipt), 7)
+    finally:
+        event.remove(session.bind, 'before_cursor_execute', capture)
+
+    statement, parameters = statements[0]
+    plan = ' | '.join(row[-1] for row in session.connection().exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters))
+    assert 'USING INDEX ix_receipts_user_receipt_date (user_id=? AND receipt_date<?)' in plan
+    assert 'USE TEMP B-TREE' not in plan
+
+def test_user_vendor_list_uses_covering_index(session):
+    query = session.query(Receipt.vendor).filter(Receipt.user_id == 7).distinct()
+    assert 'USING COVERING INDEX ix_receipts_user_vendor' in query_plan(session, query)
+
+def test_change_history_query_uses_index(session):
+    query = session.query(ReceiptChangeHistory)\
+                   .filter(ReceiptChangeHistory.receipt_id == 3)\
+                   .order_by(ReceiptChangeHistory.changed_at.desc())
+    plan = query_plan(session, query)
+    assert 'USING INDEX ix_receipt_change_history_receipt_changed_at' in plan
+    assert 'USE TEMP B-TREE' not in plan
+
+def test_migration_adds_and_drops_indexes():
+    engine = memory_engine()
+    with engine.begin() as connection:
+        connection.execute(text(
+            "CREATE TABLE receipts (id INTEGER PRIMARY KEY, user_id INTEGER, vendor VARCHAR(255), "
+            "category VARCHAR(50), status VARCHAR(20), amount_cents INTEGER, receipt_date DATE)"
+        ))
+        connection.execute(text(
+            "CREATE TABLE receipt_change_history (id INTEGER PRIMARY KEY, receipt_id INTEGER, changed_at DATETIME)"
+        ))
+
+    def index_names():
+        with engine.connect() as connection:
+            return {row[0] for row in connection.execute(text("SELECT name FROM sqlite_master WHERE type = 'index'"))}
+
+    upgrade(engine)
+    upgrade(engine)  # safe to run again
+    assert {name for name, _, _ in INDEXES} <= index_names()
+
+    downgrade(engine)
+    assert not {name for name, _, _ in INDEXES} & index_names()
+    engine.dispose()
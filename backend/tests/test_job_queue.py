@@ -0,0 +1,99 @@
+import pytest
+import threading
+from datetime import datetime, timedelta
+from unittest.mock import patch
+from models import Receipt, OCRJob
+from services.job_queue import OCRJobQueue, JobQueueFullError
+from tests.db_fixtures import engine, session_factory
+
+RECEIPT_DATA = {
+    'Vendor': 'Office Depot',
+    'Amount': '12.34 USD',
+    'Date': '2024-01-20',
+    'Payment_Method': 'Credit Card',
+    'text': ['Paper', 'Pens']
+}
+
+@pytest.fixture
+def upload_folder(tmp_path):
+    (tmp_path / 'receipt.png').write_bytes(b'fake image')
+    return str(tmp_path)
+
+def test_enqueue_completes_job(session_factory, upload_folder):
+    """A queued job runs OCR and links the created receipt"""
+    queue = OCRJobQueue(session_factory, upload_folder, max_workers=1, max_pending=1)
+    db = session_factory()
+
+    with patch('services.job_queue.extract_and_categorize', return_value=(RECEIPT_DATA, 'Office Expenses')):
+        job = queue.enqueue(1, 'receipt.png', 'receipt.png')
+        assert job.status == OCRJob.QUEUED
+        queue.shutdown()
+
+    db.expire_all()
+    job = db.query(OCRJob).get(job.id)
+    assert job.status == OCRJob.COMPLETED
+    assert job.attempts == 1
+    receipt = db.query(Receipt).get(job.receipt_id)
+    assert receipt.vendor == 'Office Depot'
+    assert receipt.category == 'Office Expenses'
+    db.close()
+
+def test_failed_job_records_error(session_factory, upload_folder, tmp_path):
+    """OCR failures mark the job failed and remove the upload"""
+    queue = OCRJobQueue(session_factory, upload_folder, max_workers=1, max_pending=1)
+    db = session_factory()
+
+    with patch('services.job_queue.extract_and_categorize', side_effect=Exception("Vision API Error")):
+        job = queue.enqueue(1, 'receipt.png')
+        queue.shutdown()
+
+    db.expire_all()
+    job = db.query(OCRJob).get(job.id)
+    assert job.status == OCRJob.FAILED
+    assert 'Vision API Error' in job.error
+    assert job.receipt_id is None
+    assert not (tmp_path / 'receipt.png').exists()
+    db.close()
+
+def test_enqueue_rejects_when_full(session_factory, upload_folder):
+    """Enqueue fails fast once workers and pending slots are taken"""
+    queue = OCRJobQueue(session_factory, upload_folder, max_workers=1, max_pending=0)
+    db = session_factory()
+    release = threading.Event()
+
+    def slow_ocr(filepath):
+        release.wait(5)
+        return RECEIPT_DATA, 'Supplies'
+
+    with patch('services.job_queue.extract_and_categorize', side_effect=slow_ocr):
+        queue.enqueue(1, 'receipt.png')
+        with pytest.raises(JobQueueFullError):
+            queue.enqueue(1, 'receipt.png')
+        release.set()
+        queue.shutdown()
+
+    assert db.query(OCRJob).count() == 1
+    db.close()
+
+def test_recover_pending_jobs(session_factory, upload_folder):
+    """Queued and stale processing jobs are resumed, fresh ones are left alone"""
+    db = session_factory()
+    stale = datetime.utcnow() - timedelta(hours=1)
+    db.add_all([
+        OCRJob(id='queued', user_id=1, image_path='receipt.png', status=OCRJob.QUEUED),
+        OCRJob(id='stale', user_id=1, image_path='receipt.png', status=OCRJob.PROCESSING,
+               updated_at=stale),
+        OCRJob(id='running', user_id=1, image_path='receipt.png', status=OCRJob.PROCESSING)
+    ])
+    db.commit()
+
+    queue = OCRJobQueue(session_factory, upload_folder, max_workers=2, max_pending=0, lease_seconds=60)
+    with patch('services.job_queue.extract_and_categorize', return_value=(RECEIPT_DATA, 'Supplies')):
+        assert queue.recover_pending() == 2
+        queue.shutdown()
+
+    db.expire_all()
+    assert db.query(OCRJob).get('queued').status == OCRJob.COMPLETED
+    assert db.query(OCRJob).get('stale').status == OCRJob.COMPLETED
+    assert db.query(OCRJob).get('running').status == OCRJob.PROCESSING
+    db.close()
@@ -0,0 +1,93 @@
+import os
+import sys
+import json
+import subprocess
+import pytest
+from unittest.mock import patch, MagicMock
+from prometheus_client import REGISTRY
+from services.metrics import render_metrics
+from services.ocr_service import OCRService, OCR_MODEL
+from services.categorization_service import CategorizationService
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def sample(name, **labels):
+    return REGISTRY.get_sample_value(name, labels) or 0
+
+def vision_response(content, prompt_tokens=800, completion_tokens=120):
+    return MagicMock(
+        choices=[MagicMock(message=MagicMock(content=content, refusal=None))],
+        usage=MagicMock(prompt_tokens=prompt_tokens, completion_tokens=completion_tokens)
+    )
+
+@pytest.fixture
+def image_path(tmp_path):
+    path = tmp_path / 'receipt.gif'
+    path.write_bytes(b'GIF89a metrics receipt')
+    return str(path)
+
+@pytest.fixture(autouse=True)
+def no_cache():
+    with patch('services.ocr_service.ocr_cache.enabled', False), \
+         patch('services.ocr_service.config.ocr_preprocess_enabled', False):
+        yield
+
+def test_ocr_calls_record_latency_tokens_and_outcome(image_path):
+    labels = dict(service='ocr', model=OCR_MODEL)
+    ok_before = sample('ten40_llm_call_duration_seconds_count', outcome='ok', **labels)
+    parse_before = sample('ten40_llm_call_duration_seconds_count', outcome='parse_error', **labels)
+    api_before = sample('ten40_llm_call_duration_seconds_count', outcome='api_error', **labels)
+    tokens_before = sample('ten40_llm_tokens_sum', kind='prompt', **labels)
+    bytes_before = sample('ten40_ocr_image_bytes_count', model=OCR_MODEL)
+
+    receipt = {'Vendor': 'Shell', 'Amount': '10.00 USD', 'Date': '', 'Payment_Method': '',
+               'Category': 'Travel', 'text': []}
+    with patch('services.ocr_service.client.chat.completions.create',
+               side_effect=[vision_response(json.dumps(receipt)), vision_response('not json'), Exception('timeout')]):
+        OCRService.extract_receipt_data(image_path)
+        OCRService.extract_receipt_data(image_path)
+        OCRService.extract_receipt_data(image_path)
+
+    assert sample('ten40_llm_call_duration_seconds_count', outcome='ok', **labels) == ok_before + 1
+    assert sample('ten40_llm_call_duration_seconds_count', outcome='parse_error', **labels) == parse_before + 1
+    assert sample('ten40_llm_call_duration_seconds_count', outcome='api_error', **labels) == api_before + 1
+    assert sample('ten40_llm_tokens_sum', kind='prompt', **labels) == tokens_before + 1600
+    assert sample('ten40_ocr_image_bytes_count', model=OCR_MODEL) == bytes_before + 3
+
+def test_categorization_calls_are_recorded():
+    labels = dict(service='categorization', model='gpt-4o-mini', outcome='ok')
+    before = sample('ten40_llm_call_duration_seconds_count', **labels)
+    with patch('services.categorization_service.categorization_cache.enabled', False), \
+         patch('services.categorization_service.client.chat.completions.create',
+               return_value=vision_response('Travel', prompt_tokens=90, completion_tokens=2)):
+        CategorizationService.categorize('Flight to Denver')
+
+    assert sample('ten40_llm_call_duration_seconds_count', **labels) == before + 1
+
+def test_metrics_endpoint_format():
+    body, content_type = render_metrics()
+    text = body.decode('utf-8')
+
+    assert content_type.startswith('text/plain')
+    assert '# TYPE ten40_llm_call_duration_seconds histogram' in text
+    assert 'ten40_ocr_cache_hit_ratio{pid=' in text
+    assert 'ten40_categorization_cache_hit_ratio{pid=' in text
+    assert 'ten40_vendor_index_hits{pid=' in text
+
+def test_metrics_are_summed_across_worker_processes(tmp_path):
+    """Each gunicorn worker writes its own file; a scrape of any worker sees the total"""
+    env = dict(os.environ, PROMETHEUS_MULTIPROC_DIR=str(tmp_path), TESTING='1', OPENAI_API_KEY='x')
+    record = (
+        "from services.metrics import llm_call\n"
+        "with llm_call('ocr', 'test-model') as call:\n"
+        "    call.usage = {'prompt_tokens': 100, 'completion_tokens': 10}\n"
+    )
+    for _ in range(2):
+        subprocess.run([sys.executable, '-c', record], cwd=BACKEND_DIR, env=env, check=True, capture_output=True)
+
+    scrape = "from services.metrics import render_metrics\nprint(render_metrics()[0].decode())"
+    output = subprocess.run([sys.executable, '-c', scrape], cwd=BACKEND_DIR, env=env, check=True,
+                            capture_output=True, text=True).stdout
+
+    assert 'ten40_llm_call_duration_seconds_count{model="test-model",outcome="ok",service="ocr"} 2.0' in output
+    assert 'ten40_llm_tokens_sum{kind="prompt",model="test-model",service="ocr"} 200.0' in output
@@ -0,0 +1,62 @@
+import importlib
+import os
+from sqlalchemy import inspect, text
+from tests.db_fixtures import memory_engine
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'migrations')
+
+# Already applied to the baseline schema below, and written against the old
+# DATABASE_URL/models.database layout, so they cannot run on a bind
+BASELINE = {'add_status_column.py', 'migrate_receipt_data.py', 'run_migrations.py'}
+
+BASELINE_SCHEMA = [
+    "CREATE TABLE users (id INTEGER PRIMARY KEY, email VARCHAR NOT NULL, hashed_password VARCHAR NOT NULL, "
+    "full_name VARCHAR, created_at DATETIME, last_login DATETIME)",
+    "CREATE TABLE receipts (id INTEGER PRIMARY KEY, user_id INTEGER NOT NULL REFERENCES users (id), "
+    "vendor VARCHAR(255), amount VARCHAR(50), date VARCHAR(50), payment_method VARCHAR(50), "
+    "category VARCHAR(50), status VARCHAR(20) NOT NULL, image_path VARCHAR(255) NOT NULL, content TEXT)",
+    "CREATE TABLE receipt_change_history (id INTEGER PRIMARY KEY, "
+    "receipt_id INTEGER NOT NULL REFERENCES receipts (id) ON DELETE CASCADE, field_name VARCHAR NOT NULL, "
+    "new_value VARCHAR NOT NULL, changed_at DATETIME NOT NULL, changed_by VARCHAR)",
+]
+
+def run_chain(bind):
+    """Run every bind-aware migration in the order run_migrations uses"""
+    names = sorted(f for f in os.listdir(MIGRATIONS_DIR) if f.endswith('.py') and f not in BASELINE)
+    for name in names:
+        importlib.import_module(f'migrations.{name[:-3]}').upgrade(bind)
+    return names
+
+def test_full_chain_upgrades_baseline_schema():
+    engine = memory_engine()
+    with engine.begin() as connection:
+        for statement in BASELINE_SCHEMA:
+            connection.execute(text(statement))
+        connection.execute(text("INSERT INTO users (id, email, hashed_password) VALUES (1, 'a@example.com', 'x')"))
+        connection.execute(text(
+            "INSERT INTO receipts (id, user_id, vendor, amount, date, category, status, image_path, content) "
+            "VALUES (1, 1, 'Corner Hardware', '$12.50', '03/04/2024', 'Supplies', 'Pending', 'a.png', "
+            "'{\"text\": [\"nails\"]}'), "
+            "(2, 1, 'Corner Hardware', 'Missing', '03/09/2024', 'Supplies', 'Pending', 'b.png', NULL)"
+        ))
+
+    names = run_chain(engine)
+    assert names.index('add_typed_amount_date.py') < names.index('add_user_summaries.py')
+    assert names.index('add_typed_amount_date.py') < names.index('add_user_scoped_indexes.py')
+
+    with engine.connect() as connection:
+        assert connection.execute(text(
+            "SELECT id, amount_cents, receipt_date FROM receipts ORDER BY id"
+        )).fetchall() == [(1, 1250, '2024-03-04'), (2, None, '2024-03-09')]
+        assert connection.execute(text(
+            "SELECT tax_year, month, receipt_count, amount_cents, unpriced_count FROM receipt_summaries"
+        )).fetchall() == [(2024, 3, 2, 1250, 1)]
+        assert connection.execute(text(
+            "SELECT rowid FROM receipts_fts WHERE receipts_fts MATCH 'nails'"
+        )).fetchall() == [(1,)]
+    index_names = {index['name'] for index in inspect(engine).get_indexes('receipts')}
+    assert {'ix_receipts_user_receipt_date', 'ix_receipts_user_amount_cents'} <= index_names
+
+    run_chain(engine)  # safe to run again
+    with engine.connect() as connection:
+        assert connection.execute(text("SELECT sum(receipt_count) FROM receipt_summaries")).scalar() == 2
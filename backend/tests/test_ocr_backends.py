@@ -0,0 +1,92 @@
+import json
+import time
+import asyncio
+import pytest
+from unittest.mock import patch, MagicMock
+from services.ocr_backends import (
+    OCRCompletion, OpenAIBackend, StubBackend, ReplayBackend, SyntheticLatency, OCRBackendError, create_backend
+)
+from services.ocr_service import OCRService
+
+IMAGE_HASH = 'ab' * 32
+RECEIPT_DATA = {
+    'Vendor': 'Shell',
+    'Amount': '41.20 USD',
+    'Date': '2024-06-01',
+    'Payment_Method': 'Debit Card',
+    'Category': 'Car and Truck Expenses',
+    'text': ['SHELL', 'UNLEADED 41.20']
+}
+
+def no_latency():
+    return SyntheticLatency(latency_ms=0, jitter_ms=0)
+
+@pytest.fixture
+def image_path(tmp_path):
+    path = tmp_path / 'receipt.gif'
+    path.write_bytes(b'GIF89a receipt')
+    return str(path)
+
+@pytest.fixture(autouse=True)
+def no_cache():
+    with patch('services.ocr_service.ocr_cache.enabled', False), \
+         patch('services.ocr_service.config.ocr_preprocess_enabled', False):
+        yield
+
+def test_stub_responses_are_deterministic_and_parse(image_path):
+    backend = StubBackend(no_latency())
+    assert backend.complete({}, IMAGE_HASH).content == backend.complete({}, IMAGE_HASH).content
+
+    with patch('services.ocr_service.ocr_backend', backend):
+        result = OCRService.extract_receipt_data(image_path)
+
+    assert result['content']['Vendor'].startswith('Stub Vendor')
+    assert result['content']['Amount'].endswith(' USD')
+
+def test_record_then_replay(tmp_path, image_path):
+    """Recorded live responses are served back offline, keyed by image hash"""
+    client = MagicMock()
+    client.chat.completions.create.return_value = MagicMock(
+        choices=[MagicMock(message=MagicMock(content=json.dumps(RECEIPT_DATA), refusal=None))]
+    )
+    recorder = ReplayBackend(str(tmp_path / 'replay'), record_from=OpenAIBackend(client, None), latency=no_latency())
+    with patch('services.ocr_service.ocr_backend', recorder):
+        recorded = OCRService.extract_receipt_data(image_path)
+
+    replayer = ReplayBackend(str(tmp_path / 'replay'), latency=no_latency())
+    with patch('services.ocr_service.ocr_backend', replayer):
+        replayed = OCRService.extract_receipt_data(image_path)
+
+    assert client.chat.completions.create.call_count == 1
+    assert replayed == recorded
+    assert replayed['content']['Vendor'] == 'Shell'
+
+def test_replay_miss(tmp_path):
+    replayer = ReplayBackend(str(tmp_path), latency=no_latency())
+    with pytest.raises(OCRBackendError):
+        replayer.complete({}, IMAGE_HASH)
+
+    with_fallback = ReplayBackend(str(tmp_path), fallback=StubBackend(no_latency()), latency=no_latency())
+    assert with_fallback.complete({}, IMAGE_HASH).content == StubBackend(no_latency()).complete({}, IMAGE_HASH).content
+    assert with_fallback.cache_tag == 'stub'
+
+def test_synthetic_latency_overlaps_on_event_loop():
+    """Concurrent async requests each wait their latency without blocking one another"""
+    backend = StubBackend(SyntheticLatency(latency_ms=100, jitter_ms=0))
+
+    async def run():
+        return await asyncio.gather(*(backend.complete_async({}, f"{n:064x}") for n in range(20)))
+
+    start = time.monotonic()
+    completions = asyncio.run(run())
+    elapsed = time.monotonic() - start
+
+    assert len(completions) == 20
+    assert all(isinstance(completion, OCRCompletion) for completion in completions)
+    assert 0.1 <= elapsed < 0.5
+
+def test_create_backend():
+    assert isinstance(create_backend('openai', MagicMock(), None), OpenAIBackend)
+    assert isinstance(create_backend('stub', None, None), StubBackend)
+    with pytest.raises(OCRBackendError):
+        create_backend('carrier-pigeon', None, None)
@@ -0,0 +1,116 @@
+import json
+import pytest
+from unittest.mock import patch, MagicMock
+from models import OCRCacheEntry
+from services.ocr_cache import OCRResultCache
+from services.ocr_service import OCRService, OCR_CACHE_VERSION
+from tests.db_fixtures import engine, session_factory
+
+RECEIPT_DATA = {
+    'Vendor': 'Home Depot',
+    'Amount': '54.20 USD',
+    'Date': '2024-02-01',
+    'Payment_Method': 'Debit Card',
+    'Category': 'Supplies',
+    'text': ['HOME DEPOT', 'DRILL 49.99']
+}
+
+def test_memory_hit_after_put(session_factory):
+    """A stored result is served from the in-process tier"""
+    cache = OCRResultCache(session_factory, max_bytes=1024 * 1024, enabled=True)
+    assert cache.get('abc', 'v1') is None
+
+    cache.put('abc', 'v1', RECEIPT_DATA)
+    assert cache.get('abc', 'v1') == RECEIPT_DATA
+    assert cache.get('abc', 'v2') is None  # different prompt/model version
+
+    stats = cache.stats()
+    assert stats['memory_hits'] == 1
+    assert stats['misses'] == 2
+
+def test_database_tier_survives_restart(session_factory):
+    """A new cache instance finds results persisted by an earlier one"""
+    OCRResultCache(session_factory, max_bytes=1024 * 1024, enabled=True).put('abc', 'v1', RECEIPT_DATA)
+
+    cache = OCRResultCache(session_factory, max_bytes=1024 * 1024, enabled=True)
+    assert cache.get('abc', 'v1') == RECEIPT_DATA
+    assert cache.get('abc', 'v1') == RECEIPT_DATA  # promoted to memory
+    assert cache.stats()['db_hits'] == 1
+    assert cache.stats()['memory_hits'] == 1
+
+    db = session_factory()
+    assert db.query(OCRCacheEntry).get(('abc', 'v1')).hit_count == 1
+    db.close()
+
+def test_database_writes_do_not_wait_for_the_writer(session_factory):
+    """Stores and hit counts are queued on the writer; lookups return straight away"""
+    writer = MagicMock()  # queues the writes without running them
+    cache = OCRResultCache(session_factory, max_bytes=1024 * 1024, enabled=True, writer=writer)
+    cache.put('abc', 'v1', RECEIPT_DATA)
+    assert writer.submit_logged.call_count == 1
+
+    db = session_factory()
+    writer.submit_logged.call_args[0][0](db)  # run the queued store
+    db.commit()
+    cache.clear()
+    assert cache.get('abc', 'v1') == RECEIPT_DATA
+    assert writer.submit_logged.call_count == 2
+
+    writer.submit_logged.call_args[0][0](db)  # run the queued hit count
+    db.commit()
+    assert db.query(OCRCacheEntry).get(('abc', 'v1')).hit_count == 1
+    db.close()
+
+def test_lru_evicts_by_size(session_factory):
+    """The least recently used entry is evicted once the byte budget is exceeded"""
+    entry_size = len(json.dumps(RECEIPT_DATA))
+    cache = OCRResultCache(session_factory, max_bytes=entry_size * 2, enabled=True)
+
+    cache.put('a', 'v1', RECEIPT_DATA)
+    cache.put('b', 'v1', RECEIPT_DATA)
+    cache.get('a', 'v1')  # 'b' is now least recently used
+    cache.put('c', 'v1', RECEIPT_DATA)
+
+    stats = cache.stats()
+    assert stats['entries'] == 2
+    assert stats['bytes'] <= stats['max_bytes']
+
+    cache.get('b', 'v1')  # falls through to the database tier
+    assert cache.stats()['db_hits'] == 1
+
+def test_extract_receipt_data_uses_cache(session_factory, tmp_path):
+    """Uploading the same bytes twice calls the Vision API once"""
+    image_path = tmp_path / 'receipt.jpg'
+    image_path.write_bytes(b'identical receipt bytes')
+
+    mock_response = MagicMock()
+    mock_response.choices = [MagicMock(message=MagicMock(content=json.dumps(RECEIPT_DATA)))]
+    cache = OCRResultCache(session_factory, max_bytes=1024 * 1024, enabled=True)
+
+    with patch('services.ocr_service.ocr_cache', cache), \
+         patch('services.ocr_service.client.chat.completions.create', return_value=mock_response) as mock_create:
+        first = OCRService.extract_receipt_data(str(image_path))
+        second = OCRService.extract_receipt_data(str(image_path))
+
+    assert mock_create.call_count == 1
+    assert first['content']['Vendor'] == 'Home Depot'
+    assert second['content'] == first['content']
+    assert cache.stats()['memory_hits'] == 1
+
+def test_parse_errors_are_not_cached(session_factory, tmp_path):
+    """Unparseable responses are retried on the next upload"""
+    image_path = tmp_path / 'receipt.jpg'
+    image_path.write_bytes(b'blurry receipt bytes')
+
+    mock_response = MagicMock()
+    mock_response.choices = [MagicMock(message=MagicMock(content="I could not read this receipt"))]
+    cache = OCRResultCache(session_factory, max_bytes=1024 * 1024, enabled=True)
+
+    with patch('services.ocr_service.ocr_cache', cache), \
+         patch('services.ocr_service.client.chat.completions.create', return_value=mock_response) as mock_create:
+        OCRService.extract_receipt_data(str(image_path))
+        result = OCRService.extract_receipt_data(str(image_path))
+
+    assert mock_create.call_count == 2
+    assert isinstance(result['content'], str)
+    assert cache.get('anything', OCR_CACHE_VERSION) is None
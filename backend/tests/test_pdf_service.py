@@ -0,0 +1,111 @@
+import io
+import asyncio
+import threading
+import time
+import pytest
+from PIL import Image
+from services.pdf_service import (
+    iter_pdf_pages, merge_page_results, extract_pdf_receipt_data, extract_pdf_receipt_data_async, is_pdf
+)
+
+pymupdf = pytest.importorskip('pymupdf')
+
+def create_pdf(pages=3):
+    """Create a multi-page invoice PDF"""
+    doc = pymupdf.open()
+    for number in range(1, pages + 1):
+        page = doc.new_page()
+        page.insert_text((72, 72), f"ACME SUPPLY invoice page {number}")
+    data = doc.tobytes()
+    doc.close()
+    return data
+
+def test_is_pdf():
+    assert is_pdf(create_pdf(1))
+    assert not is_pdf(b'\x89PNG\r\n\x1a\n')
+    assert not is_pdf(None)
+
+def test_pages_are_rasterized_lazily():
+    """Pages come out of a generator one at a time as JPEG images"""
+    pages = iter_pdf_pages(create_pdf(3), dpi=72)
+    assert not isinstance(pages, list)
+
+    page_number, page_image = next(pages)
+    assert page_number == 1
+    with Image.open(io.BytesIO(page_image)) as img:
+        assert img.format == 'JPEG'
+        assert img.mode == 'L'
+
+    assert [number for number, _ in pages] == [2, 3]
+
+def test_max_pages_limit():
+    assert len(list(iter_pdf_pages(create_pdf(5), dpi=72, max_pages=2))) == 2
+
+def test_merge_page_results():
+    """Header fields come from the first page, the total from the last"""
+    merged = merge_page_results([
+        {'Vendor': 'ACME', 'Date': '2024-03-01', 'Amount': '', 'Payment_Method': '', 'text': ['ACME', 'Item 1']},
+        {'Vendor': '', 'Amount': '10.00 USD', 'text': ['Subtotal 10.00']},
+        {'Vendor': 'ACME', 'Amount': '120.00 USD', 'Payment_Method': 'Check', 'text': ['Total 120.00']}
+    ])
+    assert merged['Vendor'] == 'ACME'
+    assert merged['Date'] == '2024-03-01'
+    assert merged['Amount'] == '120.00 USD'
+    assert merged['Payment_Method'] == 'Check'
+    assert merged['text'] == ['ACME', 'Item 1', 'Subtotal 10.00', 'Total 120.00']
+    assert merged['pages'] == 3
+
+def test_pages_are_ocrd_concurrently_with_bounded_in_flight():
+    """Pages overlap in time but never exceed the worker limit"""
+    lock = threading.Lock()
+    active = {'now': 0, 'max': 0}
+
+    def fake_extract(image_path, image_bytes=None, image_hash=None):
+        with lock:
+            active['now'] += 1
+            active['max'] = max(active['max'], active['now'])
+        time.sleep(0.05)
+        with lock:
+            active['now'] -= 1
+        page = int(image_path.rsplit('page', 1)[1])
+        return {'content': {'Vendor': 'ACME', 'Amount': f'{page}.00 USD', 'text': [f'line {page}']}}
+
+    result = extract_pdf_receipt_data(create_pdf(6), fake_extract, source='invoice.pdf', max_workers=2)
+
+    assert active['max'] == 2
+    assert result['content']['pages'] == 6
+    assert result['content']['Amount'] == '6.00 USD'
+    assert result['content']['text'] == [f'line {n}' for n in range(1, 7)]
+
+def test_failed_pages_are_reported():
+    def fake_extract(image_path, image_bytes=None, image_hash=None):
+        if image_path.endswith('page2'):
+            return {'content': "Vision API Error: timeout"}
+        return {'content': {'Vendor': 'ACME', 'text': ['ok']}}
+
+    result = extract_pdf_receipt_data(create_pdf(3), fake_extract, max_workers=2)
+    assert result['content']['pages'] == 2
+    assert result['content']['failed_pages'] == ["page 2: Vision API Error: timeout"]
+
+def test_unreadable_pdf_returns_error():
+    result = extract_pdf_receipt_data(b'%PDF-garbage', lambda *a, **k: None)
+    assert isinstance(result['content'], str)
+    assert result['content'].startswith('PDF Error')
+
+def test_async_pages_are_bounded_and_merged():
+    active = {'now': 0, 'max': 0}
+
+    async def fake_extract(image_path, image_bytes=None, image_hash=None):
+        active['now'] += 1
+        active['max'] = max(active['max'], active['now'])
+        await asyncio.sleep(0.05)
+        active['now'] -= 1
+        page = int(image_path.rsplit('page', 1)[1])
+        return {'content': {'Vendor': 'ACME', 'Amount': f'{page}.00 USD', 'text': [f'line {page}']}}
+
+    result = asyncio.run(extract_pdf_receipt_data_async(create_pdf(5), fake_extract, max_workers=2))
+
+    assert active['max'] == 2
+    assert result['content']['pages'] == 5
+    assert result['content']['Amount'] == '5.00 USD'
+    assert result['content']['text'] == [f'line {n}' for n in range(1, 6)]
@@ -0,0 +1,86 @@
+import json
+import time
+import asyncio
+import threading
+from unittest.mock import patch, MagicMock
+from config import config
+from services.ocr_service import OCR_PROMPT
+from services.openai_client import get_async_client, run_async
+from services.receipt_pipeline import extract_and_categorize, extract_and_categorize_many
+
+RECEIPT_DATA = {
+    'Vendor': 'Office Depot',
+    'Amount': '12.34 USD',
+    'Date': '2024-01-20',
+    'Payment_Method': 'Credit Card',
+    'text': ['Paper', 'Pens']
+}
+
+def test_ocr_prompt_requests_category():
+    """The Vision prompt asks for a category from the configured list"""
+    assert '"Category"' in OCR_PROMPT
+    for category in config.expense_categories:
+        assert category in OCR_PROMPT
+
+def test_valid_ocr_category_skips_categorization_call():
+    """A valid category in the OCR response avoids the second LLM call"""
+    ocr_result = {'content': dict(RECEIPT_DATA, Category='Office Expenses')}
+
+    with patch('services.receipt_pipeline.OCRService.extract_receipt_data', return_value=ocr_result), \
+         patch('services.receipt_pipeline.CategorizationService.categorize_receipt') as mock_categorize:
+        receipt_data, category = extract_and_categorize('receipt.png')
+
+    assert category == 'Office Expenses'
+    mock_categorize.assert_not_called()
+
+def test_invalid_ocr_category_falls_back():
+    """Unknown categories fall back to the categorization service"""
+    ocr_result = {'content': dict(RECEIPT_DATA, Category='Stationery')}
+
+    with patch('services.receipt_pipeline.OCRService.extract_receipt_data', return_value=ocr_result), \
+         patch('services.receipt_pipeline.CategorizationService.categorize_receipt',
+               return_value='Supplies') as mock_categorize:
+        receipt_data, category = extract_and_categorize('receipt.png')
+
+    assert category == 'Supplies'
+    mock_categorize.assert_called_once()
+
+def test_missing_ocr_category_falls_back():
+    ocr_result = {'content': dict(RECEIPT_DATA)}
+
+    with patch('services.receipt_pipeline.OCRService.extract_receipt_data', return_value=ocr_result), \
+         patch('services.receipt_pipeline.CategorizationService.categorize_receipt',
+               return_value='Supplies') as mock_categorize:
+        receipt_data, category = extract_and_categorize('receipt.png')
+
+    assert category == 'Supplies'
+    mock_categorize.assert_called_once_with(ocr_result['content'])
+
+def test_batch_extraction_shares_one_event_loop(tmp_path):
+    """Many extractions overlap on the shared loop instead of one thread each"""
+    response = MagicMock(choices=[MagicMock(message=MagicMock(
+        content=json.dumps(dict(RECEIPT_DATA, Category='Office Expenses'))
+    ))])
+    threads = set()
+
+    async def slow_create(**kwargs):
+        threads.add(threading.current_thread().name)
+        await asyncio.sleep(0.2)
+        return response
+
+    uploads = []
+    for number in range(6):
+        path = tmp_path / f'receipt{number}.gif'
+        path.write_bytes(b'GIF89a' + bytes([number]))
+        uploads.append((str(path), None))
+
+    with patch.object(get_async_client().chat.completions, 'create', side_effect=slow_create), \
+         patch('services.ocr_service.config.ocr_preprocess_enabled', False), \
+         patch('services.ocr_service.ocr_cache.enabled', False):
+        start = time.monotonic()
+        outcomes = run_async(extract_and_categorize_many(uploads, concurrency=6))
+        elapsed = time.monotonic() - start
+
+    assert [category for _, category in outcomes] == ['Office Expenses'] * 6
+    assert elapsed < 0.6
+    assert threads == {'openai-async'}
@@ -0,0 +1,145 @@
+import pytest
+from datetime import date
+from sqlalchemy import event
+from werkzeug.datastructures import MultiDict
+from models.receipt import Receipt
+from services.receipt_query import (ReceiptQuery, ReceiptQueryError, encode_cursor, parse_fields, load_fields,
+                                    LIST_FIELDS)
+from tests.db_fixtures import engine, session_factory
+
+USER_ID = 1
+
+@pytest.fixture
+def db(session_factory):
+    session = session_factory()
+    for n in range(40):
+        session.add(Receipt(
+            user_id=USER_ID,
+            vendor=f'Vendor {n % 5}',
+            # every seventh receipt has an amount or date OCR could not read
+            amount='Missing' if n % 7 == 0 else f'{n % 9}.00 USD',
+            date='Missing' if n % 7 == 3 else f'2024-{n % 12 + 1:02d}-01',
+            payment_method='Credit Card' if n % 2 else 'Cash',
+            category=['Travel', 'Supplies', 'Utilities'][n % 3],
+            status=['pending', 'approved'][n % 2],
+            image_path=f'{n}.png',
+            content='{"text": ["' + 'LINE ' * 200 + '"]}'
+        ))
+    session.add(Receipt(user_id=2, vendor='Vendor 0', amount='1.00', date='2024-01-01',
+                        category='Travel', status='pending', image_path='other.png'))
+    session.commit()
+    yield session
+    session.close()
+
+def fetch_all(db, **args):
+    """Follow next_cursor until the last page and return every row in order"""
+    rows, cursor, pages = [], None, 0
+    while True:
+        params = MultiDict(args)
+        if cursor:
+            params['cursor'] = cursor
+        receipt_query = ReceiptQuery.from_args(params)
+        page, cursor = receipt_query.page(db.query(Receipt), USER_ID)
+        assert len(page) <= receipt_query.limit
+        rows.extend(page)
+        pages += 1
+        if not cursor:
+            return rows, pages
+
+def expected_order(receipts, key, descending):
+    """SQLite order: NULLs first ascending, last descending, ties by id"""
+    present = sorted((r for r in receipts if getattr(r, key) is not None), key=lambda r: (getattr(r, key), r.id))
+    missing = sorted((r for r in receipts if getattr(r, key) is None), key=lambda r: r.id)
+    ordered = missing + present
+    return list(reversed(ordered)) if descending else ordered
+
+@pytest.mark.parametrize('sort, key', [
+    ('date', 'receipt_date'), ('-date', 'receipt_date'),
+    ('amount', 'amount_cents'), ('-amount', 'amount_cents'),
+    ('vendor', 'vendor'), ('-status', 'status'), ('-id', 'id'),
+])
+def test_keyset_pages_cover_every_row_once_in_order(db, sort, key):
+    rows, pages = fetch_all(db, sort=sort, limit='6')
+    mine = db.query(Receipt).filter(Receipt.user_id == USER_ID).all()
+
+    assert [r.id for r in rows] == [r.id for r in expected_order(mine, key, sort.startswith('-'))]
+    assert pages == 7
+
+def test_filters_run_in_sql(db):
+    params = MultiDict([('category', 'Travel'), ('category', 'Supplies'), ('status', 'approved'),
+                        ('date_from', '2024-03-01'), ('date_to', '2024-09-30'), ('amount_min', '2'),
+                        ('amount_max', '$6.00'), ('limit', '100')])
+    receipt_query = ReceiptQuery.from_args(params)
+    rows, cursor = receipt_query.page(db.query(Receipt), USER_ID)
+
+    expected = [r for r in db.query(Receipt).filter(Receipt.user_id == USER_ID)
+                if r.category in ('Travel', 'Supplies') and r.status == 'approved'
+                and r.receipt_date and date(2024, 3, 1) <= r.receipt_date <= date(2024, 9, 30)
+                and r.amount_cents is not None and 200 <= r.amount_cents <= 600]
+    assert expected and cursor is None
+    assert {r.id for r in rows} == {r.id for r in expected}
+
+def test_other_users_receipts_are_never_returned(db):
+    rows, _ = fetch_all(db, vendor='Vendor 0', limit='3')
+    assert rows and all(r.user_id == USER_ID for r in rows)
+
+def test_page_size_is_capped(db):
+    assert ReceiptQuery(limit=10**6).limit == 200
+    assert ReceiptQuery().limit == 50
+
+@pytest.mark.parametrize('args, message', [
+    ({'sort': 'content'}, 'Unknown sort key'),
+    ({'limit': 'ten'}, 'limit must be an integer'),
+    ({'date_from': '03/01/2024'}, 'date_from must be a date'),
+    ({'amount_max': 'lots'}, 'amount_max must be an amount'),
+    ({'cursor': 'not-a-cursor'}, 'Invalid cursor'),
+    ({'sort': 'amount', 'cursor': encode_cursor('-date', date(2024, 1, 1), 5)}, 'different sort order'),
+])
+def test_invalid_parameters_are_rejected(args, message):
+    with pytest.raises(ReceiptQueryError, match=message):
+        ReceiptQuery.from_args(MultiDict(args))
+
+@pytest.fixture
+def statements(db):
+    """SQL sent to the database while the test runs"""
+    sent = []
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        sent.append(statement)
+    event.listen(db.bind, 'before_cursor_execute', capture)
+    yield sent
+    event.remove(db.bind, 'before_cursor_execute', capture)
+
+def test_list_pages_never_read_content(db, statements):
+    receipt_query = ReceiptQuery(limit=10)
+    rows, _ = receipt_query.page(db.query(Receipt).options(*load_fields(LIST_FIELDS, receipt_query.sort_column)), USER_ID)
+    body = [r.to_dict(LIST_FIELDS) for r in rows]
+
+    assert 'content' not in body[0] and body[0]['vendor'].startswith('Vendor')
+    assert len(statements) == 1
+    assert 'receipts.content' not in statements[0]
+
+def test_projection_loads_only_requested_columns(db, statements):
+    fields = parse_fields('vendor,amount_cents,type')
+    receipt = db.query(Receipt).options(*load_fields(fields)).filter(Receipt.user_id == USER_ID)\
+                 .order_by(Receipt.id).first()
+
+    assert receipt.to_dict(fields) == {'id': receipt.id, 'vendor': 'Vendor 0', 'amount_cents': None, 'type': 'Expenses'}
+    assert len(statements) == 1
+    assert 'receipts.content' not in statements[0] and 'receipts.status' not in statements[0]
+
+def test_full_receipt_loads_content_in_the_same_query(db, statements):
+    receipts = db.query(Receipt).options(*load_fields(None)).filter(Receipt.user_id == USER_ID).all()
+    assert all(r.to_dict()['content'].startswith('{"text"') for r in receipts)
+    assert len(statements) == 1
+
+def test_content_is_deferred_by_default(db, statements):
+    receipt = db.query(Receipt).first()
+    assert 'receipts.content' not in statements[0]
+    assert receipt.content.startswith('{"text"')
+    assert len(statements) == 2
+
+def test_unknown_fields_are_rejected():
+    with pytest.raises(ReceiptQueryError, match='Unknown fields: password'):
+        parse_fields('vendor,password')
+    assert parse_fields('vendor,vendor') == ('id', 'vendor')
+    assert parse_fields(None, LIST_FIELDS) == LIST_FIELDS
@@ -0,0 +1,98 @@
+import json
+import pytest
+from sqlalchemy import text
+from models.receipt import Receipt
+from models.receipt_search import rebuild_search_index
+from services.receipt_search import search_receipts, match_expression, highlight, ReceiptSearchError
+from migrations.add_receipt_search import upgrade
+from tests.db_fixtures import engine, session_factory, db
+
+def receipt(user_id, vendor, lines, payment_method='Cash'):
+    return Receipt(user_id=user_id, vendor=vendor, amount='10.00', date='2024-01-01', category='Supplies',
+                   status='pending', payment_method=payment_method, image_path='r.png',
+                   content=json.dumps({'Vendor': vendor, 'text': lines}))
+
+def ids(hits):
+    return [hit.receipt_id for hit in hits]
+
+@pytest.fixture
+def receipts(db):
+    rows = [
+        receipt(1, 'The Home Depot', ['HOME DEPOT #4512', 'DEWALT DRILL 20V  129.00', 'VISA ****4242']),
+        receipt(1, 'Lowes', ['LOWES', 'DRILL BITS 12.99'], payment_method='Visa 4242'),
+        receipt(1, 'Starbucks', ['STARBUCKS', 'LATTE 5.25']),
+        receipt(2, 'The Home Depot', ['HOME DEPOT', 'DRILL 99.00']),
+    ]
+    db.add_all(rows)
+    db.commit()
+    return rows
+
+def test_search_matches_vendor_and_ocr_lines(db, receipts):
+    hits, more = search_receipts(db, 1, 'home depot drill')
+    assert ids(hits) == [receipts[0].id]
+    assert not more
+    assert '<mark>DRILL</mark>' in hits[0].snippet
+
+def test_search_by_card_digits_and_prefix(db, receipts):
+    assert set(ids(search_receipts(db, 1, '4242')[0])) == {receipts[0].id, receipts[1].id}
+    hits, _ = search_receipts(db, 1, 'starb')
+    assert ids(hits) == [receipts[2].id]
+    assert hits[0].snippet.startswith('<mark>STARBUCKS</mark>')
+
+def test_results_are_ranked_best_first(db, receipts):
+    hits, _ = search_receipts(db, 1, 'drill')
+    assert len(hits) == 2
+    assert hits[0].score <= hits[1].score
+
+def test_other_users_receipts_are_not_searched(db, receipts):
+    assert receipts[3].id not in ids(search_receipts(db, 1, 'drill')[0])
+    assert ids(search_receipts(db, 2, 'drill')[0]) == [receipts[3].id]
+
+def test_index_follows_updates_and_deletes(db, receipts):
+    receipts[2].vendor = 'Blue Bottle'
+    receipts[2].content = json.dumps({'text': ['BLUE BOTTLE', 'POUR OVER 6.00']})
+    db.commit()
+    assert search_receipts(db, 1, 'starbucks')[0] == []
+    assert ids(search_receipts(db, 1, 'pour over')[0]) == [receipts[2].id]
+
+    db.delete(receipts[1])
+    db.commit()
+    assert ids(search_receipts(db, 1, 'drill')[0]) == [receipts[0].id]
+
+def test_pagination(db):
+    db.add_all([receipt(1, f'Shell {n}', ['FUEL']) for n in range(5)])
+    db.commit()
+    first, more = search_receipts(db, 1, 'fuel', limit=3)
+    rest, more_after = search_receipts(db, 1, 'fuel', limit=3, offset=3)
+    assert (len(first), more, len(rest), more_after) == (3, True, 2, False)
+    assert not set(ids(first)) & set(ids(rest))
+
+def test_negative_offset_is_rejected(db, receipts):
+    with pytest.raises(ReceiptSearchError, match='offset'):
+        search_receipts(db, 1, 'drill', offset=-5)
+
+def test_query_operators_are_searched_literally(db, receipts):
+    assert search_receipts(db, 1, 'drill OR "latte" NEAR(')[0] == []
+    with pytest.raises(ReceiptSearchError):
+        match_expression(1, ' * " ')
+
+def test_snippets_are_html_escaped():
+    assert highlight('<b>\x02TOOL\x03</b>') == '&lt;b&gt;<mark>TOOL</mark>&lt;/b&gt;'
+
+def test_unparseable_content_is_indexed_by_vendor(db):
+    broken = Receipt(user_id=1, vendor='Ace Hardware', image_path='r.png', status='pending', content='not json')
+    db.add(broken)
+    db.commit()
+    hits, _ = search_receipts(db, 1, 'ace')
+    assert ids(hits) == [broken.id]
+    assert hits[0].snippet == '<mark>Ace</mark> Hardware'
+
+def test_migration_indexes_existing_receipts(db, receipts):
+    db.execute(text("DELETE FROM receipts_fts"))
+    db.commit()
+    assert search_receipts(db, 1, 'drill')[0] == []
+
+    upgrade(db.get_bind())
+    upgrade(db.get_bind())  # safe to run again
+    assert len(search_receipts(db, 1, 'drill')[0]) == 2
+    assert rebuild_search_index(db.connection()) == 4
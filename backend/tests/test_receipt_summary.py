@@ -0,0 +1,126 @@
+import random
+import pytest
+from sqlalchemy import text
+from models.receipt import Receipt
+from models.receipt_summary import ReceiptSummary, rebuild_receipt_summaries
+from services.receipt_summary import summarize_receipts
+from migrations.add_user_summaries import upgrade
+from tests.db_fixtures import engine, session_factory, db
+
+def receipt(user_id=1, amount='10.00', date='2024-01-15', category='Supplies', status='Pending'):
+    return Receipt(user_id=user_id, vendor='Vendor', amount=amount, date=date, category=category,
+                   status=status, image_path='r.png')
+
+def summary_rows(db):
+    return sorted(db.execute(text(
+        "SELECT user_id, tax_year, month, category, status, receipt_count, amount_cents, unpriced_count "
+        "FROM receipt_summaries"
+    )).fetchall())
+
+def test_inserts_are_summed(db):
+    db.add_all([receipt(amount='10.00'), receipt(amount='2.50'), receipt(amount='Missing'),
+                receipt(date='2024-03-02', category=None), receipt(user_id=2)])
+    db.commit()
+    assert summary_rows(db) == [
+        (1, 2024, 1, 'Supplies', 'Pending', 3, 1250, 1),
+        (1, 2024, 3, 'Other Expenses', 'Pending', 1, 1000, 0),
+        (2, 2024, 1, 'Supplies', 'Pending', 1, 1000, 0),
+    ]
+
+def test_updates_move_totals_between_groups(db):
+    first, second = receipt(), receipt(amount='5.00')
+    db.add_all([first, second])
+    db.commit()
+
+    first.category = 'Travel'
+    first.amount = '$12.00'
+    second.status = 'Approved'
+    db.commit()
+    assert summary_rows(db) == [
+        (1, 2024, 1, 'Supplies', 'Approved', 1, 500, 0),
+        (1, 2024, 1, 'Travel', 'Pending', 1, 1200, 0),
+    ]
+
+    second.vendor = 'Renamed'  # not a summary column
+    second.date = 'not a date'
+    db.commit()
+    assert summary_rows(db)[0] == (1, 0, 0, 'Supplies', 'Approved', 1, 500, 0)
+
+def test_deletes_remove_empty_groups(db):
+    first, second = receipt(), receipt(amount='5.00')
+    db.add_all([first, second])
+    db.commit()
+    db.delete(first)
+    db.commit()
+    assert summary_rows(db) == [(1, 2024, 1, 'Supplies', 'Pending', 1, 500, 0)]
+    db.delete(second)
+    db.commit()
+    assert summary_rows(db) == []
+
+def test_rolled_back_writes_leave_summaries_alone(db):
+    db.add(receipt())
+    db.commit()
+    db.add(receipt(amount='99.00'))
+    db.flush()
+    db.rollback()
+    assert summary_rows(db) == [(1, 2024, 1, 'Supplies', 'Pending', 1, 1000, 0)]
+
+def test_incremental_totals_match_a_rebuild(db):
+    rng = random.Random(7)
+    receipts = []
+    for _ in range(300):
+        action = rng.random()
+        if action < 0.5 or not receipts:
+            receipts.append(receipt(user_id=rng.randint(1, 3), amount=rng.choice(['1.00', '$2.50', 'n/a', '40']),
+                                    date=rng.choice(['2023-12-31', '2024-01-05', '2024-06-30', None]),
+                                    category=rng.choice(['Supplies', 'Travel', None]),
+                                    status=rng.choice(['Pending', 'Approved'])))
+            db.add(receipts[-1])
+        elif action < 0.85:
+            target = rng.choice(receipts)
+            setattr(target, *rng.choice([('amount', '7.25'), ('date', '2025-02-01'), ('category', 'Meals'),
+                                         ('status', 'Rejected'), ('user_id', 2)]))
+        else:
+            db.delete(receipts.pop(rng.randrange(len(receipts))))
+        db.flush()
+        if rng.random() < 0.2:
+            db.commit()
+    db.commit()
+
+    incremental = summary_rows(db)
+    assert rebuild_receipt_summaries(db.connection()) == len(incremental)
+    assert summary_rows(db) == incremental
+
+def test_summarize_receipts(db):
+    db.add_all([receipt(amount='10.00'), receipt(amount='30.00', category='Travel', date='2024-02-01'),
+                receipt(amount='5.00', status='Approved'), receipt(amount='1.00', date='2023-12-31'),
+                receipt(amount='Missing', date=None)])
+    db.commit()
+
+    summary = summarize_receipts(db, 1, 2024)
+    assert summary['tax_years'] == [2024, 2023, None]
+    assert summary['totals'] == {'receipt_count': 3, 'amount_cents': 4500, 'unpriced_count': 0}
+    assert [(row['category'], row['amount_cents']) for row in summary['by_category']] == \
+        [('Travel', 3000), ('Supplies', 1500)]
+    assert [(row['month'], row['receipt_count']) for row in summary['by_month']] == [(1, 2), (2, 1)]
+    assert [(row['status'], row['amount_cents']) for row in summary['by_status']] == \
+        [('Approved', 500), ('Pending', 4000)]
+
+    everything = summarize_receipts(db, 1)
+    assert everything['totals'] == {'receipt_count': 5, 'amount_cents': 4600, 'unpriced_count': 1}
+    assert everything['by_month'][0] == {'tax_year': None, 'month': None, 'receipt_count': 1,
+                                         'amount_cents': 0, 'unpriced_count': 1}
+    assert summarize_receipts(db, 2)['totals']['receipt_count'] == 0
+
+def test_migration_summarizes_existing_receipts(db):
+    db.add_all([receipt(), receipt()])
+    db.commit()
+    db.execute(text("DELETE FROM receipt_summaries"))
+    db.commit()
+
+    upgrade(db.get_bind())
+    upgrade(db.get_bind())  # safe to run again
+    assert db.query(ReceiptSummary).one().receipt_count == 2
+    db.add(receipt())
+    db.commit()
+    assert db.query(ReceiptSummary).one().receipt_count == 3
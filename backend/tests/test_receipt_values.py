@@ -0,0 +1,80 @@
+import pytest
+from datetime import date
+from sqlalchemy import text
+from models.receipt import Receipt
+from utils.receipt_values import parse_amount_cents, parse_receipt_date
+from migrations.add_typed_amount_date import add_columns, backfill
+from tests.db_fixtures import memory_engine
+
+@pytest.mark.parametrize('text_value, cents', [
+    ('$12.34 USD', 1234),
+    ('12.34 USD', 1234),
+    ('1,234.50', 123450),
+    ('12,34 EUR', 1234),
+    ('1.234,56', 123456),
+    ('USD 7', 700),
+    ('$0.995', 100),
+    ('-5.00', -500),
+    ('(5.00)', -500),
+    ('-$5.00', -500),
+    ('$.99', 99),
+    ('.50 USD', 50),
+    ('0,50', 50),
+    ('12,5', None),
+    ('Total 2 items $15.00', 1500),
+    ('Qty 3 - total 15.00 USD', 1500),
+    ('$1,234', 123400),
+    ('Missing', None),
+    ('', None),
+    (None, None),
+    ('no amount', None),
+])
+def test_parse_amount_cents(text_value, cents):
+    assert parse_amount_cents(text_value) == cents
+
+@pytest.mark.parametrize('text_value, expected', [
+    ('2024-03-04', date(2024, 3, 4)),
+    ('03/04/24', date(2024, 3, 4)),
+    ('03/04/2024 14:22', date(2024, 3, 4)),
+    ('2024-03-04T10:00:00', date(2024, 3, 4)),
+    ('Mar 4, 2024', date(2024, 3, 4)),
+    ('4 March 2024', date(2024, 3, 4)),
+    ('Missing', None),
+    ('13/45/2024', None),
+    (None, None),
+])
+def test_parse_receipt_date(text_value, expected):
+    assert parse_receipt_date(text_value) == expected
+
+def test_typed_columns_follow_text_fields():
+    """Ingest and PATCH both go through attribute assignment"""
+    receipt = Receipt(amount='$42.10 USD', date='01/15/24')
+    assert receipt.amount_cents == 4210
+    assert receipt.receipt_date == date(2024, 1, 15)
+
+    receipt.amount = '43.00'
+    receipt.date = '2024-01-16'
+    assert receipt.amount_cents == 4300
+    assert receipt.receipt_date == date(2024, 1, 16)
+    assert receipt.to_dict()['receipt_date'] == '2024-01-16'
+
+def test_backfill_existing_rows_in_batches():
+    engine = memory_engine()
+    with engine.begin() as connection:
+        connection.execute(text("CREATE TABLE receipts (id INTEGER PRIMARY KEY, amount VARCHAR(50), date VARCHAR(50))"))
+        connection.execute(text("INSERT INTO receipts (id, amount, date) VALUES (:id, :amount, :date)"), [
+            {'id': n, 'amount': f'${n}.25 USD', 'date': f'03/{n:02d}/24'} for n in range(1, 8)
+        ] + [{'id': 8, 'amount': 'Missing', 'date': 'unreadable'}])
+
+    add_columns(engine)
+    add_columns(engine)  # safe to run again
+    assert backfill(engine, batch_size=3) == 8
+
+    with engine.connect() as connection:
+        rows = connection.execute(text("SELECT amount, amount_cents, receipt_date FROM receipts ORDER BY id")).fetchall()
+        total = connection.execute(text("SELECT SUM(amount_cents) FROM receipts")).scalar()
+
+    assert rows[0] == ('$1.25 USD', 125, '2024-03-01')
+    assert rows[-1] == ('Missing', None, None)
+    assert total == sum(n * 100 + 25 for n in range(1, 8))
+    engine.dispose()
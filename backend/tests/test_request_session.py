@@ -0,0 +1,65 @@
+import pytest
+from unittest.mock import patch
+from flask import Flask
+from werkzeug.test import Client
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import sessionmaker
+import database
+from database import get_db, close_db
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'session.db'}", connect_args={'check_same_thread': False},
+                           pool_size=2, max_overflow=0, pool_timeout=1)
+    yield engine
+    engine.dispose()
+
+@pytest.fixture
+def app(engine):
+    app = Flask(__name__)
+    app.teardown_appcontext(close_db)
+    with patch.object(database, 'ReadSessionLocal', sessionmaker(bind=engine)):
+        yield app
+
+def test_one_session_per_request(app, engine):
+    seen = []
+
+    @app.route('/twice')
+    def twice():
+        first, second = get_db(), get_db()  # as require_auth and then the route
+        seen.append((first, second))
+        first.execute(text("SELECT 1"))
+        return 'ok'
+
+    client = Client(app)
+    client.get('/twice')
+    client.get('/twice')
+
+    assert seen[0][0] is seen[0][1]
+    assert seen[0][0] is not seen[1][0]
+    assert engine.pool.checkedout() == 0
+
+def test_connection_returned_when_handler_fails(app, engine):
+    @app.route('/boom')
+    def boom():
+        get_db().execute(text("SELECT 1"))
+        raise RuntimeError('boom')
+
+    client = Client(app)
+    for _ in range(5):  # more requests than the pool has connections
+        assert client.get('/boom').status_code == 500
+    assert engine.pool.checkedout() == 0
+
+def test_new_session_outside_app_context(app):
+    first, second = get_db(), get_db()
+    try:
+        assert first is not second
+    finally:
+        first.close()
+        second.close()
+
+def test_in_memory_database_keeps_default_pool():
+    with patch.object(database.config, 'db_path', ':memory:'):
+        assert database.engine_options() == {}
+    with patch.object(database.config, 'db_path', '/tmp/receipts.db'):
+        assert set(database.engine_options()) == {'pool_size', 'max_overflow', 'pool_recycle', 'pool_timeout'}
@@ -0,0 +1,53 @@
+import sqlite3
+import pytest
+from unittest.mock import patch
+from database import connection_profile, apply_pragmas, config
+
+def connect(path, profile):
+    connection = sqlite3.connect(str(path), timeout=0)
+    apply_pragmas(connection, profile)
+    return connection
+
+def pragma(connection, name):
+    return connection.execute(f"PRAGMA {name}").fetchone()[0]
+
+def test_profile_is_applied_to_file_connections(tmp_path):
+    connection = connect(tmp_path / 'receipts.db', connection_profile(db_path=str(tmp_path / 'receipts.db')))
+    assert pragma(connection, 'journal_mode') == 'wal'
+    assert pragma(connection, 'synchronous') == 1  # NORMAL
+    assert pragma(connection, 'cache_size') == config.sqlite_cache_size
+    assert pragma(connection, 'busy_timeout') == config.sqlite_busy_timeout
+    assert pragma(connection, 'temp_store') == 2  # MEMORY
+    connection.close()
+
+def test_in_memory_profile_skips_journal_and_mmap():
+    profile = connection_profile(db_path=':memory:')
+    assert 'journal_mode' not in profile and 'mmap_size' not in profile
+    apply_pragmas(sqlite3.connect(':memory:'), profile)
+
+def test_invalid_settings_are_rejected():
+    with patch.object(config, 'sqlite_synchronous', 'normal; DROP TABLE receipts'):
+        with pytest.raises(ValueError, match='SQLITE_SYNCHRONOUS'):
+            connection_profile(db_path='receipts.db')
+
+def test_readers_do_not_block_a_writer(tmp_path):
+    """Under WAL a commit succeeds while another connection holds a read transaction"""
+    path = tmp_path / 'receipts.db'
+    profile = dict(connection_profile(db_path=str(path)), busy_timeout=0)
+    writer, reader = connect(path, profile), connect(path, profile)
+    writer.execute("CREATE TABLE receipts (id INTEGER PRIMARY KEY, status TEXT)")
+    writer.execute("INSERT INTO receipts (status) VALUES ('pending')")
+    writer.commit()
+
+    reader.execute("BEGIN")
+    assert reader.execute("SELECT status FROM receipts").fetchone() == ('pending',)
+
+    writer.execute("UPDATE receipts SET status = 'approved'")
+    writer.commit()
+
+    # The reader keeps its snapshot until its transaction ends
+    assert reader.execute("SELECT status FROM receipts").fetchone() == ('pending',)
+    reader.execute("COMMIT")
+    assert reader.execute("SELECT status FROM receipts").fetchone() == ('approved',)
+    writer.close()
+    reader.close()
@@ -0,0 +1,63 @@
+import json
+import pytest
+from unittest.mock import patch, MagicMock
+from config import config
+from schemas.receipt import CategorizedReceiptExtraction, response_format
+from services.ocr_service import OCRService, OCR_RESPONSE_FORMAT
+
+RECEIPT_DATA = {
+    'Vendor': 'Staples',
+    'Amount': '$18.75',
+    'Date': '2024-04-11',
+    'Payment_Method': 'Credit Card',
+    'text': ['STAPLES', 'COPY PAPER 18.75'],
+    'Category': 'Office Expenses'
+}
+
+def vision_response(content, refusal=None):
+    return MagicMock(choices=[MagicMock(message=MagicMock(content=content, refusal=refusal))])
+
+@pytest.fixture
+def image_path(tmp_path):
+    path = tmp_path / 'receipt.gif'
+    path.write_bytes(b'GIF89a receipt')
+    return str(path)
+
+@pytest.fixture(autouse=True)
+def no_cache():
+    with patch('services.ocr_service.ocr_cache.enabled', False), \
+         patch('services.ocr_service.config.ocr_preprocess_enabled', False):
+        yield
+
+def test_response_format_is_strict_schema():
+    schema = response_format(CategorizedReceiptExtraction)['json_schema']
+    assert schema['strict'] is True
+    assert schema['schema']['additionalProperties'] is False
+    assert set(schema['schema']['required']) == {'Vendor', 'Amount', 'Date', 'Payment_Method', 'text', 'Category'}
+    assert schema['schema']['properties']['Category']['enum'] == config.expense_categories
+
+def test_response_parsed_directly_into_model(image_path):
+    """Structured responses skip the free-text cleanup pass"""
+    with patch('services.ocr_service.client.chat.completions.create',
+               return_value=vision_response(json.dumps(RECEIPT_DATA))) as mock_create, \
+         patch('services.ocr_service.clean_json_text') as mock_clean:
+        result = OCRService.extract_receipt_data(image_path)
+
+    assert mock_create.call_args[1]['response_format'] == OCR_RESPONSE_FORMAT
+    mock_clean.assert_not_called()
+    assert result['content'] == dict(RECEIPT_DATA, Amount='18.75 USD')
+
+def test_schema_violations_are_reported(image_path):
+    invalid = dict(RECEIPT_DATA, Category='Stationery')
+    with patch('services.ocr_service.client.chat.completions.create',
+               return_value=vision_response(json.dumps(invalid))):
+        result = OCRService.extract_receipt_data(image_path)
+
+    assert result['content'].startswith('Error parsing structured output')
+
+def test_refusals_are_reported(image_path):
+    with patch('services.ocr_service.client.chat.completions.create',
+               return_value=vision_response(None, refusal="I can't help with that")):
+        result = OCRService.extract_receipt_data(image_path)
+
+    assert result['content'] == "Vision API Refusal: I can't help with that"
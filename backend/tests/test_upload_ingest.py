@@ -0,0 +1,80 @@
+import io
+import hashlib
+import pytest
+from unittest.mock import patch
+from PIL import Image, ImageFile
+from services.upload_ingest import ingest_upload, sniff_kind
+
+def create_image_bytes(fmt, size=(320, 480)):
+    img = Image.new('RGB', size, color=(250, 250, 250))
+    output = io.BytesIO()
+    img.save(output, format=fmt)
+    return output.getvalue()
+
+@pytest.mark.parametrize('fmt,kind', [('PNG', 'png'), ('JPEG', 'jpeg'), ('GIF', 'gif'), ('WEBP', 'webp')])
+def test_ingest_image(tmp_path, fmt, kind):
+    """Uploads are written, hashed, sniffed and probed in one pass"""
+    data = create_image_bytes(fmt)
+    dest = tmp_path / f'receipt.{kind}'
+
+    upload = ingest_upload(io.BytesIO(data), str(dest), chunk_size=256)
+
+    assert dest.read_bytes() == data
+    assert upload.data == data
+    assert upload.size == len(data)
+    assert upload.sha256 == hashlib.sha256(data).hexdigest()
+    assert upload.kind == kind
+    assert upload.dimensions == (320, 480)
+    assert upload.is_valid_image
+
+def test_ingest_rejects_non_image(tmp_path):
+    """Files without a recognised image header fail verification"""
+    upload = ingest_upload(io.BytesIO(b'just some text' * 100), str(tmp_path / 'notes.png'))
+    assert upload.kind is None
+    assert upload.dimensions is None
+    assert not upload.is_valid_image
+
+def test_ingest_truncated_image_keeps_header_info(tmp_path):
+    """Dimensions come from the header, so a cut-off body still reports them"""
+    data = create_image_bytes('PNG', size=(1000, 1000))[:200]
+    upload = ingest_upload(io.BytesIO(data), str(tmp_path / 'partial.png'), chunk_size=16)
+    assert upload.kind == 'png'
+    assert upload.dimensions == (1000, 1000)
+
+def fed_bytes(tmp_path, body, **kwargs):
+    """Ingest body and return how many bytes reached the Pillow parser"""
+    fed = []
+    original_feed = ImageFile.Parser.feed
+    def feed(parser, data):
+        fed.append(len(data))
+        return original_feed(parser, data)
+
+    with patch.object(ImageFile.Parser, 'feed', feed):
+        upload = ingest_upload(io.BytesIO(body), str(tmp_path / 'upload'), keep_data=False, **kwargs)
+    return upload, sum(fed)
+
+def test_large_pdf_is_not_fed_to_the_image_parser(tmp_path):
+    """A PDF never yields image dimensions, so it is not probed at all"""
+    upload, fed = fed_bytes(tmp_path, b'%PDF-1.7\n' + b'0' * (8 * 1024 * 1024))
+    assert upload.kind == 'pdf'
+    assert upload.is_supported
+    assert fed == 0
+
+def test_image_probe_stops_at_the_cap(tmp_path):
+    """An image header that never parses is only searched up to probe_max_bytes"""
+    upload, fed = fed_bytes(tmp_path, b'\xff\xd8\xff' + b'\x00' * (8 * 1024 * 1024), probe_max_bytes=64 * 1024)
+    assert upload.kind == 'jpeg'
+    assert upload.dimensions is None
+    assert fed <= 64 * 1024
+
+def test_sniff_pdf():
+    assert sniff_kind(b'%PDF-1.7\n') == ('pdf', 'application/pdf')
+
+def test_ingest_without_keeping_data(tmp_path):
+    """Batch uploads stream to disk without holding the body in memory"""
+    data = create_image_bytes('PNG')
+    upload = ingest_upload(io.BytesIO(data), str(tmp_path / 'receipt.png'), keep_data=False)
+    assert upload.data is None
+    assert upload.size == len(data)
+    assert upload.sha256 == hashlib.sha256(data).hexdigest()
+    assert upload.is_valid_image
@@ -0,0 +1,134 @@
+import os
+import time
+import pytest
+from unittest.mock import patch
+from flask import Flask, g, jsonify
+from werkzeug.test import Client
+from sqlalchemy import event
+import database
+from database import close_db
+from models import User
+from auth.decorators import require_auth
+from auth.jwt import create_access_token
+import services.user_cache
+from services.user_cache import UserCache
+from tests.db_fixtures import engine, session_factory
+
+@pytest.fixture(autouse=True)
+def secret_key():
+    with patch.dict(os.environ, {'AUTH_SECRET_KEY': 'test-secret'}):
+        yield
+
+@pytest.fixture
+def user(session_factory):
+    db = session_factory()
+    user = User(email='a@example.com', hashed_password='x', full_name='Alex')
+    db.add(user)
+    db.commit()
+    db.refresh(user)
+    db.close()
+    return user
+
+@pytest.fixture
+def cache():
+    cache = UserCache(max_entries=100, ttl_seconds=60, enabled=True)
+    with patch.object(services.user_cache, 'user_cache', cache), patch('auth.decorators.user_cache', cache):
+        yield cache
+
+@pytest.fixture
+def users_queries(engine):
+    queries = []
+
+    def count(conn, cursor, statement, parameters, context, executemany):
+        if 'FROM users' in statement:
+            queries.append(statement)
+
+    event.listen(engine, 'before_cursor_execute', count)
+    yield queries
+    event.remove(engine, 'before_cursor_execute', count)
+
+@pytest.fixture
+def client(session_factory, cache):
+    app = Flask(__name__)
+    app.teardown_appcontext(close_db)
+
+    @app.route('/me')
+    @require_auth
+    def me():
+        return jsonify({'id': g.user.id, 'full_name': g.user.full_name})
+
+    with patch.object(database, 'ReadSessionLocal', session_factory):
+        yield Client(app)
+
+def headers(user_id):
+    return {'Authorization': f'Bearer {create_access_token(user_id)}'}
+
+def test_repeat_requests_skip_the_users_query(client, user, cache, users_queries):
+    auth = headers(user.id)
+    responses = [client.get('/me', headers=auth) for _ in range(3)]
+    assert [r.status_code for r in responses] == [200, 200, 200]
+    assert responses[-1].json == {'id': user.id, 'full_name': 'Alex'}
+    assert len(users_queries) == 1
+    assert cache.stats()['hits'] == 2
+
+def test_user_change_invalidates_on_commit(client, user, cache, session_factory, users_queries):
+    auth = headers(user.id)
+    client.get('/me', headers=auth)
+
+    db = session_factory()
+    db.query(User).get(user.id).full_name = 'Alex Smith'
+    db.flush()
+    assert client.get('/me', headers=auth).json['full_name'] == 'Alex'  # not committed yet
+    db.commit()
+    db.close()
+
+    assert client.get('/me', headers=auth).json['full_name'] == 'Alex Smith'
+    assert len(users_queries) == 3  # first request, the edit itself, the request after the commit
+    assert cache.stats()['invalidations'] == 1
+
+@pytest.mark.parametrize('outcome', ['commit', 'rollback'])
+def test_savepoint_release_waits_for_the_outer_transaction(client, user, cache, session_factory, outcome):
+    """The writer runs each task in a SAVEPOINT; only the outer commit invalidates"""
+    auth = headers(user.id)
+    client.get('/me', headers=auth)
+
+    db = session_factory()
+    db.begin()
+    savepoint = db.begin_nested()
+    db.query(User).get(user.id).full_name = 'Alex Smith'
+    db.flush()
+    savepoint.commit()
+    assert cache.stats()['invalidations'] == 0
+    assert client.get('/me', headers=auth).json['full_name'] == 'Alex'
+
+    getattr(db, outcome)()
+    db.close()
+    expected = 'Alex Smith' if outcome == 'commit' else 'Alex'
+    assert cache.stats()['invalidations'] == (1 if outcome == 'commit' else 0)
+    assert client.get('/me', headers=auth).json['full_name'] == expected
+
+def test_invalid_tokens_are_not_cached(client, user, cache):
+    assert client.get('/me', headers={'Authorization': 'Bearer nonsense'}).status_code == 401
+    assert client.get('/me', headers=headers(user.id + 1)).status_code == 401
+    assert cache.stats()['entries'] == 0
+
+def test_entries_expire_with_the_token():
+    cache = UserCache(max_entries=10, ttl_seconds=60, enabled=True)
+    cache.put('token', User(id=1, email='a@example.com'), token_expires_at=time.time() - 1)
+    assert cache.get('token') is None
+    assert cache.stats()['expired'] == 1
+
+def test_least_recently_used_entries_are_evicted():
+    cache = UserCache(max_entries=2, ttl_seconds=60, enabled=True)
+    for n in range(1, 4):
+        cache.put(f'token{n}', User(id=n, email=f'{n}@example.com'))
+    assert cache.get('token1') is None
+    assert cache.get('token3').id == 3
+    assert cache.stats()['entries'] == 2
+
+def test_lookup_racing_an_invalidation_is_not_stored():
+    cache = UserCache(max_entries=10, ttl_seconds=60, enabled=True)
+    generation = cache.generation(1)
+    cache.invalidate(1)  # the row changed while it was being loaded
+    cache.put('token', User(id=1, email='a@example.com'), generation=generation)
+    assert cache.get('token') is None
@@ -0,0 +1,117 @@
+import pytest
+from datetime import datetime
+from unittest.mock import patch
+from models.receipt import Receipt, ReceiptChangeHistory
+from services.vendor_index import VendorCategoryIndex, normalize_vendor
+from services.categorization_service import CategorizationService
+from tests.db_fixtures import engine, session_factory
+
+@pytest.fixture
+def index(session_factory):
+    index = VendorCategoryIndex(session_factory, min_support=2, min_confidence=0.8,
+                                correction_weight=3, ttl_seconds=3600, enabled=True)
+    with patch('services.vendor_index.vendor_category_index', index):
+        yield index
+
+def add_receipt(db, vendor, category, user_id=1):
+    receipt = Receipt(user_id=user_id, vendor=vendor, category=category, image_path='r.png', status='Pending')
+    db.add(receipt)
+    db.commit()
+    return receipt
+
+def test_normalize_vendor():
+    assert normalize_vendor('HOME DEPOT #4512') == 'home depot'
+    assert normalize_vendor('Home Depot') == 'home depot'
+    assert normalize_vendor('Missing') == ''
+    assert normalize_vendor(None) == ''
+
+def test_lookup_built_from_history(session_factory, index):
+    """Repeat vendors with a consistent category are answered from history"""
+    db = session_factory()
+    add_receipt(db, 'Home Depot #1', 'Repairs and Maintenance')
+    add_receipt(db, 'HOME DEPOT', 'Repairs and Maintenance')
+    add_receipt(db, 'Staples', 'Office Expenses')
+    add_receipt(db, 'Home Depot', 'Supplies', user_id=2)
+
+    assert index.lookup(1, 'Home Depot #4512') == 'Repairs and Maintenance'
+    assert index.lookup(1, 'Staples') is None  # not enough support yet
+    assert index.lookup(2, 'Home Depot') is None
+    assert index.stats()['hits'] == 1
+    db.close()
+
+def test_user_corrections_outweigh_ocr_guesses(session_factory, index):
+    """A category the user corrected counts more than model-assigned ones"""
+    db = session_factory()
+    add_receipt(db, 'Costco', 'Supplies')
+    corrected = add_receipt(db, 'Costco', 'Supplies')
+    corrected.category = 'Meals'
+    db.add(ReceiptChangeHistory(receipt_id=corrected.id, field_name='category', new_value='Meals',
+                                changed_at=datetime.utcnow(), changed_by='system'))
+    db.commit()
+
+    # 3 votes for Meals against 1 for Supplies is below the 0.8 confidence bar
+    assert index.lookup(1, 'Costco') is None
+    add_receipt(db, 'Costco', 'Meals')
+    assert index.lookup(1, 'Costco') == 'Meals'
+    db.close()
+
+def test_index_follows_updates_and_deletes(session_factory, index):
+    """Insert, PATCH and delete keep a loaded index current"""
+    db = session_factory()
+    first = add_receipt(db, 'Shell', 'Car and Truck Expenses')
+    assert index.lookup(1, 'Shell') is None  # loads the index
+
+    second = add_receipt(db, 'Shell', 'Car and Truck Expenses')
+    assert index.lookup(1, 'Shell') == 'Car and Truck Expenses'
+
+    second.category = 'Travel'
+    db.commit()
+    assert index.lookup(1, 'Shell') is None  # 1 vs 3 correction votes
+    first.category = 'Travel'
+    db.commit()
+    assert index.lookup(1, 'Shell') == 'Travel'
+
+    db.delete(first)
+    db.commit()
+    assert index.lookup(1, 'Shell') == 'Travel'  # correction weight alone is enough
+    db.delete(second)
+    db.commit()
+    assert index.lookup(1, 'Shell') is None
+    db.close()
+
+def test_rolled_back_changes_leave_index_unchanged(session_factory, index):
+    """Votes only change once the transaction commits"""
+    db = session_factory()
+    add_receipt(db, 'Shell', 'Car and Truck Expenses')
+    add_receipt(db, 'Shell', 'Car and Truck Expenses')
+    assert index.lookup(1, 'Shell') == 'Car and Truck Expenses'
+
+    db.add_all([Receipt(user_id=1, vendor='Shell', category='Travel', image_path='r.png', status='Pending')
+                for _ in range(3)])
+    db.flush()
+    assert index.lookup(1, 'Shell') == 'Car and Truck Expenses'  # flushed, not committed
+    db.rollback()
+    assert index.lookup(1, 'Shell') == 'Car and Truck Expenses'
+
+    # A rolled-back SAVEPOINT drops only its own changes
+    savepoint = db.begin_nested()
+    db.add(Receipt(user_id=1, vendor='Shell', category='Travel', image_path='r.png', status='Pending'))
+    db.flush()
+    savepoint.rollback()
+    add_receipt(db, 'Shell', 'Car and Truck Expenses')
+    assert index.stats()['users'] == 1
+    assert index._users[1]['vendors']['shell'] == {'Car and Truck Expenses': 3}
+    db.close()
+
+def test_categorize_receipt_uses_history_before_llm(session_factory, index):
+    db = session_factory()
+    add_receipt(db, 'Delta Air Lines', 'Travel')
+    add_receipt(db, 'Delta Air Lines', 'Travel')
+
+    with patch('services.categorization_service.vendor_category_index', index), \
+         patch('services.categorization_service.client.chat.completions.create') as mock_create:
+        category = CategorizationService.categorize_receipt({'Vendor': 'DELTA AIR LINES'}, user_id=1)
+
+    assert category == 'Travel'
+    mock_create.assert_not_called()
+    db.close()
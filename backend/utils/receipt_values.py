@@ -0,0 +1,93 @@
+import re
+from datetime import date, datetime
+from decimal import Decimal, InvalidOperation, ROUND_HALF_UP
+from typing import Optional
+
+# Digits with optional thousands separators and decimals, or a bare fraction like ".99"
+NUMBER_PATTERN = re.compile(r'\d+(?:[.,]\d+)*|[.,]\d+')
+THOUSANDS_COMMA_PATTERN = re.compile(r'^\d{1,3}(,\d{3})*(\.\d+)?$')
+DECIMAL_COMMA_PATTERN = re.compile(r'^\d{1,3}(\.\d{3})*,\d{2}$|^\d*,\d{2}$')
+
+# A currency symbol or code next to a number marks it as the amount
+CURRENCY = r'(?:[$€£¥]|\b(?:USD|EUR|GBP|CAD|AUD|NZD|CHF|JPY|CNY|INR|MXN)\b)'
+CURRENCY_BEFORE_PATTERN = re.compile(CURRENCY + r'\s*[-(]?\s*$')
+CURRENCY_AFTER_PATTERN = re.compile(r'^\s*' + CURRENCY)
+NEGATIVE_PREFIX_PATTERN = re.compile(r'[-(]\s*' + CURRENCY + r'?\s*$')
+
+DATE_FORMATS = [
+    '%Y-%m-%d',
+    '%m/%d/%Y',
+    '%m/%d/%y',
+    '%Y/%m/%d',
+    '%m-%d-%Y',
+    '%m-%d-%y',
+    '%d.%m.%Y',
+    '%b %d, %Y',
+    '%B %d, %Y',
+    '%b %d %Y',
+    '%d %b %Y',
+    '%d %B %Y',
+]
+
+def parse_amount_cents(text: Optional[str]) -> Optional[int]:
+    """Integer cents from OCR amount text such as "$12.34 USD", "1,234.50" or "12,34 EUR".
+
+    When the text holds several numbers, the one next to a currency symbol
+    or code wins. Returns None for missing or unparseable amounts, including
+    ambiguous ones like "12,5". A minus sign or parentheses around the
+    amount make it negative (refunds).
+    """
+    if text is None:
+        return None
+    text = str(text).strip()
+    if not text or text == 'Missing':
+        return None
+
+    matches = list(NUMBER_PATTERN.finditer(text))
+    if not matches:
+        return None
+    match = next((m for m in matches
+                  if CURRENCY_BEFORE_PATTERN.search(text[:m.start()]) or CURRENCY_AFTER_PATTERN.match(text[m.end():])),
+                 matches[0])
+    number = match.group()
+
+    if THOUSANDS_COMMA_PATTERN.match(number):
+        number = number.replace(',', '')
+    elif DECIMAL_COMMA_PATTERN.match(number):
+        number = number.replace('.', '').replace(',', '.')
+    elif ',' in number:
+        return None
+
+    try:
+        cents = (Decimal(number) * 100).quantize(Decimal('1'), rounding=ROUND_HALF_UP)
+    except InvalidOperation:
+        return None
+
+    sign = NEGATIVE_PREFIX_PATTERN.search(text[:match.start()])
+    if sign and (sign.group().startswith('-') or ')' in text[match.end():]):
+        cents = -cents
+    return int(cents)
+
+def parse_receipt_date(text: Optional[str]) -> Optional[date]:
+    """A date from OCR date text such as "2024-03-04", "03/04/24" or "Mar 4, 2024".
+
+    Slash dates are read month first, as printed on US receipts. Returns
+    None for missing or unparseable dates.
+    """
+    if text is None:
+        return None
+    text = ' '.join(str(text).split())
+    if not text or text == 'Missing':
+        return None
+
+    # ISO timestamps and dates followed by a time of day
+    iso = re.match(r'^(\d{4}-\d{2}-\d{2})[T ]', text)
+    candidates = [text, iso.group(1)] if iso else [text, text.split(' ')[0]]
+
+    for candidate in candidates:
+        for fmt in DATE_FORMATS:
+            try:
+                return datetime.strptime(candidate, fmt).date()
+            except ValueError:
+                continue
+    return None
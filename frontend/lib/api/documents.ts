@@ -27,6 +27,18 @@ export const documentsApi = {
             }
         });
     },
+    uploadDocuments: (files: File[]) => {
+        const formData = new FormData();
+        files.forEach(file => formData.append('files', file));
+        const token = localStorage.getItem('auth_token');
+
+        // One request for the whole batch; the backend runs OCR concurrently
+        return apiClient.post('/upload/batch', formData, {
+            headers: {
+                'Authorization': `Bearer ${token}`,
+            }
+        });
+    },
     deleteDocument: (id: number): Promise<void> => {
         return apiClient.delete(`/receipts/${id}`);
     },